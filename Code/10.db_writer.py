@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-27 21:05:39
+LastEditors  : luyz
+LastEditTime : 2025-08-27 22:47:16
+Description  : 启动单写入进程：监听 Unix socket，接收各爬虫进程的写入批次并按组提交到 SQLite
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import signal
+import sys
+from crawl_metrics import get_metrics
+from db_writer import DEFAULT_GROUP_WAIT, DEFAULT_MAX_GROUP, DBWriterServer
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="单写入进程：爬虫通过 --writer_socket 提交批次，由本进程持有数据库连接并组提交")
+    parser.add_argument("socket_path", type=str, help="监听的 Unix socket 路径")
+    parser.add_argument("--group_wait_ms", type=float, default=DEFAULT_GROUP_WAIT * 1000,
+                        help=f"收到第一个批次后等待更多批次合并提交的时间（毫秒），默认为{DEFAULT_GROUP_WAIT * 1000:g}")
+    parser.add_argument("--max_group", type=int, default=DEFAULT_MAX_GROUP,
+                        help=f"每次组提交最多合并的批次数，默认为{DEFAULT_MAX_GROUP}")
+    parser.add_argument("--metrics_jsonl", type=str, default=None, help="退出时将写入指标（组大小、持锁时间）追加到该 JSON lines 文件")
+    args = parser.parse_args()
+
+    server = DBWriterServer(args.socket_path, group_wait=args.group_wait_ms / 1000, max_group=args.max_group)
+    # SIGTERM 与 Ctrl+C 一样：停止接收连接，已收到的批次提交完成后再退出
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    print(f"🗄️ 单写入进程已启动：{args.socket_path}（组等待 {args.group_wait_ms:g}ms，每组最多 {args.max_group} 个批次）")
+    try:
+        server.serve_forever()
+    except (KeyboardInterrupt, SystemExit):
+        pass
+    finally:
+        server.shutdown()
+        metrics = get_metrics()
+        print(f"📊 写入进程指标：{metrics.summary()}")
+        if args.metrics_jsonl:
+            metrics.write_jsonl(args.metrics_jsonl, role="db_writer")
@@ -0,0 +1,233 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-28 20:06:51
+LastEditors  : luyz
+LastEditTime : 2025-08-30 22:15:09
+Description  : 常驻调度进程：在一个进程内按各自的间隔运行抓取、粉丝数刷新和榜单生成上传任务（取代 Script/9 的 while-true 循环）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import importlib.util
+import os
+import signal
+import sys
+import threading
+from datetime import datetime, timedelta
+from filelock import FileLock, Timeout
+from bili_http import DEFAULT_API_BASE, configure_client
+from crawl_metrics import get_metrics
+from crawl_pipeline import DEFAULT_QUEUE_DEPTH
+from crawl_watermark import CRAWL_MODES
+from db_writer import DBWriterServer, configure_writer
+from feishu_sheet import DEFAULT_MAX_CELLS, FEISHU_API_BASE, FeishuUploader, get_tenant_access_token
+from follower_service import DEFAULT_FOLLOWER_WORKERS, DEFAULT_MAX_REQUESTS, refresh_due_uploaders
+from job_scheduler import Job, Scheduler
+from report_builder import load_rankings, publish_reports
+
+# 加载爬虫脚本（文件名以数字开头，无法直接 import）
+CODE_DIR = os.path.dirname(os.path.abspath(__file__))
+spec = importlib.util.spec_from_file_location(
+    "spider_with_lock", os.path.join(CODE_DIR, "6.spider_video_details_to_sqlite_with_lock.py"))
+spider = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(spider)
+
+# 默认的抓取任务，与 Script/9 的两个循环一致：(任务名, 回溯天数, 间隔分钟, 抓取模式)
+# 5day：每 30 分钟抓取到 5 天前；1year：每 60 分钟抓取到一年零一个月前（auto 模式，每 24 小时全量刷新一次）
+DEFAULT_CRAWL_JOBS = [("5day", 5, 30, "full"), ("1year", 395, 60, "auto")]
+
+def parse_crawl_jobs(specs):
+    """解析 --crawl NAME DAYS INTERVAL_MINUTES MODE，格式错误时返回 None"""
+    jobs = []
+    for name, days, interval, mode in specs:
+        try:
+            days, interval = float(days), float(interval)
+        except ValueError:
+            print(f"❌ 抓取任务 {name} 的回溯天数和间隔必须是数字")
+            return None
+        if mode not in CRAWL_MODES:
+            print(f"❌ 抓取任务 {name} 的模式无效: {mode}（可选 {', '.join(CRAWL_MODES)}）")
+            return None
+        jobs.append((name, days, interval, mode))
+    return jobs
+
+def make_crawl_job(args, days, mode, stop_event, job_name):
+    """抓取任务：每次运行时按回溯天数重新计算截止日期"""
+    def run():
+        end_date = (datetime.now() - timedelta(days=days)).strftime("%Y-%m-%d")
+        print(f"[{job_name}] 分区 {args.region_id} 抓取到 {end_date}（模式 {mode}）")
+        if args.engine == "async":
+            spider.continuously_spider_video_data_async(
+                region_ids=[args.region_id],
+                video_details_db=args.video_details_db,
+                video_details_with_type_db=args.video_details_with_type_db,
+                end_date=end_date, max_pages=args.max_pages, prefetch=args.prefetch, rps=args.rps,
+                mode=mode, refresh_interval=int(args.refresh_interval * 3600), stop_event=stop_event)
+        else:
+            spider_func = (spider.continuously_spider_video_data_pipeline if args.engine == "pipeline"
+                           else spider.continuously_spider_video_data)
+            extra = {"depth": args.queue_depth} if args.engine == "pipeline" else {}
+            spider_func(
+                region_id=args.region_id,
+                video_details_db=args.video_details_db,
+                video_details_with_type_db=args.video_details_with_type_db,
+                end_date=end_date, max_pages=args.max_pages, interval=args.interval,
+                mode=mode, refresh_interval=int(args.refresh_interval * 3600), stop_event=stop_event, **extra)
+        if args.metrics_jsonl:
+            # 指标在进程内累计（started_at 为调度器启动时间），每轮抓取结束追加一行
+            get_metrics().write_jsonl(args.metrics_jsonl, regions=str(args.region_id), job=job_name, mode=mode)
+    return run
+
+def make_uploader_job(args):
+    def run():
+        stats = refresh_due_uploaders(args.video_details_with_type_db, max_requests=args.max_requests,
+                                      max_workers=args.follower_workers)
+        print(f"👥 粉丝数刷新：到期 {stats['due']} 个，成功 {stats['fetched']}，失败 {stats['failed']}")
+    return run
+
+def make_report_job(args, rankings, feishu_targets, uploader):
+    """榜单任务：token 与上传连接池在各轮之间复用"""
+    def run():
+        token = None
+        if feishu_targets:
+            token = get_tenant_access_token(args.app_id, args.app_secret, api_base=args.feishu_api_base,
+                                            cache_path=args.token_cache)
+        results = publish_reports(
+            args.video_details_db, args.video_details_with_type_db, rankings,
+            excel_dir=args.excel_dir,
+            feishu_targets=feishu_targets,
+            token=token,
+            snapshot_dir=args.snapshot_dir,
+            uploader=uploader
+        )
+        uploaded = sum(1 for r in results.values() if r["feishu"])
+        archived = sum(1 for r in results.values() if r["excel"])
+        print(f"📊 已生成 {len(results)}/{len(rankings)} 个榜单（飞书 {uploaded} 个，Excel {archived} 个）")
+    return run
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="常驻调度进程：按各自的间隔运行抓取、粉丝数刷新和榜单上传任务")
+    parser.add_argument("region_id", type=int, help="B 站分区 ID")
+    parser.add_argument("--video_details_db", type=str, required=True, help="视频详情数据库路径")
+    parser.add_argument("--video_details_with_type_db", type=str, required=True, help="视频类型数据库路径")
+    parser.add_argument("--lock_dir", type=str, default=None,
+                        help="防重叠锁文件目录（默认为视频详情数据库所在目录）；同一分区同一任务在多个进程中不会同时运行")
+    # 抓取任务
+    parser.add_argument("--crawl", nargs=4, action="append", default=[], metavar=("NAME", "DAYS", "INTERVAL", "MODE"),
+                        help="抓取任务：任务名、回溯天数、间隔（分钟）、抓取模式，可重复指定；"
+                             "默认为 5day（5 天，30 分钟，full）和 1year（395 天，60 分钟，auto）")
+    parser.add_argument("--max_pages", type=int, default=100, help="每轮最大爬取页数，默认为100")
+    parser.add_argument("--interval", type=float, default=0.5, help="sync 引擎的爬取间隔（秒），默认为半秒")
+    parser.add_argument("--engine", type=str, choices=["sync", "async", "pipeline"], default="sync", help="抓取引擎，默认为 sync")
+    parser.add_argument("--queue_depth", type=int, default=DEFAULT_QUEUE_DEPTH, help=f"pipeline 引擎各阶段之间的队列容量，默认为{DEFAULT_QUEUE_DEPTH}")
+    parser.add_argument("--prefetch", type=int, default=4, help="async 引擎的预取页数窗口，默认为4")
+    parser.add_argument("--rps", type=float, default=2.0, help="async 引擎每秒请求数上限，默认为2")
+    parser.add_argument("--refresh_interval", type=float, default=24, help="auto 模式下两次全量扫描的最小间隔（小时），默认为24")
+    parser.add_argument("--api_base", type=str, default=DEFAULT_API_BASE, help="Bilibili API 地址（可指向本地模拟服务器）")
+    parser.add_argument("--pool_size", type=int, default=10, help="HTTP 连接池大小，默认为10")
+    parser.add_argument("--writer_socket", type=str, default=None, help="单写入进程的 Unix socket 路径（批次交给写入进程组提交）")
+    parser.add_argument("--start_writer", action="store_true", help="在本进程内启动单写入进程（监听 --writer_socket）")
+    parser.add_argument("--metrics_jsonl", type=str, default=None, help="每轮抓取结束后将累计指标追加到该 JSON lines 文件")
+    # 粉丝数刷新任务
+    parser.add_argument("--uploader_interval", type=float, default=30, help="粉丝数刷新任务的间隔（分钟），默认为30；0 表示不运行")
+    parser.add_argument("--max_requests", type=int, default=DEFAULT_MAX_REQUESTS,
+                        help=f"每轮最多查询的 UP 主数量（默认{DEFAULT_MAX_REQUESTS}）")
+    parser.add_argument("--follower_workers", type=int, default=DEFAULT_FOLLOWER_WORKERS,
+                        help=f"粉丝数并发查询数（默认{DEFAULT_FOLLOWER_WORKERS}）")
+    # 榜单任务
+    parser.add_argument("--report_interval", type=float, default=30, help="榜单生成与上传任务的间隔（分钟），默认为30；0 表示不运行")
+    parser.add_argument("--rankings", type=str, default=None, help="榜单配置 JSON 文件（默认使用内置的 10 个榜单）")
+    parser.add_argument("--excel_dir", type=str, default=None, help="Excel 存档目录（可选）")
+    parser.add_argument("--feishu_sheet", nargs=3, action="append", default=[],
+                        metavar=("RANKING", "SPREADSHEET_TOKEN", "SHEET_ID"), help="榜单名 + 飞书表格，可重复指定")
+    parser.add_argument("--app_id", type=str, default=None, help="飞书开放平台 App ID")
+    parser.add_argument("--app_secret", type=str, default=None, help="飞书开放平台 App Secret")
+    parser.add_argument("--token_cache", type=str, default=None, help="tenant_access_token 缓存文件（多个进程共享）")
+    parser.add_argument("--snapshot_dir", default=None, help="飞书表格快照目录；指定后只写入变化的行（增量同步）")
+    parser.add_argument("--max_cells", type=int, default=DEFAULT_MAX_CELLS, help="每个请求的单元格上限")
+    parser.add_argument("--workers", type=int, default=4, help="并发上传的请求数（默认4）")
+    parser.add_argument("--feishu_api_base", type=str, default=FEISHU_API_BASE, help="飞书开放平台 API 地址")
+    args = parser.parse_args()
+
+    crawl_jobs = parse_crawl_jobs(args.crawl) if args.crawl else DEFAULT_CRAWL_JOBS
+    if crawl_jobs is None:
+        sys.exit(1)
+    if args.start_writer and not args.writer_socket:
+        print("❌ --start_writer 需要同时指定 --writer_socket")
+        sys.exit(1)
+    feishu_targets = {name: (token, sheet_id) for name, token, sheet_id in args.feishu_sheet}
+    if feishu_targets and (not args.app_id or not args.app_secret):
+        print("❌ 写入飞书表格需要 --app_id 和 --app_secret")
+        sys.exit(1)
+    try:
+        rankings = load_rankings(args.rankings)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取榜单配置失败: {e}")
+        sys.exit(1)
+
+    # 同一分区只允许一个调度进程（相当于循环脚本中的 flock -n）
+    lock_dir = args.lock_dir or os.path.dirname(os.path.abspath(args.video_details_db))
+    os.makedirs(lock_dir, exist_ok=True)
+    instance_lock = FileLock(os.path.join(lock_dir, f"scheduler_{args.region_id}.lock"))
+    try:
+        instance_lock.acquire(timeout=0)
+    except Timeout:
+        print(f"❌ 分区 {args.region_id} 的调度进程已在运行，退出")
+        sys.exit(1)
+
+    # 数据库和共享客户端只初始化一次，之后各轮任务直接复用
+    spider.init_video_db(args.video_details_db)
+    spider.init_video_type_db(args.video_details_with_type_db)
+    configure_client(api_base=args.api_base, pool_size=max(args.pool_size, args.follower_workers))
+    writer_server = None
+    if args.start_writer:
+        writer_server = DBWriterServer(args.writer_socket)
+        writer_thread = threading.Thread(target=writer_server.serve_forever, daemon=True)
+        writer_thread.start()
+        print(f"🗄️ 已启动单写入进程：{args.writer_socket}")
+    if args.writer_socket:
+        configure_writer(args.writer_socket)
+    uploader = None
+    if feishu_targets:
+        uploader = FeishuUploader(api_base=args.feishu_api_base, max_workers=args.workers, max_cells=args.max_cells)
+
+    stop_event = threading.Event()
+    jobs = []
+    for name, days, interval, mode in crawl_jobs:
+        jobs.append(Job(f"crawl_{name}", make_crawl_job(args, days, mode, stop_event, f"crawl_{name}"),
+                        interval * 60, lock_path=os.path.join(lock_dir, f"crawl_{args.region_id}_{name}.lock")))
+    if args.uploader_interval > 0:
+        jobs.append(Job("uploaders", make_uploader_job(args), args.uploader_interval * 60,
+                        lock_path=os.path.join(lock_dir, f"uploaders_{args.region_id}.lock")))
+    if args.report_interval > 0 and (feishu_targets or args.excel_dir):
+        jobs.append(Job("reports", make_report_job(args, rankings, feishu_targets, uploader), args.report_interval * 60,
+                        lock_path=os.path.join(lock_dir, f"reports_{args.region_id}.lock")))
+
+    scheduler = Scheduler(jobs)
+
+    def handle_signal(signum, frame):
+        # 抓取任务在下一页之前停止，其余任务运行完当前一轮
+        print(f"🛑 收到信号 {signum}，正在停止...")
+        stop_event.set()
+        scheduler.stop()
+
+    signal.signal(signal.SIGTERM, handle_signal)
+    signal.signal(signal.SIGINT, handle_signal)
+
+    print(f"🚀 分区 {args.region_id} 调度进程已启动，任务："
+          + "，".join(f"{job.name}（每 {job.interval / 60:g} 分钟）" for job in jobs))
+    try:
+        scheduler.run_forever()
+    finally:
+        if uploader:
+            uploader.close()
+        if args.writer_socket:
+            configure_writer(None)
+        if writer_server:
+            writer_server.shutdown()
+            writer_thread.join()
+        instance_lock.release()
+        for name, status in scheduler.status().items():
+            print(f"📋 {name}: 运行 {status['runs']} 次，失败 {status['failures']} 次，跳过 {status['skipped']} 次")
@@ -14,6 +14,9 @@ import sqlite3
 import sys
 import os
 import pandas as pd
+from db_schema import connect_db, get_table_columns
+from report_builder import iter_query_chunks
+from report_format import needed_columns, write_excel, write_excel_stream
 
 # 函数：从 SQLite 数据库中获取指定表的前 N 行数据
 # 支持按时间范围过滤、排序和指定表名
@@ -25,15 +28,18 @@ import pandas as pd
 # - table_name: 指定要查询的表名，默认为第一个表
 # - start_time: 起始时间，格式为 YYYY-MM-DD 或 YYYY-MM-DD HH:MM:SS
 # - end_time: 结束时间，格式同上
-# 返回值：一个 Pandas DataFrame，包含查询结果
-def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None, end_time=None):
+# - columns: 只读取这些列（默认读取全部列）
+# - chunk_size: 指定后按块流式读取，返回 DataFrame 迭代器（读取完毕后自动关闭连接）
+# 返回值：一个 Pandas DataFrame（或 DataFrame 迭代器），包含查询结果
+def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None, end_time=None,
+               columns=None, chunk_size=None):
     # 数据库文件存在性检查
     if not os.path.isfile(db_path):
         print(f"❌ 文件不存在：{db_path}")
         sys.exit(1)
     # 尝试连接数据库
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect_db(db_path)
     except Exception as e:
         print(f"❌ 无法连接数据库: {e}")
         sys.exit(1)
@@ -54,17 +60,16 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
         table_name = tables[0]
         print(f"📦 默认读取第一个表: `{table_name}`")
 
+    # 表的列名（PRAGMA table_info，同一连接内缓存）
+    table_columns = get_table_columns(conn, table_name)
+
     # 构建排序子句
     order_clause = ""
     if sort_by:
-        try:
-            preview = pd.read_sql_query(f"SELECT * FROM {table_name} LIMIT 1", conn)
-            if sort_by not in preview.columns:
-                print(f"⚠️ 列 `{sort_by}` 不存在，忽略排序")
-            else:
-                order_clause = f"ORDER BY `{sort_by}` {'DESC' if descending else 'ASC'}"
-        except Exception as e:
-            print(f"⚠️ 排序检查失败，忽略排序: {e}")
+        if sort_by not in table_columns:
+            print(f"⚠️ 列 `{sort_by}` 不存在，忽略排序")
+        else:
+            order_clause = f"ORDER BY `{sort_by}` {'DESC' if descending else 'ASC'}"
 
     # 构建时间过滤子句
     where_clause = ""
@@ -72,42 +77,40 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
     end_ts = None
     if start_time or end_time:
         # 检查时间列是否存在于表中
-        try:
-            preview = pd.read_sql_query(f"SELECT * FROM {table_name} LIMIT 1", conn)
-        except Exception as e:
-            print(f"⚠️ 时间过滤检查失败，忽略时间过滤: {e}")
+        if 'pub_timestamp' not in table_columns:
+            print("⚠️ 列 `pub_timestamp` 不存在，忽略时间过滤")
         else:
-            if 'pub_timestamp' not in preview.columns:
-                print("⚠️ 列 `pub_timestamp` 不存在，忽略时间过滤")
-            else:
-                if start_time:
-                    try:
-                        st_dt = pd.to_datetime(start_time)
-                        start_ts = int(st_dt.timestamp())
-                    except Exception as e:
-                        print(f"⚠️ 开始时间解析失败，忽略开始时间: {e}")
-                        start_ts = None
-                if end_time:
-                    try:
-                        et_dt = pd.to_datetime(end_time)
-                        end_ts = int(et_dt.timestamp())
-                    except Exception as e:
-                        print(f"⚠️ 结束时间解析失败，忽略结束时间: {e}")
-                        end_ts = None
-                # 根据有效的时间戳构造WHERE子句
-                if start_ts is not None or end_ts is not None:
-                    if start_ts is not None and end_ts is not None:
-                        if start_ts > end_ts:
-                            print("⚠️ 开始时间晚于结束时间，已交换两者")
-                            start_ts, end_ts = end_ts, start_ts
-                        where_clause = f"WHERE pub_timestamp BETWEEN {start_ts} AND {end_ts}"
-                    elif start_ts is not None:
-                        where_clause = f"WHERE pub_timestamp >= {start_ts}"
-                    elif end_ts is not None:
-                        where_clause = f"WHERE pub_timestamp <= {end_ts}"
+            if start_time:
+                try:
+                    st_dt = pd.to_datetime(start_time)
+                    start_ts = int(st_dt.timestamp())
+                except Exception as e:
+                    print(f"⚠️ 开始时间解析失败，忽略开始时间: {e}")
+                    start_ts = None
+            if end_time:
+                try:
+                    et_dt = pd.to_datetime(end_time)
+                    end_ts = int(et_dt.timestamp())
+                except Exception as e:
+                    print(f"⚠️ 结束时间解析失败，忽略结束时间: {e}")
+                    end_ts = None
+            # 根据有效的时间戳构造WHERE子句
+            if start_ts is not None or end_ts is not None:
+                if start_ts is not None and end_ts is not None:
+                    if start_ts > end_ts:
+                        print("⚠️ 开始时间晚于结束时间，已交换两者")
+                        start_ts, end_ts = end_ts, start_ts
+                    where_clause = f"WHERE pub_timestamp BETWEEN {start_ts} AND {end_ts}"
+                elif start_ts is not None:
+                    where_clause = f"WHERE pub_timestamp >= {start_ts}"
+                elif end_ts is not None:
+                    where_clause = f"WHERE pub_timestamp <= {end_ts}"
 
     # 构造最终SQL查询语句
-    sql = f"SELECT * FROM {table_name}"
+    select_list = "*"
+    if columns:
+        select_list = ", ".join(f"`{c}`" for c in columns if c in table_columns) or "*"
+    sql = f"SELECT {select_list} FROM {table_name}"
     if where_clause:
         sql += " " + where_clause
     if order_clause:
@@ -115,6 +118,10 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
     if top_n is not None:
         sql += f" LIMIT {top_n}"
 
+    # 流式读取：按块返回，不在内存中构建完整结果
+    if chunk_size:
+        return iter_query_chunks(conn, sql, chunk_size)
+
     # 执行查询并获取数据
     try:
         df = pd.read_sql_query(sql, conn)
@@ -127,50 +134,10 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
 
     return df
 
-# 整理输出结果
+# 整理输出结果（格式化逻辑见 report_format）
 def format_output(df, output_path="result.xlsx"):
-    if df.empty:
-        print("（无数据）")
-    else:
-        # 修改列名
-        resultColumns = ["视频ID", "标题", "频道名称", "频道ID", "发布时间", "播放数", "点赞数", "评论数", "弹幕数", "收藏数", "投币数", "分享数", "简介", "封面", "时长", "标签", "视频链接", "采集时间", "分区ID"]
-        df.columns = resultColumns
-        # 转换时间戳为时间格式
-        if '发布时间' in df.columns:
-            df['发布时间'] = pd.to_datetime(df['发布时间'], unit='s', errors='coerce')
-        if '采集时间' in df.columns:
-            df['采集时间'] = pd.to_datetime(df['采集时间'], unit='s', errors='coerce')
-        # # 转换封面链接格式【=IMAGE("url")】
-        # if '封面' in df.columns:
-        #     df['封面'] = df['封面'].apply(lambda x: f'=IMAGE("{x}")' if pd.notna(x) else "")
-        # 转换时长【原来是秒数，转换为 HH:MM:SS 格式，不到1小时不显示小时】
-        if '时长' in df.columns:
-            def format_duration(seconds):
-                if pd.isna(seconds):
-                    return ""
-                seconds = int(seconds)
-                hours, remainder = divmod(seconds, 3600)
-                minutes, seconds = divmod(remainder, 60)
-                if hours > 0:
-                    return f"{hours:02}:{minutes:02}:{seconds:02}"
-                else:
-                    return f"{minutes:02}:{seconds:02}"
-            df['时长'] = df['时长'].apply(format_duration)
-        # 跟换列顺序
-        sorted_columns = [
-            "视频ID", "标题", "时长", "频道名称", "发布时间", "播放数", "点赞数",
-            "评论数", "弹幕数", "收藏数", "投币数", "分享数", "简介", "视频链接", "封面",
-            "标签", "分区ID", "频道ID", "采集时间"
-        ]
-        df = df[sorted_columns]
-        
-        # 输出到Excel文件
-        try:
-            df.to_excel(output_path, index=False)
-            print(f"✅ 数据已保存到: {output_path}")
-        except Exception as e:
-            print(f"❌ 写入文件失败: {e}")
-            sys.exit(1)
+    if not write_excel(df, "videos", output_path) and not df.empty:
+        sys.exit(1)
 
 if __name__ == "__main__":
 
@@ -184,8 +151,17 @@ if __name__ == "__main__":
     parser.add_argument("--sort_by", type=str, default=None, help="按某列排序")
     parser.add_argument("--desc", action="store_true", help="是否按降序排序")
     parser.add_argument("--table", type=str, default=None, help="指定读取的表名")
+    parser.add_argument("--stream", action="store_true", help="流式导出：只读取输出需要的列，按块写入 Excel（适合大榜单）")
+    parser.add_argument("--chunk_size", type=int, default=1000, help="流式导出时每块的行数（默认1000）")
     args = parser.parse_args()
 
+    if args.stream:
+        chunks = get_db_top(args.db_path, args.topN, args.sort_by, args.desc, args.table, args.start, args.end,
+                            columns=needed_columns("videos"), chunk_size=args.chunk_size)
+        if write_excel_stream(chunks, "videos", args.output) is None:
+            sys.exit(1)
+        sys.exit(0)
+
     # 调用函数获取数据
     result = get_db_top(args.db_path, args.topN, args.sort_by, args.desc, args.table, args.start, args.end)
     # 输出结果
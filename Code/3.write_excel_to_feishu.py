@@ -9,34 +9,13 @@ Description  : 撰写 Excel 数据到飞书表格
 Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
 '''
 
-import requests
 import argparse
 from datetime import datetime
 from openpyxl import load_workbook
-from openpyxl.utils import get_column_letter, column_index_from_string
+from feishu_sheet import DEFAULT_MAX_CELLS, FeishuUploader, get_tenant_access_token, sync_sheet
 
 # ====================== 函数定义部分 ======================
 
-def get_tenant_access_token(app_id, app_secret):
-    """
-    获取 tenant_access_token，用于访问飞书开放平台 API。
-    """
-    url = "https://open.feishu.cn/open-apis/auth/v3/tenant_access_token/internal/"
-    payload = {
-        "app_id": app_id,
-        "app_secret": app_secret
-    }
-    try:
-        response = requests.post(url, json=payload)
-        data = response.json()
-    except Exception as e:
-        raise RuntimeError(f"请求 tenant_access_token 失败: {e}")
-    
-    if response.status_code != 200 or "tenant_access_token" not in data:
-        raise RuntimeError(f"获取 tenant_access_token 出错: {response.status_code}, 响应: {response.text}")
-    
-    return data["tenant_access_token"]
-
 def read_excel_data(file_path, sheet_name):
     """
     从本地 Excel 文件读取数据，返回二维列表。
@@ -63,42 +42,6 @@ def read_excel_data(file_path, sheet_name):
     wb.close()
     return data
 
-def write_to_feishu_sheet(token, spreadsheet_token, sheet_id, start_cell, values):
-    """
-    将数据写入飞书 Sheets 表格。
-    """
-    col_letters = ''.join(filter(str.isalpha, start_cell))
-    row_start = int(''.join(filter(str.isdigit, start_cell)))
-    col_start_index = column_index_from_string(col_letters) if col_letters else 1
-
-    num_rows = len(values)
-    num_cols = len(values[0]) if num_rows > 0 else 0
-    end_row = row_start + num_rows - 1
-    end_col_index = col_start_index + num_cols - 1
-    end_col_letters = get_column_letter(end_col_index)
-    end_cell = f"{end_col_letters}{end_row}"
-    range_str = f"{sheet_id}!{col_letters}{row_start}:{end_cell}"
-
-    url = f"https://open.feishu.cn/open-apis/sheets/v2/spreadsheets/{spreadsheet_token}/values_batch_update"
-    headers = {
-        "Content-Type": "application/json",
-        "Authorization": f"Bearer {token}"
-    }
-    payload = {
-        "valueRanges": [
-            {
-                "range": range_str,
-                "values": values
-            }
-        ]
-    }
-
-    response = requests.post(url, json=payload, headers=headers)
-    result = response.json()
-    if result.get("code", -1) != 0:
-        raise RuntimeError(f"写入飞书表格失败: 错误码 {result.get('code')}, 信息: {result.get('msg')}")
-    return result
-
 # ====================== 主程序入口 ======================
 
 if __name__ == "__main__":
@@ -111,7 +54,15 @@ if __name__ == "__main__":
     parser.add_argument("--app_secret", required=True, help="飞书开放平台 App Secret")
     parser.add_argument("--spreadsheet_token", required=True, help="飞书表格 Spreadsheet Token")
     parser.add_argument("--sheet_id", required=True, help="飞书表格 Sheet ID")
+    parser.add_argument("--token_cache", default=None,
+                        help="tenant_access_token 缓存文件路径；指定后多次运行共享同一个 token，过期前才重新获取")
     parser.add_argument("--start_cell", default="A1", help="写入起始单元格（默认为 A1）")
+    parser.add_argument("--snapshot_dir", default=None,
+                        help="快照目录；指定后只写入与上次推送相比变化的行（增量同步），不指定则每次全量写入")
+    parser.add_argument("--full_sync", action="store_true", help="忽略快照，强制全量写入（并刷新快照）")
+    parser.add_argument("--max_cells", type=int, default=DEFAULT_MAX_CELLS,
+                        help=f"每个请求的单元格上限（默认 {DEFAULT_MAX_CELLS}），超出时拆分为多个请求")
+    parser.add_argument("--workers", type=int, default=4, help="并发上传的请求数（默认4）")
 
     args = parser.parse_args()
 
@@ -121,11 +72,21 @@ if __name__ == "__main__":
         print(f"读取 Excel 成功，共 {len(data_values)} 行数据")
 
         # 获取 Token
-        token = get_tenant_access_token(args.app_id, args.app_secret)
+        token = get_tenant_access_token(args.app_id, args.app_secret, cache_path=args.token_cache)
         print("获取 tenant_access_token 成功")
 
-        # 写入飞书表格
-        result = write_to_feishu_sheet(token, args.spreadsheet_token, args.sheet_id, args.start_cell, data_values)
-        print("✅ 成功写入飞书表格:", result.get("msg", ""))
+        # 写入飞书表格（分块并发上传）
+        uploader = FeishuUploader(max_workers=args.workers, max_cells=args.max_cells)
+        try:
+            stats = sync_sheet(token, args.spreadsheet_token, args.sheet_id, args.start_cell, data_values,
+                               snapshot_dir=args.snapshot_dir, force_full=args.full_sync, uploader=uploader)
+        finally:
+            uploader.close()
+        print(f"✅ 成功写入飞书表格: 模式={stats['mode']}，range 数={stats['ranges']}，"
+              f"写入行数={stats['rows']}，写入单元格数={stats['cells']}")
+        upload = stats["upload"]
+        if upload:
+            print(f"📤 请求数={upload['requests']}，重试={upload['retries']}，耗时={upload['seconds']:.2f}s，"
+                  f"吞吐量={upload['cells_per_sec']:.0f} 单元格/秒")
     except Exception as e:
         print("❌ 脚本执行失败:", e)
@@ -4,7 +4,7 @@
 Author       : luyz
 Date         : 2025-07-26 21:39:40
 LastEditors  : luyz
-LastEditTime : 2025-08-02 21:03:45
+LastEditTime : 2025-08-24 21:47:05
 Description  : 读取 SQLite 数据库文件并统计指定时间范围和类型的视频信息
 Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
 '''
@@ -13,9 +13,17 @@ import argparse
 import sqlite3
 import sys
 import os
+import re
 import pandas as pd
+from db_schema import connect_db, get_table_columns
+from report_builder import iter_query_chunks
+from report_format import needed_columns, write_excel, write_excel_stream
+from stats_history import milestone_sql
 
-def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None, end_time=None, type_filter=None):
+# columns: 只读取这些列（默认读取全部列）
+# chunk_size: 指定后按块流式读取，返回 DataFrame 迭代器（读取完毕后自动关闭连接）
+def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None, end_time=None, type_filter=None,
+               columns=None, chunk_size=None):
     # 检查数据库路径
     if not os.path.isfile(db_path):
         print(f"❌ 文件不存在：{db_path}")
@@ -23,7 +31,7 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
 
     # 尝试连接数据库
     try:
-        conn = sqlite3.connect(db_path)
+        conn = connect_db(db_path)
     except Exception as e:
         print(f"❌ 无法连接数据库: {e}")
         sys.exit(1)
@@ -46,47 +54,52 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
         table_name = tables[0]
         print(f"📦 默认读取第一个表: `{table_name}`")
 
-    # 检查字段存在性
-    try:
-        preview = pd.read_sql_query(f"SELECT * FROM {table_name} LIMIT 1", conn)
-    except Exception as e:
-        print(f"❌ 预览数据失败: {e}")
-        conn.close()
-        sys.exit(1)
+    # 检查字段存在性（PRAGMA table_info，同一连接内缓存）
+    table_columns = get_table_columns(conn, table_name)
+
+    # 粉丝数统一取自 uploaders 维度表（video_types 不再逐行保存粉丝数）
+    join_uploaders = table_name != "uploaders" and "uploaders" in tables and "up_id" in table_columns
+    qualified = {c: f"t.`{c}`" for c in table_columns}
+    if join_uploaders:
+        qualified["follower"] = "u.follower"
 
     order_clause = ""
-    if sort_by and sort_by in preview.columns:
-        order_clause = f"ORDER BY `{sort_by}` {'DESC' if descending else 'ASC'}"
+    if sort_by and sort_by in qualified:
+        order_clause = f"ORDER BY {qualified[sort_by]} {'DESC' if descending else 'ASC'}"
     elif sort_by:
         print(f"⚠️ 排序列 `{sort_by}` 不存在，忽略排序")
 
     # 构建 WHERE 条件
     where_conditions = []
 
-    if 'pub_timestamp' in preview.columns:
+    if 'pub_timestamp' in table_columns:
         if start_time:
             try:
                 start_ts = int(pd.to_datetime(start_time).timestamp())
-                where_conditions.append(f"pub_timestamp >= {start_ts}")
+                where_conditions.append(f"t.pub_timestamp >= {start_ts}")
             except Exception as e:
                 print(f"⚠️ 开始时间解析失败，忽略: {e}")
         if end_time:
             try:
                 end_ts = int(pd.to_datetime(end_time).timestamp())
-                where_conditions.append(f"pub_timestamp <= {end_ts}")
+                where_conditions.append(f"t.pub_timestamp <= {end_ts}")
             except Exception as e:
                 print(f"⚠️ 结束时间解析失败，忽略: {e}")
     else:
         print("⚠️ 列 `pub_timestamp` 不存在，跳过时间过滤")
 
     if type_filter:
-        if 'type' in preview.columns:
-            where_conditions.append(f"type = '{type_filter}'")
+        if 'type' in table_columns:
+            where_conditions.append(f"t.type = '{type_filter}'")
         else:
             print("⚠️ 列 `type` 不存在，忽略类型过滤")
 
     # 组合 SQL
-    sql = f"SELECT * FROM {table_name}"
+    select_columns = [c for c in (columns or qualified) if c in qualified] or list(qualified)
+    select_list = ", ".join(f"{qualified[c]} AS `{c}`" for c in select_columns)
+    sql = f"SELECT {select_list} FROM {table_name} t"
+    if join_uploaders:
+        sql += " LEFT JOIN uploaders u ON u.up_id = t.up_id"
     if where_conditions:
         sql += " WHERE " + " AND ".join(where_conditions)
     if order_clause:
@@ -94,6 +107,10 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
     if top_n is not None:
         sql += f" LIMIT {top_n}"
 
+    # 流式读取：按块返回，不在内存中构建完整结果
+    if chunk_size:
+        return iter_query_chunks(conn, sql, chunk_size)
+
     try:
         df = pd.read_sql_query(sql, conn)
     except Exception as e:
@@ -105,41 +122,79 @@ def get_db_top(db_path, top_n, sort_by, descending, table_name, start_time=None,
 
     return df
 
-def format_output(df, output_path="result.xlsx"):
-    if df.empty:
-        print("（无数据）")
-        return
-
-    resultColumns = ["视频ID", "标题", "频道名称", "频道ID", "发布时间", "播放数", "点赞数", "评论数", "弹幕数", "收藏数", "投币数", "分享数", "简介", "封面", "时长", "标签", "视频链接", "采集时间", "分区ID", "类型", "粉丝数（采集时）"]
-    df.columns = resultColumns
-
-    if '发布时间' in df.columns:
-        df['发布时间'] = pd.to_datetime(df['发布时间'], unit='s', errors='coerce')
-    if '采集时间' in df.columns:
-        df['采集时间'] = pd.to_datetime(df['采集时间'], unit='s', errors='coerce')
-
-    if '时长' in df.columns:
-        def format_duration(seconds):
-            if pd.isna(seconds):
-                return ""
-            seconds = int(seconds)
-            h, m = divmod(seconds, 3600)
-            m, s = divmod(m, 60)
-            return f"{h:02}:{m:02}:{s:02}" if h > 0 else f"{m:02}:{s:02}"
-        df['时长'] = df['时长'].apply(format_duration)
-
-    sorted_columns = [
-        "视频ID", "标题", "时长", "频道名称", "发布时间", "粉丝数（采集时）", "播放数", "点赞数",
-        "评论数", "弹幕数", "收藏数", "投币数", "分享数", "简介", "视频链接", "封面",
-        "标签", "分区ID", "采集时间"
-    ]
-    df = df[sorted_columns]
+# 通过统计历史表插值计算“发布后 N 天”的统计值（替代 video_types 中 ±5% 窗口的快照）
+def get_interpolated_top(db_path, history_db, top_n, sort_by, descending, type_filter, start_time=None, end_time=None):
+    """
+    从 history_db（视频详细信息数据库）的 video_stats_history 表插值得到 N 天统计值，
+    视频信息取自 history_db 的 videos 表，粉丝数取自 db_path 的 uploaders 维度表
 
+    返回的列与 video_types 表一致，可直接用于 format_output
+    """
+    for path in (db_path, history_db):
+        if not os.path.isfile(path):
+            print(f"❌ 文件不存在：{path}")
+            sys.exit(1)
+
+    match = re.fullmatch(r"(\d+)_day", type_filter or "")
+    if not match:
+        print(f"❌ 插值模式需要 --type_filter 形如 N_day（例如 7_day），当前为: {type_filter}")
+        sys.exit(1)
+    days = int(match.group(1))
+
+    where_conditions = []
+    if start_time:
+        try:
+            where_conditions.append(f"v.pub_timestamp >= {int(pd.to_datetime(start_time).timestamp())}")
+        except Exception as e:
+            print(f"⚠️ 开始时间解析失败，忽略: {e}")
+    if end_time:
+        try:
+            where_conditions.append(f"v.pub_timestamp <= {int(pd.to_datetime(end_time).timestamp())}")
+        except Exception as e:
+            print(f"⚠️ 结束时间解析失败，忽略: {e}")
+
+    columns = ["bvid", "title", "up_name", "up_id", "pub_timestamp", "view", "like", "reply",
+               "danmaku", "favorite", "coin", "share", "description", "cover", "duration",
+               "tag", "video_url", "fetch_timestamp", "region_id"]
+    # 统计值和采集时间来自插值结果 m，其余列来自 videos 表 v
+    stat_columns = {"view", "like", "reply", "danmaku", "favorite", "coin", "share", "fetch_timestamp"}
+    qualified = {c: f"m.`{c}`" if c in stat_columns else f"v.`{c}`" for c in columns}
+    qualified["follower"] = "u.follower"
+
+    order_clause = ""
+    if sort_by and sort_by in qualified:
+        order_clause = f"ORDER BY {qualified[sort_by]} {'DESC' if descending else 'ASC'}"
+    elif sort_by:
+        print(f"⚠️ 排序列 `{sort_by}` 不存在，忽略排序")
+
+    select_columns = [qualified[c] for c in columns]
+    sql = f'''
+        SELECT {', '.join(select_columns)}, '{type_filter}' AS type, u.follower AS follower
+        FROM ({milestone_sql(days, schema="hist")}) m
+        JOIN hist.videos v ON v.bvid = m.bvid
+        LEFT JOIN uploaders u ON u.up_id = v.up_id
+    '''
+    if where_conditions:
+        sql += " WHERE " + " AND ".join(where_conditions)
+    if order_clause:
+        sql += " " + order_clause
+    if top_n is not None:
+        sql += f" LIMIT {top_n}"
+
+    conn = sqlite3.connect(db_path)
     try:
-        df.to_excel(output_path, index=False)
-        print(f"✅ 数据已保存到: {output_path}")
+        conn.execute("ATTACH DATABASE ? AS hist", (history_db,))
+        df = pd.read_sql_query(sql, conn)
     except Exception as e:
-        print(f"❌ 写入文件失败: {e}")
+        print(f"❌ 查询数据失败: {e}")
+        sys.exit(1)
+    finally:
+        conn.close()
+
+    return df
+
+def format_output(df, output_path="result.xlsx"):
+    if not write_excel(df, "types", output_path) and not df.empty:
         sys.exit(1)
 
 if __name__ == "__main__":
@@ -153,9 +208,44 @@ if __name__ == "__main__":
     parser.add_argument("--desc", action="store_true", help="是否按降序排序")
     parser.add_argument("--table", type=str, default=None, help="指定读取的表名")
     parser.add_argument("--type_filter", type=str, default=None, help="按类型筛选（type列）")
+    parser.add_argument("--history_db", type=str, default=None,
+                        help="视频详细信息数据库路径；指定后从统计历史表插值计算 N 天统计值（需配合 --type_filter N_day）")
 
+    parser.add_argument("--stream", action="store_true", help="流式导出：只读取输出需要的列，按块写入 Excel（适合大榜单）")
+    parser.add_argument("--chunk_size", type=int, default=1000, help="流式导出时每块的行数（默认1000）")
     args = parser.parse_args()
 
+    if args.history_db:
+        result = get_interpolated_top(
+            db_path=args.db_path,
+            history_db=args.history_db,
+            top_n=args.topN,
+            sort_by=args.sort_by,
+            descending=args.desc,
+            type_filter=args.type_filter,
+            start_time=args.start,
+            end_time=args.end
+        )
+        format_output(result, args.output)
+        sys.exit(0)
+
+    if args.stream:
+        chunks = get_db_top(
+            db_path=args.db_path,
+            top_n=args.topN,
+            sort_by=args.sort_by,
+            descending=args.desc,
+            table_name=args.table,
+            start_time=args.start,
+            end_time=args.end,
+            type_filter=args.type_filter,
+            columns=needed_columns("types"),
+            chunk_size=args.chunk_size
+        )
+        if write_excel_stream(chunks, "types", args.output) is None:
+            sys.exit(1)
+        sys.exit(0)
+
     result = get_db_top(
         db_path=args.db_path,
         top_n=args.topN,
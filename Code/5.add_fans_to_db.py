@@ -4,89 +4,186 @@
 Author       : luyz
 Date         : 2025-07-26 22:52:28
 LastEditors  : luyz
-LastEditTime : 2025-07-31 20:15:56
-Description  : 给 SQLite 中指定表添加 follower 列（B站粉丝数），直接更新原数据库
+LastEditTime : 2025-09-04 21:26:15
+Description  : 补充 uploaders 维度表中的粉丝数：只刷新需要更新的 UP 主，并发查询，分批写入，可断点续跑
 Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
 '''
 
-import pandas as pd
-import sqlite3
-import requests
-import os
 import argparse
+import json
+import os
+import sys
+import time
+from filelock import FileLock
+from bili_http import configure_client, DEFAULT_API_BASE
+from db_schema import connect_db, get_table_columns
+from follower_service import (DEFAULT_FOLLOWER_WORKERS, ensure_uploader_table, failure_backoff_sql, fetch_followers,
+                              query_follower, record_follower_failures, register_uploaders, save_followers_to_cache)
+
+# 每批查询并写入的 UP 主数量（每批一个事务，提交后更新检查点）
+DEFAULT_BATCH_SIZE = 200
+
+def register_table_uploaders(conn, db_path, table_name):
+    """
+    将视频表中出现过的 UP 主登记到 uploaders（旧数据库中的 UP 主可能尚未登记）
+
+    返回：
+        int - 登记（或更新名称）的 UP 主数量
+    """
+    if not {"up_id", "up_name"} <= set(get_table_columns(conn, table_name)):
+        print(f"❌ 表 {table_name} 缺少 up_id / up_name 列")
+        sys.exit(1)
+    uploaders = dict(conn.execute(f'''
+        SELECT up_id, MAX(up_name) FROM {table_name} WHERE up_id IS NOT NULL GROUP BY up_id
+    ''').fetchall())
+    with FileLock(db_path + ".lock"):  # 与爬虫共用写锁
+        with conn:
+            register_uploaders(conn, uploaders)
+    return len(uploaders)
+
+def select_up_ids(conn, max_age=None, refresh_all=False, now=None):
+    """
+    从 uploaders 维度表选出需要刷新粉丝数的 UP 主（按 up_id 升序）；
+    除 refresh_all 外，查询失败过的 UP 主在退避时间内跳过
 
-def load_table_from_database(db_path, table_name):
-    """连接数据库并读取指定表"""
-    conn = sqlite3.connect(db_path)
+    参数：
+        max_age: int 或 None - 粉丝数的最长有效期（秒）；None 表示只补充从未查询成功的 UP 主
+        refresh_all: bool - 刷新全部 UP 主
+
+    返回：
+        list - (up_id, up_name)
+    """
+    now = int(now if now is not None else time.time())
+    not_backing_off = f"(last_attempt_at IS NULL OR last_attempt_at + {failure_backoff_sql()} <= ?)"
+    if refresh_all:
+        condition, params = "1", ()
+    elif max_age is None:
+        condition, params = f"fetched_at IS NULL AND {not_backing_off}", (now,)
+    else:
+        condition, params = f"(fetched_at IS NULL OR fetched_at < ?) AND {not_backing_off}", (now - max_age, now)
+    return conn.execute(f'''
+        SELECT up_id, up_name FROM uploaders WHERE {condition} ORDER BY up_id
+    ''', params).fetchall()
+
+def load_checkpoint(checkpoint_path, table_name):
+    """读取检查点，不存在、损坏或属于其他表时返回 None"""
     try:
-        df = pd.read_sql_query(f"SELECT * FROM {table_name}", conn)
-    finally:
-        conn.close()
-    return df
-
-def ensure_follower_column(df):
-    """如果不存在 follower 列，则添加空值列"""
-    if 'follower' not in df.columns:
-        df['follower'] = pd.NA
-    return df
-
-def query_follower_counts(up_ids):
-    """查询 B 站粉丝数，返回 up_id 到 follower 数的字典"""
-    api_url_template = "https://api.bilibili.com/x/relation/stat?vmid={}"
-    headers = {
-        "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 "
-                      "(KHTML, like Gecko) Chrome/70.0.3538.77 Safari/537.36",
-        "Referer": "https://www.bilibili.com/"
-    }
-    follower_dict = {}
-
-    print(f"正在查询 {len(up_ids)} 个 UP 主的粉丝数...")
-    for number, uid in enumerate(up_ids):
-        try:
-            url = api_url_template.format(uid)
-            response = requests.get(url, headers=headers, timeout=5)
-            data = response.json()
-            if data.get('code') == 0 and 'data' in data and 'follower' in data['data']:
-                follower_count = data['data']['follower']
-            else:
-                follower_count = None
-        except Exception:
-            follower_count = None
-        follower_dict[uid] = follower_count
-        print(f"[{number + 1}/{len(up_ids)}] UP 主 {uid} 粉丝数: {follower_count if follower_count is not None else '查询失败'}")
-    return follower_dict
-
-def update_dataframe_with_fans(df, follower_dict):
-    """使用字典更新 df 的 follower 列"""
-    df['follower'] = df['up_id'].map(lambda x: follower_dict.get(x, df.loc[df['up_id'] == x, 'follower'].iloc[0]))
-    return df
-
-def write_table_to_database(df, db_path, table_name):
-    """覆盖写入 SQLite 文件中的指定表"""
-    conn = sqlite3.connect(db_path)
+        with open(checkpoint_path, "r", encoding="utf-8") as f:
+            checkpoint = json.load(f)
+    except (OSError, ValueError):
+        return None
+    return checkpoint if checkpoint.get("table") == table_name else None
+
+def save_checkpoint(checkpoint_path, checkpoint):
+    """原子写入检查点（先写临时文件再替换）"""
+    tmp_path = f"{checkpoint_path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(checkpoint, f)
+    os.replace(tmp_path, checkpoint_path)
+
+def write_follower_batch(conn, db_path, followers, up_names, fetched_at):
+    """
+    在一个事务内把查询结果写入 uploaders 维度表和粉丝数历史，并记录查询失败的 UP 主（失败退避）
+
+    返回：
+        int - 查询成功的 UP 主数量
+    """
+    fresh = [(up_id, up_names.get(up_id), follower, fetched_at)
+             for up_id, follower in followers.items() if follower is not None]
+    failed = [up_id for up_id, follower in followers.items() if follower is None]
+    with FileLock(db_path + ".lock"):  # 与爬虫共用写锁
+        with conn:
+            save_followers_to_cache(conn, fresh)
+            record_follower_failures(conn, failed, fetched_at)
+    return len(fresh)
+
+def backfill_followers(db_path, table_name=None, max_age=None, refresh_all=False, workers=DEFAULT_FOLLOWER_WORKERS,
+                       batch_size=DEFAULT_BATCH_SIZE, checkpoint_path=None):
+    """
+    增量补充 uploaders 维度表中的粉丝数：选出需要刷新的 UP 主，按批并发查询并写入
+    （视频表不再逐行保存粉丝数，榜单查询时关联 uploaders；指定 table_name 时先从该表登记 UP 主）
+    每批提交后更新检查点，中断后重新运行会从上次提交的位置继续
+
+    返回：
+        dict - up_ids / fetched / failed
+    """
+    checkpoint_path = checkpoint_path or f"{db_path}.uploaders.fans_checkpoint.json"
+    conn = connect_db(db_path)
     try:
-        df.to_sql(table_name, conn, if_exists='replace', index=False)
+        with FileLock(db_path + ".lock"):
+            with conn:
+                ensure_uploader_table(conn)
+        if table_name:
+            print(f"📋 从表 {table_name} 登记了 {register_table_uploaders(conn, db_path, table_name)} 个 UP 主")
+
+        # 续跑时沿用上次的筛选时间，保证筛选条件一致
+        checkpoint = load_checkpoint(checkpoint_path, "uploaders")
+        if checkpoint:
+            started_at = checkpoint["started_at"]
+            print(f"🔁 从检查点继续：up_id > {checkpoint['last_up_id']}（{checkpoint['done']} 个已完成）")
+        else:
+            started_at = int(time.time())
+            checkpoint = {"table": "uploaders", "started_at": started_at, "last_up_id": None, "done": 0}
+
+        targets = select_up_ids(conn, max_age, refresh_all, now=started_at)
+        if checkpoint["last_up_id"] is not None:
+            targets = [(up_id, name) for up_id, name in targets if up_id > checkpoint["last_up_id"]]
+        up_names = dict(targets)
+        print(f"正在查询 {len(targets)} 个 UP 主的粉丝数...")
+
+        stats = {"up_ids": len(targets), "fetched": 0, "failed": 0}
+        start = time.time()
+        for i in range(0, len(targets), batch_size):
+            batch = [up_id for up_id, _ in targets[i:i + batch_size]]
+            followers = fetch_followers(batch, query_follower, workers)
+            fetched = write_follower_batch(conn, db_path, followers, up_names, int(time.time()))
+
+            checkpoint["last_up_id"] = batch[-1]
+            checkpoint["done"] += len(batch)
+            save_checkpoint(checkpoint_path, checkpoint)
+
+            stats["fetched"] += fetched
+            stats["failed"] += len(batch) - fetched
+            done = i + len(batch)
+            print(f"[{done}/{len(targets)}] 成功 {fetched}/{len(batch)}，"
+                  f"{done / max(time.time() - start, 1e-9):.1f} 个/秒")
     finally:
         conn.close()
-    print(f"✅ 数据已更新到原始数据库: {db_path}")
+
+    # 全部完成后删除检查点，下次运行重新筛选
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    return stats
 
 
 # -------------------- 主程序入口 --------------------
 if __name__ == "__main__":
     # -------------------- 参数解析 --------------------
-    parser = argparse.ArgumentParser(description="为 SQLite 表添加 B站粉丝数（follower列）并直接更新原数据库")
-    parser.add_argument("db_path", type=str, help=".db 文件路径")
-    parser.add_argument("--table", type=str, required=True, help="要处理的表名")
+    parser = argparse.ArgumentParser(description="补充 uploaders 维度表中的 B站粉丝数，只刷新需要更新的 UP 主（榜单查询时关联该表）")
+    parser.add_argument("db_path", type=str, help="包含 uploaders 表的 .db 文件路径（视频类型数据库）")
+    parser.add_argument("--table", type=str, default=None,
+                        help="先从该视频表（如 video_types）登记 UP 主到 uploaders，用于旧数据库；默认只处理已登记的 UP 主")
+    parser.add_argument("--max_age", type=float, default=None,
+                        help="粉丝数的最长有效期（小时）；超过该时长的 UP 主重新查询。默认只补充从未查询成功的 UP 主")
+    parser.add_argument("--all", action="store_true", help="刷新全部 UP 主的粉丝数（忽略失败退避）")
+    parser.add_argument("--workers", type=int, default=DEFAULT_FOLLOWER_WORKERS,
+                        help=f"并发查询数（默认{DEFAULT_FOLLOWER_WORKERS}）")
+    parser.add_argument("--batch_size", type=int, default=DEFAULT_BATCH_SIZE,
+                        help=f"每批查询并写入的 UP 主数量（默认{DEFAULT_BATCH_SIZE}）")
+    parser.add_argument("--checkpoint", type=str, default=None,
+                        help="检查点文件路径（默认为 <db_path>.uploaders.fans_checkpoint.json）")
+    parser.add_argument("--api_base", type=str, default=DEFAULT_API_BASE,
+                        help="Bilibili API 地址（默认为官方地址，测试时可指向模拟服务器）")
     args = parser.parse_args()
 
     # -------------------- 主流程 --------------------
     if not os.path.exists(args.db_path):
         print(f"❌ 错误：数据库文件不存在: {args.db_path}")
-        return
-
-    df = load_table_from_database(args.db_path, args.table)
-    df = ensure_follower_column(df)
-    up_ids = df['up_id'].drop_duplicates().tolist()
-    follower_dict = query_follower_counts(up_ids)
-    df = update_dataframe_with_fans(df, follower_dict)
-    write_table_to_database(df, args.db_path, args.table)
+        sys.exit(1)
+
+    configure_client(api_base=args.api_base, pool_size=max(10, args.workers))
+    max_age = int(args.max_age * 3600) if args.max_age is not None else None
+    result = backfill_followers(args.db_path, args.table, max_age=max_age, refresh_all=args.all,
+                                workers=args.workers, batch_size=args.batch_size, checkpoint_path=args.checkpoint)
+    print(f"✅ 粉丝数已更新到 uploaders 表: {args.db_path}（UP 主 {result['up_ids']} 个，成功 {result['fetched']}，"
+          f"失败 {result['failed']}）")
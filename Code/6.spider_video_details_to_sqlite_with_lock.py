@@ -4,21 +4,30 @@
 Author       : luyz
 Date         : 2025-07-26 22:52:28
 LastEditors  : luyz
-LastEditTime : 2025-08-06 20:43:32
+LastEditTime : 2025-09-05 21:31:08
 Description  : 爬取 Bilibili 视频详细信息并保存到 SQLite 数据库
 Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
 '''
 
 import argparse
-import requests
 import random
 import time
 import sqlite3
 import os
 import sys
-import pandas as pd
+import asyncio
 from datetime import datetime, timedelta
-from filelock import FileLock
+from bili_http import DEFAULT_API_BASE, configure_client, get_client
+from crawl_engine import CrawlState, crawl_async, locate_page
+from crawl_metrics import get_metrics
+from crawl_pipeline import DEFAULT_QUEUE_DEPTH, crawl_pipeline
+from db_schema import migrate_db
+from db_writer import configure_writer, write_statements
+from crawl_watermark import CRAWL_MODES, ensure_crawl_state_table, plan_crawl_pass, update_crawl_state
+from follower_service import ensure_uploader_table, register_uploaders_statement
+from json_codec import decode_newlist
+from stats_history import ensure_history_table, history_statement
+from video_record import VIDEO_FIELDS, page_bounds, parse_archives
 
 
 # 创建数据库（视频详细信息）并初始化表格
@@ -85,7 +94,14 @@ def init_video_db(db_path):
             for col in required_columns:
                 if col not in columns:
                     print(f"⚠️ 列 `{col}` 不存在，可能需要手动更新表结构")
+    # 增量抓取水位线表
+    ensure_crawl_state_table(conn)
+    # 统计数据时间序列表（N 天统计值由此插值计算）
+    ensure_history_table(conn)
+    conn.commit()
     conn.close()
+    # 索引迁移与 WAL
+    migrate_db(db_path, "videos")
 
 # 创建数据库（视频详细信息带有烈性）并初始化表格
 # 注意：此函数与 init_video_db 类似，但表结构不同
@@ -124,7 +140,6 @@ def init_video_type_db(db_path):
             fetch_timestamp INTEGER,
             region_id INTEGER,
             type TEXT,
-            follower INTEGER,
             PRIMARY KEY (bvid, type)  -- 联合主键，保证每个视频每种类型唯一
         )
     '''
@@ -155,6 +170,12 @@ def init_video_type_db(db_path):
             for col in required_columns:
                 if col not in columns:
                     print(f"⚠️ 列 `{col}` 不存在，可能需要手动更新表结构")
+    # UP 主维度表和粉丝数历史（粉丝数由 9.refresh_uploaders.py 按热度分级刷新，榜单查询时关联）
+    ensure_uploader_table(conn)
+    conn.commit()
+    conn.close()
+    # 索引迁移与 WAL
+    migrate_db(db_path, "video_types")
 
 # 随机等待函数，防止请求过于频繁导致被封
 def random_sleep(min_seconds=1, max_seconds=3):
@@ -162,13 +183,15 @@ def random_sleep(min_seconds=1, max_seconds=3):
     # print(f"⏳ 等待 {delay:.2f} 秒防封...")
     time.sleep(delay)
 
-# 定义 User-Agent 列表（可扩充）
-USER_AGENTS = [
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
-    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.1 Safari/605.1.15",
-    "Mozilla/5.0 (Windows NT 10.0; WOW64) Gecko/20100101 Firefox/91.0",
-    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/104.0.0.0 Safari/537.36"
-]
+# 将 newlist 接口返回的数据解析为视频记录列表
+def parse_newlist_archives(data, rid):
+    """
+    将 newlist 接口的 JSON 数据直接解析为 VideoRecord 列表（无数据时返回空列表），无效的视频会被跳过
+    """
+    records, rejects = parse_archives(data, rid)
+    for bvid, reason in rejects:
+        print(f"❌ 跳过无效数据 {bvid}: {reason}")
+    return records
 
 # 根据API获取视频数据并保存到数据库
 # 获取分区视频最新投稿列表
@@ -182,146 +205,20 @@ def get_bilibili_newlist(rid, pn=1, ps=5):
         ps: int - 每页视频数（最大 50）
 
     返回：
-        pandas.DataFrame 或 None
+        list[VideoRecord] - 空页为空列表；请求失败（重试耗尽或 API 返回错误）时为 None
     """
-    # Step 1: 请求基本参数
-    url = "https://api.bilibili.com/x/web-interface/newlist"
-    params = {"rid": rid, "pn": pn, "ps": ps, "type": 0}
-
-    # Step 2: 重试设置（带指数退避）
-    max_retries = 3
-    wait_time = 1
-    max_wait = 10
-    data = None
-
-    for attempt in range(1, max_retries + 1):
-        # Step 3: 伪装请求头
-        headers = {
-            "User-Agent": random.choice(USER_AGENTS),
-            "Referer": "https://www.bilibili.com",
-            "Origin": "https://www.bilibili.com",
-            "Accept": "application/json"
-        }
-
-        try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            break  # 请求成功，跳出重试循环
-        except requests.exceptions.Timeout:
-            if attempt < max_retries:
-                sleep_sec = min(wait_time, max_wait)
-                print(f"⚠️ 请求超时，第 {attempt} 次，等待 {sleep_sec}s 后重试...")
-                time.sleep(sleep_sec)
-                wait_time *= 2  # 指数退避
-            else:
-                print("❌ 请求超时，已放弃")
-                return None
-        except requests.RequestException as e:
-            # print(f"❌ 请求失败: {e}")
-            # return None
-            if attempt < max_retries:
-                sleep_sec = min(wait_time, max_wait)
-                print(f"⚠️ 请求失败，第 {attempt} 次，等待 {sleep_sec}s 后重试...")
-                time.sleep(sleep_sec)
-                wait_time *= 2  # 指数退避
-            else:
-                print(f"❌ 请求失败: {e}，已放弃")
-                return None
-
-    # Step 5: 响应校验
-    if data is None or data.get("code") != 0:
-        err_code = data.get("code") if data else "None"
-        err_msg = data.get("message") if data else "No response"
-        print(f"⚠️ API 返回错误: code={err_code} message={err_msg}")
+    # Step 1: 请求数据（连接复用、请求头伪装和重试退避由共享客户端统一处理）
+    data = get_client().get_json("/x/web-interface/newlist", params={"rid": rid, "pn": pn, "ps": ps, "type": 0},
+                                 decoder=decode_newlist)
+    if data is None:
         return None
 
-    # Step 6: 提取视频数据并转换为 DataFrame
-    archives = data.get("data", {}).get("archives", [])
-    if not archives:
+    # Step 2: 提取视频数据（直接生成 VideoRecord，不经过 DataFrame）
+    records = parse_newlist_archives(data, rid)
+    if not records:
         print("📭 当前页无数据")
-        return None
 
-    df = pd.DataFrame([{
-        "BVID": v.get("bvid"),
-        "标题": v.get("title"),
-        "UP主": v.get("owner", {}).get("name"),
-        "UP主ID": v.get("owner", {}).get("mid"),
-        "发布时间戳": int(v.get("pubdate")),
-        "播放数": v.get("stat", {}).get("view"),
-        "点赞数": v.get("stat", {}).get("like"),
-        "评论数": v.get("stat", {}).get("reply"),
-        "弹幕数": v.get("stat", {}).get("danmaku"),
-        "收藏数": v.get("stat", {}).get("favorite"),
-        "投币数": v.get("stat", {}).get("coin"),
-        "分享数": v.get("stat", {}).get("share"),
-        "简介": v.get("desc"),
-        "封面": v.get("pic"),
-        "时长": v.get("duration"),
-        "标签": v.get("tag"),
-        "分区ID": rid,
-        "视频链接": f"https://www.bilibili.com/video/{v.get('bvid')}",
-        "获取时间戳": int(datetime.now().timestamp())
-    } for v in archives])
-
-    return df
-
-# 获取 UP 主的粉丝数
-def get_up_followers(up_id):
-    # Step 1: 请求基本参数
-    url = "https://api.bilibili.com/x/relation/stat"
-    params = {"vmid": up_id}
-
-    # Step 2: 重试设置（带指数退避）
-    max_retries = 3
-    wait_time = 1
-    max_wait = 10
-    followers_count = None
-
-    for attempt in range(1, max_retries + 1):
-        # Step 3: 伪装请求头
-        headers = {
-            "User-Agent": random.choice(USER_AGENTS),
-            "Referer": "https://www.bilibili.com",
-            "Origin": "https://www.bilibili.com",
-            "Accept": "application/json, text/plain, */*",
-            "Accept-Language": "zh-CN,zh;q=0.9"
-        }
-
-        try:
-            response = requests.get(url, params=params, headers=headers, timeout=10)
-            response.raise_for_status()
-            data = response.json()
-            break  # 请求成功，跳出重试循环
-        except requests.exceptions.Timeout:
-            if attempt < max_retries:
-                sleep_sec = min(wait_time, max_wait)
-                print(f"⚠️ 请求超时，第 {attempt} 次，等待 {sleep_sec}s 后重试...")
-                time.sleep(sleep_sec)
-                wait_time *= 2  # 指数退避
-            else:
-                print("❌ 请求超时，已放弃")
-                return None
-        except requests.RequestException as e:
-            print(f"❌ 请求失败: {e}")
-            return None
-
-    # Step 5: 响应校验
-    if data is None or data.get("code") != 0:
-        err_code = data.get("code") if data else "None"
-        err_msg = data.get("message") if data else "No response"
-        print(f"⚠️ API 返回错误: code={err_code} message={err_msg}")
-        return None
-
-    # Step 6: 提取视频数据并转换为 DataFrame
-    if 'data' in data and 'follower' in data['data']:
-        followers_count = data['data']['follower']
-        # print(f"📊 UP主 {up_id} 的粉丝数: {followers_count}")
-    else:
-        print("📭 未获取到粉丝数")
-        return None
-
-    return followers_count
+    return records
 
 # 获取视频的时间类型（1天、3天、1周、1月、3月、1年）
 def get_video_type(pub_timestamp, fetch_timestamp):
@@ -347,189 +244,393 @@ def get_video_type(pub_timestamp, fetch_timestamp):
             best_type = t
     return best_type
 
+# 生成写入 videos 表（以及统计历史表）的语句
+def video_statements(records):
+    """
+    VideoRecord 的字段顺序与 videos 表的列一致，记录列表直接作为 executemany 的参数，不再复制
+
+    返回：
+        (statements, rows) - 语句列表 [(sql, rows), ...] 和 videos 表的行数（无数据时为 ([], 0)）
+    """
+    if not records:
+        return [], 0
+
+    sql = f'''
+        INSERT OR REPLACE INTO videos ({', '.join(VIDEO_FIELDS)})
+        VALUES ({', '.join(['?'] * len(VIDEO_FIELDS))})
+    '''
+    return [(sql, records), history_statement(records)], len(records)
+
+# 计算时间类型并生成写入 video_types 表（以及登记 UP 主）的语句
+def video_type_statements(records):
+    """
+    粉丝数不再逐行保存：同一事务内登记 UP 主，由刷新调度器查询粉丝数，榜单查询时关联 uploaders 表
+
+    返回：
+        (statements, rows) - 语句列表和 video_types 表的行数（没有符合时间类型的视频时为 ([], 0)）
+    """
+    rows, uploaders = [], {}
+    for record in records:
+        video_type = get_video_type(record.pub_timestamp, record.fetch_timestamp)
+        if video_type:
+            rows.append(record + (video_type,))
+            uploaders[record.up_id] = record.up_name
+    if not rows:
+        return [], 0
+
+    columns = VIDEO_FIELDS + ('type',)
+    sql = f'''
+        INSERT OR REPLACE INTO video_types ({', '.join(columns)})
+        VALUES ({', '.join(['?'] * len(columns))})
+    '''
+    return [register_uploaders_statement(uploaders), (sql, rows)], len(rows)
+
+# 将一页视频记录一次性写入 videos 表（单个事务 + executemany）
+def write_video_batch(records, db_path):
+    """
+    整批数据在一个事务内写入：FileLock 模式在文件锁内写入，单写入进程模式提交给写入进程
+    同一事务内将统计数据追加到 video_stats_history 时间序列表
+    """
+    statements, rows = video_statements(records)
+    if not rows:
+        return 0
+    write_statements(db_path, statements, table="videos")
+    get_metrics().inc("db_rows_written_total", rows, table="videos")
+    return rows
+
 # 保存最新视频数据到数据库
 # 注意：此函数假设数据库和表格已经存在，如果已经存在（BVID重复）则会覆盖
 def save_video_to_db(video_data, db_path):
     """
-    将获取的视频数据保存到数据库中（使用文件锁防止并发写冲突）
+    将获取的视频数据（VideoRecord 列表，无效数据已在解析时跳过）保存到数据库中（使用文件锁防止并发写冲突）
+    写入失败时本页回滚并继续抛出异常，由抓取引擎停止本轮抓取（不更新水位线）
     """
-    lock_path = db_path + ".lock"
-    with FileLock(lock_path):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        for video in video_data:
-            try:
-                cursor.execute('''
-                    INSERT OR REPLACE INTO videos (
-                        bvid, title, up_name, up_id, pub_timestamp, view, like, reply, danmaku,
-                        favorite, coin, share, description, cover, duration, tag, video_url, fetch_timestamp, region_id
-                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (
-                    video['BVID'], video['标题'], video['UP主'], video['UP主ID'], video['发布时间戳'], 
-                    video['播放数'], video['点赞数'], video['评论数'], video['弹幕数'],
-                    video['收藏数'], video['投币数'], video['分享数'], video['简介'],
-                    video['封面'], video['时长'], video['标签'], video['视频链接'],
-                    video['获取时间戳'], video['分区ID']
-                ))
-            except Exception as e:
-                print(f"❌ 插入数据时出错: {e}")
-        conn.commit()
-        conn.close()
+    try:
+        write_video_batch(video_data, db_path)
+    except sqlite3.Error as e:
+        print(f"❌ 批量写入数据时出错，本页已回滚: {e}")
+        raise
 
 # 保存视频类型到数据库
 def save_video_type_to_db(video_data, db_path):
     """
     将视频的时间类型和其他所有信息保存到数据库中（使用文件锁防止并发写冲突）
+    写入失败时本页回滚并继续抛出异常
     """
-    lock_path = db_path + ".lock"
-    with FileLock(lock_path):
-        conn = sqlite3.connect(db_path)
-        cursor = conn.cursor()
-
-        for video in video_data:
-            try:
-                video_type = get_video_type(video['发布时间戳'], video['获取时间戳'])
-
-                if video_type:
-                    followers_count = get_up_followers(video['UP主ID'])
-                    random_sleep(0.01, 0.2)
-                    cursor.execute('''
-                        INSERT OR REPLACE INTO video_types (
-                            bvid, title, up_name, up_id, pub_timestamp, view, like, reply, danmaku, 
-                            favorite, coin, share, description, cover, duration, tag, video_url, fetch_timestamp, region_id, type, follower
-                        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-                    ''', (
-                        video['BVID'], video['标题'], video['UP主'], video['UP主ID'], video['发布时间戳'], 
-                        video['播放数'], video['点赞数'], video['评论数'], video['弹幕数'],
-                        video['收藏数'], video['投币数'], video['分享数'], video['简介'], 
-                        video['封面'], video['时长'], video['标签'], video['视频链接'],
-                        video['获取时间戳'], video['分区ID'], video_type, followers_count
-                    ))
-            except Exception as e:
-                print(f"❌ 插入数据时出错: {e}")
-        conn.commit()
-        conn.close()
+    statements, rows = video_type_statements(video_data)
+    if not rows:
+        return
+    try:
+        write_statements(db_path, statements, table="video_types")
+        get_metrics().inc("db_rows_written_total", rows, table="video_types")
+    except sqlite3.Error as e:
+        print(f"❌ 批量写入视频类型数据时出错，本页已回滚: {e}")
+        raise
 
 # 爬取视频数据并保存到 SQLite 数据库
 # 1.视频最新细节信息
 # 2.视频特定类型（如1天、3天、7天等）以及细节信息
 def spider_and_save_video_data(region_id, video_details_db, video_details_with_type_db, page=1):
     """
-    爬取指定分区的视频数据并保存到数据库中
+    爬取指定分区的视频数据并保存到数据库中（记录每页耗时和行数指标）
     """
+    metrics = get_metrics()
+    with metrics.timer("page_seconds", region=region_id):
+        # 爬取视频原始数据
+        video_data = get_bilibili_newlist(rid = region_id, pn = page, ps = 50)
+
+        # 解析视频数据并保存到 SQLite 数据库
+        if video_data:
+            metrics.observe("page_rows", len(video_data), region=region_id)
+            # 将数据保存到视频数据库
+            save_video_to_db(video_data, video_details_db)
+            # # 保存视频类型信息到新数据库
+            save_video_type_to_db(video_data, video_details_with_type_db)
+            print(f"✅ 成功保存 {len(video_data)} 条数据到数据库，并计算了时间类型")
+        else:
+            metrics.observe("page_rows", 0, region=region_id)
+            print("📭 未获取到视频数据")
 
-    # 爬取视频原始数据
-    video_data = get_bilibili_newlist(rid = region_id, pn = page, ps = 50)
-    
-    # 解析视频数据并保存到 SQLite 数据库
-    if video_data is not None and not video_data.empty:
-        # 获取视频数据
-        video_dict = video_data.to_dict(orient='records')
-        # 将数据保存到视频数据库
-        save_video_to_db(video_dict, video_details_db)
-        # # 保存视频类型信息到新数据库
-        save_video_type_to_db(video_dict, video_details_with_type_db)
-        print(f"✅ 成功保存 {len(video_data)} 条数据到数据库，并计算了时间类型")
-    else:
-        print("📭 未获取到视频数据")
-    
     return video_data
 
+# 获取指定页的发布时间范围（用于按发布时间定位页码），空页或请求失败时返回 None
+def fetch_page_bounds(region_id, page):
+    video_data = get_bilibili_newlist(rid = region_id, pn = page, ps = 50)
+    if not video_data:
+        return None
+    return page_bounds(video_data)
+
+# 解析起始日期（只抓取该日期当天及之前发布的视频），未指定时返回 None
+def parse_start_date(start_date):
+    if not start_date:
+        return None
+    try:
+        return (datetime.strptime(start_date, "%Y-%m-%d") + timedelta(days=1)).timestamp() - 1
+    except ValueError:
+        print("❌ 起始日期格式错误，请使用 YYYY-MM-DD 格式")
+        return None
+
+# 解析截止日期（默认为7天前），格式错误时返回 None
+def parse_end_date(end_date):
+    if not end_date:
+        return datetime.now() - timedelta(days=7)
+    try:
+        return datetime.strptime(end_date, "%Y-%m-%d")
+    except ValueError:
+        print("❌ 日期格式错误，请使用 YYYY-MM-DD 格式")
+        return None
+
 # 持续爬取 B 站视频详情数据并存入 SQLite 数据库
-def continuously_spider_video_data(region_id, video_details_db, video_details_with_type_db, end_date = None, max_pages = 100, interval = 1):
+def continuously_spider_video_data(region_id, video_details_db, video_details_with_type_db, end_date = None, max_pages = 100, interval = 1,
+                                   mode = "full", refresh_interval = 24 * 3600, start_timestamp = None, adaptive_skip = True,
+                                   stop_event = None):
     """
     持续循环获取视频数据并保存到数据库中
+    mode 为 fresh/auto 时只抓取到上次抓取的最新视频（水位线）为止，详见 crawl_watermark.CRAWL_MODES
+    start_timestamp 不为空时，先按发布时间定位到对应页码，跳过更新的视频（例如只刷新一年前的窗口）
+    adaptive_skip 为 True 时，卡页后按发布时间重新定位页码，而不是按递增步长跳页
     """
 
     # 检查日期格式
-    if end_date:
-        try:
-            end_date = datetime.strptime(end_date, "%Y-%m-%d")
-        except ValueError:
-            print("❌ 日期格式错误，请使用 YYYY-MM-DD 格式")
-            return
-    else:
-        end_date = datetime.now() - timedelta(days=7)
-
-    # 循环获取视频数据
-    page = 1
-    cutoff_timestamp = end_date.timestamp()
-    stagnant_count = 0
-    max_stagnant = 3
-    skip_step = 2
-    last_oldest_time = float('inf')
+    end_date = parse_end_date(end_date)
+    if end_date is None:
+        return
+
+    # 循环获取视频数据（停止条件：截止日期、最大页数、卡页检测、增量水位线）
+    full_sweep, known_timestamp = plan_crawl_pass(video_details_db, region_id, mode, refresh_interval,
+                                                  end_date.timestamp())
+    state = CrawlState(region_id, end_date.timestamp(), max_pages, known_timestamp=known_timestamp,
+                       start_timestamp=start_timestamp, adaptive_skip=adaptive_skip, stop_event=stop_event)
+    if start_timestamp is not None:
+        # 从中间开始抓取不是完整的全量扫描，不更新全量扫描时间
+        full_sweep = False
+        page, probes = locate_page(lambda pn: fetch_page_bounds(region_id, pn), start_timestamp)
+        print(f"🔎 定位起始页探测了 {probes} 页")
+        state.start_at(page)
 
     while True:
-        print(f"📥 正在抓取第 {page} 页的视频数据...")
+        print(f"📥 正在抓取第 {state.page} 页的视频数据...")
+        video_data, reason = None, "请求失败"
         try:
             video_data = spider_and_save_video_data(
                 region_id = region_id,
                 video_details_db = video_details_db,
                 video_details_with_type_db = video_details_with_type_db,
-                page = page
+                page = state.page
             )
         except Exception as e:
             print(f"❌ 抓取数据时出错: {e}")
+            reason = "抓取或写入失败"
 
-        if video_data is not None and not video_data.empty:
-            # 检查是否达到截止日期
-            current_max_pub_timestamp = video_data['发布时间戳'].max() if not video_data.empty else 0
-            if current_max_pub_timestamp < end_date.timestamp():
-                print(f"📅 当前最大发布时间戳: {current_max_pub_timestamp} ({datetime.fromtimestamp(current_max_pub_timestamp)})")
-                print(f"📅 截止日期: {end_date.timestamp()} ({end_date})")
-                print(f"⏹ 已达到截止日期 {end_date.strftime('%Y-%m-%d')}，停止抓取")
-                break
-
-            # 检查是否卡页
-            current_min_pub_timestamp = video_data['发布时间戳'].min() if not video_data.empty else 0
-            if current_min_pub_timestamp > last_oldest_time:
-                stagnant_count += 1
-            else:
-                stagnant_count = 0
-            if last_oldest_time != float('inf'):
-                print(f"📅 上一次最晚时间戳：{last_oldest_time} ({datetime.fromtimestamp(last_oldest_time)})")
-            last_oldest_time = current_min_pub_timestamp
-            if stagnant_count >= max_stagnant:
-                print(f"📅 当前最小发布时间戳：{current_min_pub_timestamp} ({datetime.fromtimestamp(current_min_pub_timestamp)})")
-                print(f"⚠️ 检测到卡页，尝试跳过 {skip_step} 页...")
-                page += skip_step
-                skip_step += 2
-                stagnant_count = 0
-                continue
-
-            # 检查是否达到最大页数限制
-            if max_pages and page >= max_pages:
-                print(f"⏹ 已达到最大页数限制 {max_pages}")
-                break
-
-            # 控制抓取间隔
-            random_sleep(0.01, 0.5)
-            print(f"⏳ 等待 {interval} 秒后抓取下一页...")
-            time.sleep(interval)
-        page += 1
+        if video_data is None:
+            keep_going = state.fail(reason)  # 请求或写入失败的页不能当作空页跳过
+        else:
+            keep_going = state.advance(*page_bounds(video_data))
+        if not keep_going:
+            break
+        if state.relocate_from:
+            page, probes = locate_page(lambda pn: fetch_page_bounds(region_id, pn), *state.relocate_from)
+            print(f"🔎 卡页重新定位探测了 {probes} 页")
+            state.jump_to(page)
+
+        # 控制抓取间隔
+        random_sleep(0.01, 0.5)
+        print(f"⏳ 等待 {interval} 秒后抓取下一页...")
+        time.sleep(interval)
+
+    # 更新增量抓取水位线（中途停止或请求失败时不更新，避免下一轮增量抓取在新水位线处停止而漏掉未抓取的视频）
+    if state.stopped or state.failed:
+        return
+    update_crawl_state(video_details_db, region_id, full_sweep, reached_known=state.reached_known,
+                       cutoff_timestamp=end_date.timestamp())
+
+# 数据库路径中的 {region_id} 占位符替换为分区 ID（不含占位符时所有分区共用同一个数据库）
+def resolve_db_path(db_path, region_id):
+    return db_path.replace("{region_id}", str(region_id))
+
+# 使用 asyncio 引擎持续爬取：预取多页并由令牌桶统一限速，可在一个进程内同时抓取多个分区
+def continuously_spider_video_data_async(region_ids, video_details_db, video_details_with_type_db, end_date = None, max_pages = 100,
+                                         prefetch = 4, rps = 2.0, mode = "full", refresh_interval = 24 * 3600,
+                                         start_timestamp = None, adaptive_skip = True, stop_event = None):
+    """
+    与 continuously_spider_video_data 的停止条件一致，但每个分区同时保持 prefetch 个页面在途请求，
+    所有分区共享 rps（每秒请求数上限）的请求配额并按分区轮流发放，不再逐页随机等待
+
+    参数：
+        region_ids: int 或 list[int] - 一个或多个分区 ID
+        video_details_db / video_details_with_type_db: str - 数据库路径，可包含 {region_id} 占位符按分区分库
+    """
+    if isinstance(region_ids, int):
+        region_ids = [region_ids]
+    end_date = parse_end_date(end_date)
+    if end_date is None:
+        return
+
+    def save_page(region_id, records):
+        save_video_to_db(records, resolve_db_path(video_details_db, region_id))
+        save_video_type_to_db(records, resolve_db_path(video_details_with_type_db, region_id))
+        print(f"✅ [分区 {region_id}] 成功保存 {len(records)} 条数据到数据库，并计算了时间类型")
+
+    # 每个分区各自决定本轮是增量抓取还是全量扫描
+    states, full_sweeps = [], {}
+    for region_id in region_ids:
+        full_sweep, known_timestamp = plan_crawl_pass(
+            resolve_db_path(video_details_db, region_id), region_id, mode, refresh_interval, end_date.timestamp())
+        full_sweeps[region_id] = full_sweep and start_timestamp is None
+        states.append(CrawlState(region_id, end_date.timestamp(), max_pages, known_timestamp=known_timestamp,
+                                 start_timestamp=start_timestamp, adaptive_skip=adaptive_skip, stop_event=stop_event))
+
+    pages = asyncio.run(crawl_async(states, parse_newlist_archives, save_page, get_client().api_base,
+                                    window=prefetch, rps=rps))
+    stopped = {state.region_id for state in states if state.stopped or state.failed}
+    reached_known = {state.region_id: state.reached_known for state in states}
+    for region_id, page_count in pages.items():
+        if page_count is None or region_id in stopped:
+            continue
+        update_crawl_state(resolve_db_path(video_details_db, region_id), region_id, full_sweeps[region_id],
+                           reached_known=reached_known[region_id], cutoff_timestamp=end_date.timestamp())
+        print(f"🏁 分区 {region_id} 抓取结束，共处理 {page_count} 页")
+
+# 流水线写入阶段：依次写入两个数据库，写入失败时回滚该数据库的本页数据并继续抛出异常（流水线停止本轮抓取）
+def persist_statements(db_path, statements, rows, table):
+    if not rows:
+        return
+    try:
+        write_statements(db_path, statements, table=table)
+        get_metrics().inc("db_rows_written_total", rows, table=table)
+    except sqlite3.Error as e:
+        print(f"❌ 批量写入 {table} 数据时出错，本页已回滚: {e}")
+        raise
+
+# 使用流水线引擎持续爬取：请求、解析、分类、写入分别在各自的线程中运行，写入第 N 页时已在请求第 N+1 页
+def continuously_spider_video_data_pipeline(region_id, video_details_db, video_details_with_type_db, end_date = None, max_pages = 100,
+                                            interval = 1, mode = "full", refresh_interval = 24 * 3600, start_timestamp = None,
+                                            adaptive_skip = True, stop_event = None, depth = DEFAULT_QUEUE_DEPTH):
+    """
+    与 continuously_spider_video_data 的停止条件和请求间隔一致，但不再等待本页写入完成才请求下一页；
+    解析直接使用 API 数据生成的 VideoRecord 列表，阶段之间的有界队列容量为 depth
+    """
+    end_date = parse_end_date(end_date)
+    if end_date is None:
+        return
+
+    full_sweep, known_timestamp = plan_crawl_pass(video_details_db, region_id, mode, refresh_interval,
+                                                  end_date.timestamp())
+    state = CrawlState(region_id, end_date.timestamp(), max_pages, known_timestamp=known_timestamp,
+                       start_timestamp=start_timestamp, adaptive_skip=adaptive_skip, stop_event=stop_event)
+    locate = lambda target, first_page: locate_page(lambda pn: fetch_page_bounds(region_id, pn), target, first_page)
+    if start_timestamp is not None:
+        full_sweep = False
+        page, probes = locate(start_timestamp, 1)
+        print(f"🔎 定位起始页探测了 {probes} 页")
+        state.start_at(page)
+
+    def fetch_page(page):
+        return get_client().get_json("/x/web-interface/newlist", params={"rid": region_id, "pn": page, "ps": 50, "type": 0},
+                                     decoder=decode_newlist)
+
+    def classify_page(records):
+        return len(records), video_statements(records), video_type_statements(records)
+
+    def persist_page(payload):
+        count, (videos, video_rows), (types, type_rows) = payload
+        persist_statements(video_details_db, videos, video_rows, "videos")
+        persist_statements(video_details_with_type_db, types, type_rows, "video_types")
+        print(f"✅ [分区 {region_id}] 成功保存 {count} 条数据到数据库，并计算了时间类型")
+
+    def pace():
+        random_sleep(0.01, 0.5)
+        time.sleep(interval)
+
+    pages, stats = crawl_pipeline(state, fetch_page, lambda data: parse_newlist_archives(data, region_id),
+                                  classify_page, persist_page, locate=locate, depth=depth, pace=pace)
+    print(f"🚰 分区 {region_id} 流水线：{stats.summary()}")
+    print(f"🏁 分区 {region_id} 抓取结束，共处理 {pages} 页")
+    if state.stopped or state.failed:
+        return
+    update_crawl_state(video_details_db, region_id, full_sweep, reached_known=state.reached_known,
+                       cutoff_timestamp=end_date.timestamp())
 
 if __name__ == "__main__":
     
     parser = argparse.ArgumentParser(description="爬取 B 站视频详情并存入 SQLite 数据库")
-    parser.add_argument("region_id", type=int, help="B 站分区 ID")
-    parser.add_argument("--video_details_db", type=str, default="video_details.db", help="视频详情 SQLite 数据库文件路径")
-    parser.add_argument("--video_details_with_type_db", type=str, default="video_details_with_type.db", help="视频详情（带类型）SQLite 数据库文件路径")
+    parser.add_argument("region_id", type=int, nargs="+", help="B 站分区 ID（可传入多个，在同一进程内抓取）")
+    parser.add_argument("--video_details_db", type=str, default="video_details.db", help="视频详情 SQLite 数据库文件路径（可包含 {region_id} 占位符按分区分库）")
+    parser.add_argument("--video_details_with_type_db", type=str, default="video_details_with_type.db", help="视频详情（带类型）SQLite 数据库文件路径（可包含 {region_id} 占位符按分区分库）")
     parser.add_argument("--end_date", type=str, default=None, help="截止日期（格式: YYYY-MM-DD），默认为7天前")
+    parser.add_argument("--start_date", type=str, default=None, help="起始日期（格式: YYYY-MM-DD）：按发布时间二分定位到该日期所在的页再开始抓取，跳过更新的视频；默认从第1页开始")
+    parser.add_argument("--skip_mode", type=str, choices=["search", "linear"], default="search", help="卡页处理方式：search（按发布时间重新定位，默认）或 linear（按递增步长跳页）")
     parser.add_argument("--max_pages", type=int, default=100, help="最大爬取页数，默认为100")
     parser.add_argument("--interval", type=float, default=0.5, help="爬取间隔（秒），默认为半秒")
+    parser.add_argument("--engine", type=str, choices=["sync", "async", "pipeline"], default="sync", help="抓取引擎：sync（逐页）、async（预取 + 限速）或 pipeline（请求/解析/分类/写入流水线），默认为 sync")
+    parser.add_argument("--queue_depth", type=int, default=DEFAULT_QUEUE_DEPTH, help=f"pipeline 引擎各阶段之间的队列容量，默认为{DEFAULT_QUEUE_DEPTH}")
+    parser.add_argument("--prefetch", type=int, default=4, help="async 引擎的预取页数窗口，默认为4")
+    parser.add_argument("--rps", type=float, default=2.0, help="async 引擎每秒请求数上限，默认为2")
+    parser.add_argument("--api_base", type=str, default=DEFAULT_API_BASE, help="Bilibili API 地址（可指向本地模拟服务器）")
+    parser.add_argument("--pool_size", type=int, default=10, help="HTTP 连接池大小，默认为10")
+    parser.add_argument("--mode", type=str, choices=CRAWL_MODES, default="full", help="抓取模式：full（默认）/fresh（增量）/refresh（全量刷新）/auto（按间隔自动选择）")
+    parser.add_argument("--refresh_interval", type=float, default=24, help="auto 模式下两次全量扫描的最小间隔（小时），默认为24")
+    parser.add_argument("--metrics_jsonl", type=str, default=None, help="抓取结束后将本轮指标追加到该 JSON lines 文件")
+    parser.add_argument("--writer_socket", type=str, default=None, help="单写入进程的 Unix socket 路径（由 10.db_writer.py 启动）：批次交给写入进程组提交；默认在本进程内加文件锁写入")
+    parser.add_argument("--metrics_prom", type=str, default=None, help="抓取结束后将本轮指标写入该 Prometheus 文本文件（textfile collector）")
     args = parser.parse_args()
+
+    # 起始日期（格式错误时退出）
+    start_timestamp = parse_start_date(args.start_date)
+    if args.start_date and start_timestamp is None:
+        sys.exit(1)
     
-    # 初始化数据库连接
-    init_video_db(args.video_details_db)
-    init_video_type_db(args.video_details_with_type_db)
+    # 初始化数据库连接（按分区分库时每个分区各初始化一次）
+    for db_path in dict.fromkeys(resolve_db_path(args.video_details_db, r) for r in args.region_id):
+        init_video_db(db_path)
+    for db_path in dict.fromkeys(resolve_db_path(args.video_details_with_type_db, r) for r in args.region_id):
+        init_video_type_db(db_path)
+
+    # 共享 HTTP 客户端（长连接复用）
+    configure_client(api_base=args.api_base, pool_size=args.pool_size)
+    if args.writer_socket:
+        configure_writer(args.writer_socket)
+        print(f"🗄️ 使用单写入进程：{args.writer_socket}")
 
     # 开始不间断爬取视频数据
-    continuously_spider_video_data(
-        region_id=args.region_id,
-        video_details_db=args.video_details_db,
-        video_details_with_type_db=args.video_details_with_type_db,
-        end_date=args.end_date,
-        max_pages=args.max_pages,
-        interval=args.interval
-    )
+    if args.engine == "async":
+        continuously_spider_video_data_async(
+            region_ids=args.region_id,
+            video_details_db=args.video_details_db,
+            video_details_with_type_db=args.video_details_with_type_db,
+            end_date=args.end_date,
+            max_pages=args.max_pages,
+            prefetch=args.prefetch,
+            rps=args.rps,
+            mode=args.mode,
+            refresh_interval=int(args.refresh_interval * 3600),
+            start_timestamp=start_timestamp,
+            adaptive_skip=args.skip_mode == "search"
+        )
+    else:
+        # 同步引擎和流水线引擎逐个分区依次抓取
+        spider_func = continuously_spider_video_data_pipeline if args.engine == "pipeline" else continuously_spider_video_data
+        extra = {"depth": args.queue_depth} if args.engine == "pipeline" else {}
+        for region_id in args.region_id:
+            spider_func(
+                region_id=region_id,
+                video_details_db=resolve_db_path(args.video_details_db, region_id),
+                video_details_with_type_db=resolve_db_path(args.video_details_with_type_db, region_id),
+                end_date=args.end_date,
+                max_pages=args.max_pages,
+                interval=args.interval,
+                mode=args.mode,
+                refresh_interval=int(args.refresh_interval * 3600),
+                start_timestamp=start_timestamp,
+                adaptive_skip=args.skip_mode == "search",
+                **extra
+            )
+
+    # 导出本轮指标（HTTP 延迟、重试、错误码、每页行数与耗时、写锁等待/持有时间）
+    metrics = get_metrics()
+    print(f"📊 本轮指标：{metrics.summary()}")
+    regions = ",".join(str(r) for r in args.region_id)
+    if args.metrics_jsonl:
+        metrics.write_jsonl(args.metrics_jsonl, regions=regions, engine=args.engine, mode=args.mode)
+    if args.metrics_prom:
+        metrics.write_prometheus(args.metrics_prom, regions=regions)
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-17 16:12:47
+LastEditors  : luyz
+LastEditTime : 2025-08-17 17:45:03
+Description  : SQLite 数据库诊断：表结构版本、PRAGMA、索引以及报表查询的 EXPLAIN QUERY PLAN
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import os
+import sys
+import time
+from db_schema import MIGRATIONS, connect_db, explain_query_plan, get_schema_version, migrate_db
+
+# 报表脚本中的典型查询（Code/2、Code/4 生成年度 / 类型榜单时使用的形式）
+REPORT_QUERIES = {
+    "videos": [
+        ("年度播放榜（Code/2）",
+         "SELECT * FROM videos WHERE pub_timestamp BETWEEN ? AND ? ORDER BY `view` DESC LIMIT 3000",
+         lambda now: (now - 365 * 86400, now)),
+        ("分区水位线（crawl_watermark）",
+         "SELECT pub_timestamp, bvid FROM videos WHERE region_id = ? ORDER BY pub_timestamp DESC LIMIT 1",
+         lambda now: (0,))
+    ],
+    "video_types": [
+        ("类型播放榜（Code/4）",
+         "SELECT * FROM video_types WHERE type = ? ORDER BY `view` DESC LIMIT 100",
+         lambda now: ("7_day",)),
+        ("类型 + 时间范围播放榜（Code/4）",
+         "SELECT * FROM video_types WHERE pub_timestamp >= ? AND type = ? ORDER BY `view` DESC LIMIT 100",
+         lambda now: (now - 30 * 86400, "7_day"))
+    ]
+}
+
+def print_plan(conn, title, sql, params):
+    """打印一条查询的执行计划，并标记全表扫描和临时排序"""
+    print(f"\n🔍 {title}")
+    print(f"   {sql}")
+    try:
+        details = explain_query_plan(conn, sql, params)
+    except Exception as e:
+        print(f"   ❌ 无法生成查询计划: {e}")
+        return
+    for detail in details:
+        uses_index = "INDEX" in detail or "PRIMARY KEY" in detail
+        if "TEMP B-TREE" in detail or (detail.startswith("SCAN") and not uses_index):
+            print(f"   ⚠️ {detail}")
+        else:
+            print(f"   ✅ {detail}")
+
+def diagnose(db_path, extra_queries=None):
+    conn = connect_db(db_path)
+    try:
+        tables = [r[0] for r in conn.execute(
+            "SELECT name FROM sqlite_master WHERE type='table' ORDER BY name").fetchall()]
+        print(f"📦 数据库: {db_path}")
+        print(f"   表结构版本 (user_version): {get_schema_version(conn)}")
+        print(f"   journal_mode: {conn.execute('PRAGMA journal_mode').fetchone()[0]}")
+        print(f"   page_size: {conn.execute('PRAGMA page_size').fetchone()[0]}，"
+              f"page_count: {conn.execute('PRAGMA page_count').fetchone()[0]}")
+
+        for table in tables:
+            count = conn.execute(f"SELECT COUNT(*) FROM `{table}`").fetchone()[0]
+            indexes = conn.execute(
+                "SELECT name, sql FROM sqlite_master WHERE type='index' AND tbl_name = ? ORDER BY name",
+                (table,)
+            ).fetchall()
+            print(f"\n📊 表 `{table}`: {count} 行")
+            for name, sql in indexes:
+                print(f"   - {name}" + (f": {sql}" if sql else "（自动索引）"))
+
+        now = int(time.time())
+        for table, queries in REPORT_QUERIES.items():
+            if table not in tables:
+                continue
+            latest = MIGRATIONS[table][-1][0] if MIGRATIONS.get(table) else 0
+            if get_schema_version(conn) < latest:
+                print(f"\n⚠️ `{table}` 的表结构版本落后于 {latest}，可使用 --migrate 创建索引")
+            for title, sql, make_params in queries:
+                print_plan(conn, title, sql, make_params(now))
+
+        for sql in extra_queries or []:
+            print_plan(conn, "自定义查询", sql, ())
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="诊断 SQLite 数据库：表结构版本、索引以及报表查询计划")
+    parser.add_argument("db_path", type=str, nargs="+", help=".db 文件路径（可指定多个）")
+    parser.add_argument("--migrate", action="store_true", help="诊断前执行表结构迁移（创建索引、启用 WAL）")
+    parser.add_argument("--query", type=str, action="append", default=None,
+                        help="额外输出该 SQL 的查询计划（可重复指定）")
+    args = parser.parse_args()
+
+    for db_path in args.db_path:
+        if not os.path.isfile(db_path):
+            print(f"❌ 文件不存在：{db_path}")
+            sys.exit(1)
+        if args.migrate:
+            conn = connect_db(db_path)
+            tables = {r[0] for r in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            conn.close()
+            for table in MIGRATIONS:
+                if table in tables:
+                    migrate_db(db_path, table)
+        diagnose(db_path, args.query)
+        print()
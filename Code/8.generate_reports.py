@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-18 20:47:33
+LastEditors  : luyz
+LastEditTime : 2025-08-23 21:05:40
+Description  : 报表入口：一次运行生成全部榜单，直接写入飞书表格（Excel 存档为可选的后台输出）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import os
+import sys
+import time
+from feishu_sheet import DEFAULT_MAX_CELLS, FEISHU_API_BASE, FeishuUploader, get_tenant_access_token
+from report_builder import load_rankings, publish_reports
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="从 SQLite 数据库一次性生成全部榜单，写入飞书表格和/或 Excel")
+    parser.add_argument("video_db", type=str, help="视频详细信息数据库路径（videos 表）")
+    parser.add_argument("--type_db", type=str, default=None, help="视频类型数据库路径（video_types 表）")
+    parser.add_argument("--rankings", type=str, default=None,
+                        help="榜单配置 JSON 文件路径，默认为 Today/Week/Month/Year 和六个固定时间长度榜单")
+    parser.add_argument("--excel_dir", type=str, default=None, help="Excel 存档目录（可选），每个榜单输出为 <榜单名>.xlsx")
+    # 飞书相关参数
+    parser.add_argument("--feishu_sheet", nargs=3, action="append", default=[],
+                        metavar=("RANKING", "SPREADSHEET_TOKEN", "SHEET_ID"),
+                        help="将榜单写入飞书表格（可重复指定），例如 --feishu_sheet Today <token> <sheet_id>")
+    parser.add_argument("--app_id", type=str, default=None, help="飞书开放平台 App ID")
+    parser.add_argument("--app_secret", type=str, default=None, help="飞书开放平台 App Secret")
+    parser.add_argument("--token_cache", type=str, default=None,
+                        help="tenant_access_token 缓存文件路径；多个进程共享同一个 token，过期前才重新获取")
+    parser.add_argument("--start_cell", default="A1", help="写入起始单元格（默认为 A1）")
+    parser.add_argument("--snapshot_dir", default=None, help="飞书表格快照目录；指定后只写入变化的行（增量同步）")
+    parser.add_argument("--full_sync", action="store_true", help="忽略快照，强制全量写入")
+    parser.add_argument("--max_cells", type=int, default=DEFAULT_MAX_CELLS, help="每个请求的单元格上限")
+    parser.add_argument("--workers", type=int, default=4, help="并发上传的请求数（默认4）")
+    parser.add_argument("--feishu_api_base", type=str, default=FEISHU_API_BASE,
+                        help="飞书开放平台 API 地址（默认为官方地址，测试时可指向模拟服务器）")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.video_db):
+        print(f"❌ 文件不存在：{args.video_db}")
+        sys.exit(1)
+    if not args.excel_dir and not args.feishu_sheet:
+        print("❌ 请至少指定 --excel_dir 或 --feishu_sheet 之一")
+        sys.exit(1)
+    try:
+        rankings = load_rankings(args.rankings)
+    except (OSError, ValueError) as e:
+        print(f"❌ 读取榜单配置失败: {e}")
+        sys.exit(1)
+
+    feishu_targets = {name: (spreadsheet_token, sheet_id) for name, spreadsheet_token, sheet_id in args.feishu_sheet}
+    unknown = set(feishu_targets) - {r["name"] for r in rankings}
+    if unknown:
+        print(f"⚠️ 以下飞书表格对应的榜单不存在，将被忽略: {', '.join(sorted(unknown))}")
+
+    token = None
+    uploader = None
+    if feishu_targets:
+        if not args.app_id or not args.app_secret:
+            print("❌ 写入飞书表格需要 --app_id 和 --app_secret")
+            sys.exit(1)
+        try:
+            token = get_tenant_access_token(args.app_id, args.app_secret, api_base=args.feishu_api_base,
+                                            cache_path=args.token_cache)
+        except RuntimeError as e:
+            print(f"❌ {e}")
+            sys.exit(1)
+        uploader = FeishuUploader(api_base=args.feishu_api_base, max_workers=args.workers, max_cells=args.max_cells)
+
+    start = time.time()
+    try:
+        results = publish_reports(
+            args.video_db, args.type_db, rankings,
+            excel_dir=args.excel_dir,
+            feishu_targets=feishu_targets,
+            token=token,
+            snapshot_dir=args.snapshot_dir,
+            start_cell=args.start_cell,
+            uploader=uploader,
+            force_full=args.full_sync
+        )
+    finally:
+        if uploader:
+            uploader.close()
+
+    uploaded = sum(1 for r in results.values() if r["feishu"])
+    archived = sum(1 for r in results.values() if r["excel"])
+    print(f"📊 已生成 {len(results)}/{len(rankings)} 个榜单（飞书 {uploaded} 个，Excel {archived} 个），"
+          f"耗时 {time.time() - start:.2f} 秒")
@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-24 21:52:36
+LastEditors  : luyz
+LastEditTime : 2025-08-24 22:30:08
+Description  : UP 主粉丝数刷新调度：按粉丝数分级决定刷新间隔，每次只查询到期的 UP 主并记录粉丝数历史
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import os
+import sys
+import time
+from bili_http import DEFAULT_API_BASE, configure_client
+from follower_service import (DEFAULT_FOLLOWER_WORKERS, DEFAULT_MAX_REQUESTS, DEFAULT_REFRESH_INTERVAL,
+                              FOLLOWER_REFRESH_TIERS, refresh_due_uploaders)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="刷新到期 UP 主的粉丝数（uploaders 维度表 + uploader_follower_history 历史表）")
+    parser.add_argument("db_path", type=str, nargs="+", help="包含 uploaders 表的数据库路径（视频类型数据库，可传入多个）")
+    parser.add_argument("--max_requests", type=int, default=DEFAULT_MAX_REQUESTS,
+                        help=f"每个数据库本次最多查询的 UP 主数量（默认{DEFAULT_MAX_REQUESTS}），未处理的留到下次")
+    parser.add_argument("--workers", type=int, default=DEFAULT_FOLLOWER_WORKERS,
+                        help=f"并发查询数（默认{DEFAULT_FOLLOWER_WORKERS}）")
+    parser.add_argument("--batch_size", type=int, default=100, help="每批写入的 UP 主数量（默认100）")
+    parser.add_argument("--api_base", type=str, default=DEFAULT_API_BASE, help="Bilibili API 地址（可指向本地模拟服务器）")
+    args = parser.parse_args()
+
+    tiers = "，".join(f"粉丝≥{floor} 每 {interval / 3600:g} 小时" for floor, interval in FOLLOWER_REFRESH_TIERS)
+    print(f"📅 刷新间隔：{tiers}，其余每 {DEFAULT_REFRESH_INTERVAL / 3600:g} 小时")
+
+    configure_client(api_base=args.api_base, pool_size=max(10, args.workers))
+    for db_path in args.db_path:
+        if not os.path.isfile(db_path):
+            print(f"❌ 文件不存在：{db_path}")
+            sys.exit(1)
+        start = time.time()
+        stats = refresh_due_uploaders(db_path, max_requests=args.max_requests, max_workers=args.workers,
+                                      batch_size=args.batch_size)
+        print(f"✅ {db_path}: 到期 {stats['due']} 个，成功 {stats['fetched']}，失败 {stats['failed']}，"
+              f"耗时 {time.time() - start:.2f} 秒")
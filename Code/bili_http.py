@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-12 20:05:41
+LastEditors  : luyz
+LastEditTime : 2025-09-03 20:41:26
+Description  : Bilibili API 共享请求层（连接池复用、请求头伪装、统一重试退避、请求指标）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import random
+import time
+from email.utils import parsedate_to_datetime
+
+import requests
+from requests.adapters import HTTPAdapter
+from crawl_metrics import get_metrics
+from json_codec import decode
+
+# Bilibili API 默认地址
+DEFAULT_API_BASE = "https://api.bilibili.com"
+
+# 定义 User-Agent 列表（可扩充）
+USER_AGENTS = [
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/114.0.0.0 Safari/537.36",
+    "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/605.1.15 (KHTML, like Gecko) Version/15.1 Safari/605.1.15",
+    "Mozilla/5.0 (Windows NT 10.0; WOW64) Gecko/20100101 Firefox/91.0",
+    "Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 Chrome/104.0.0.0 Safari/537.36"
+]
+
+# 需要重试的 HTTP 状态码（412 为 B 站风控拦截）
+RETRY_STATUS = {412, 429, 500, 502, 503, 504}
+
+def build_headers():
+    """
+    伪装请求头：每次请求随机选择 User-Agent
+    """
+    return {
+        "User-Agent": random.choice(USER_AGENTS),
+        "Referer": "https://www.bilibili.com",
+        "Origin": "https://www.bilibili.com",
+        "Accept": "application/json, text/plain, */*",
+        "Accept-Language": "zh-CN,zh;q=0.9"
+    }
+
+def parse_retry_after(value):
+    """
+    解析 Retry-After 响应头（秒数或 HTTP 日期），无法解析时返回 None
+    """
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+def classify_failure(status_code=None, data=None, invalid_json=False):
+    """
+    统一判定一次请求是否失败以及是否重试（同步客户端与 asyncio 引擎共用）
+
+    参数：
+        status_code: int 或 None - HTTP 状态码，无响应（网络错误、超时）时为 None
+        data: dict 或 None - 解码后的响应体
+        invalid_json: bool - 响应体无法解析
+
+    返回：
+        None 表示请求成功（code 不为 0 的普通 API 错误由 check_api_data 处理，不重试），
+        否则为 (错误码标签, 是否重试, 是否风控)：风控为 -412，响应体解析失败为 invalid_json，无响应为 network
+    """
+    if status_code is None:
+        return "network", True, False
+    if status_code == 412:
+        return -412, True, True
+    if status_code in RETRY_STATUS:
+        return status_code, True, False
+    if status_code >= 400:
+        return status_code, False, False
+    if invalid_json:
+        return "invalid_json", True, False
+    # 风控拦截也可能以 HTTP 200 + code=-412 的形式返回
+    if isinstance(data, dict) and data.get("code") == -412:
+        return -412, True, True
+    return None
+
+def check_api_data(endpoint, data):
+    """
+    校验响应体的 code：为 0 时返回 data，否则记录错误并返回 None
+    """
+    if data is None or data.get("code") != 0:
+        err_code = data.get("code") if data else "None"
+        err_msg = data.get("message") if data else "No response"
+        print(f"⚠️ API 返回错误: code={err_code} message={err_msg}")
+        if data is not None:
+            get_metrics().inc("api_errors_total", endpoint=endpoint, code=err_code)
+        return None
+    return data
+
+class BiliClient:
+    """
+    基于 requests.Session 的 Bilibili API 客户端：
+    1. 长连接复用（keep-alive），连接池大小可配置
+    2. 每次请求随机伪装请求头
+    3. 统一的重试与指数退避：超时、连接错误、5xx、429 以及 412 风控，优先遵循 Retry-After
+       （asyncio 引擎通过 classify_failure / retry_wait 使用同一套重试策略）
+    """
+
+    def __init__(self, api_base=DEFAULT_API_BASE, pool_size=10, timeout=10, max_retries=3,
+                 backoff=1, max_wait=10, risk_wait=30, max_retry_after=120):
+        self.api_base = api_base.rstrip("/")
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.risk_wait = risk_wait
+        self.max_retry_after = max_retry_after
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def retry_wait(self, attempt, retry_after=None, risk_blocked=False):
+        """
+        计算第 attempt 次失败后的等待时间
+
+        参数：
+            retry_after: str 或 None - 响应的 Retry-After 头
+        """
+        wait = min(self.backoff * 2 ** (attempt - 1), self.max_wait)  # 指数退避
+        retry_after = parse_retry_after(retry_after)
+        if retry_after is not None:
+            return min(retry_after, self.max_retry_after)
+        if risk_blocked:
+            return max(wait, self.risk_wait)  # 触发风控时等待更久
+        return wait
+
+    def get_json(self, path, params=None, decoder=decode):
+        """
+        GET 请求 API 并返回 JSON 数据；重试耗尽、响应无法解析或 code 不为 0 时返回 None
+
+        参数：
+            decoder: callable(bytes) -> dict - 响应体解码函数（默认 json_codec.decode，newlist 可使用类型化的 decode_newlist）
+        """
+        url = f"{self.api_base}{path}"
+        metrics = get_metrics()
+        data = None
+        for attempt in range(1, self.max_retries + 1):
+            response, data, invalid_json, reason = None, None, False, None
+            try:
+                with metrics.timer("http_request_seconds", endpoint=path):
+                    response = self.session.get(url, params=params, headers=build_headers(), timeout=self.timeout)
+                if response.ok:
+                    data = decoder(response.content)
+            except requests.RequestException as e:
+                reason = e
+            except ValueError as e:
+                invalid_json, reason = True, e
+
+            failure = classify_failure(response.status_code if response is not None else None, data, invalid_json)
+            if failure is None:
+                break  # 请求成功，跳出重试循环
+            code, retryable, risk_blocked = failure
+            if reason is None:
+                reason = f"API code -412: {data.get('message')}" if code == -412 and response.ok else f"HTTP {response.status_code}"
+            metrics.inc("api_errors_total", endpoint=path, code=code)
+            # 网络错误、可重试状态码、风控以及响应体解析失败时重试，其余 4xx 直接放弃
+            if retryable and attempt < self.max_retries:
+                metrics.inc("http_retries_total", endpoint=path)
+                retry_after = response.headers.get("Retry-After") if response is not None else None
+                sleep_sec = self.retry_wait(attempt, retry_after, risk_blocked)
+                print(f"⚠️ 请求失败（{reason}），第 {attempt} 次，等待 {sleep_sec:.1f}s 后重试...")
+                time.sleep(sleep_sec)
+            else:
+                print(f"❌ 请求失败: {reason}，已放弃")
+                return None
+
+        # 响应校验
+        return check_api_data(path, data)
+
+    def close(self):
+        self.session.close()
+
+# 进程内共享的默认客户端
+_client = None
+
+def configure_client(**kwargs):
+    """
+    重新创建进程内共享的客户端（例如修改 api_base 或连接池大小）
+    """
+    global _client
+    if _client is not None:
+        _client.close()
+    _client = BiliClient(**kwargs)
+    return _client
+
+def get_client():
+    """
+    获取进程内共享的客户端（首次调用时按默认参数创建）
+    """
+    global _client
+    if _client is None:
+        _client = BiliClient()
+    return _client
@@ -0,0 +1,469 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-10 14:02:18
+LastEditors  : luyz
+LastEditTime : 2025-09-05 21:31:08
+Description  : 分区最新投稿抓取引擎（停止条件、按发布时间定位页码、令牌桶限速、asyncio 预取）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import asyncio
+import time
+from collections import OrderedDict, deque
+from datetime import datetime
+
+from bili_http import build_headers, check_api_data, classify_failure, get_client
+from crawl_metrics import get_metrics
+from json_codec import decode_newlist
+from video_record import page_bounds
+
+try:
+    import aiohttp
+except ImportError:  # 仅 asyncio 引擎需要 aiohttp，同步抓取不受影响
+    aiohttp = None
+
+# 单个分区的抓取进度与停止条件
+class CrawlState:
+    """
+    记录单个分区的当前页码，并统一判断停止条件：
+    1. 当前页最大发布时间早于截止时间
+    2. 达到最大页数限制
+    3. 卡页检测（连续多页最早发布时间不降反升时向后跳页）
+    4. 连续多页无数据
+    5. 增量抓取时到达已抓取过的视频（known_timestamp 水位线）
+
+    adaptive_skip=True 时，卡页不再按递增步长盲跳，而是记录 relocate_from = (目标时间戳, 起始页)，
+    由抓取引擎用 locate_page 按发布时间查找到对应页码后调用 jump_to；
+    指定 start_timestamp 时，抓取引擎先定位到该发布时间所在的页再开始抓取（调用 start_at），
+    max_pages 从起始页开始计数；
+    stop_event（threading.Event）被设置时在下一页之前停止（常驻调度器退出时使用）；
+    某页请求重试耗尽或写入数据库失败时抓取引擎调用 fail 停止（failed 为 True）；
+    reached_known 表示本轮确实抓取到了 known_timestamp 水位线或截止日期（只有此时才能推进水位线，
+    因最大页数、连续空页等原因提前停止时，旧水位线与停止位置之间的视频尚未抓取）
+    """
+
+    def __init__(self, region_id, cutoff_timestamp, max_pages=100, max_stagnant=3, skip_step=2, max_empty_pages=5,
+                 known_timestamp=None, start_timestamp=None, adaptive_skip=False, stop_event=None):
+        self.region_id = region_id
+        self.cutoff_timestamp = cutoff_timestamp
+        self.known_timestamp = known_timestamp
+        self.max_pages = max_pages
+        self.max_stagnant = max_stagnant
+        self.skip_step = skip_step
+        self.max_empty_pages = max_empty_pages
+        self.start_timestamp = start_timestamp
+        self.adaptive_skip = adaptive_skip
+        self.stop_event = stop_event
+        self.stopped = False
+        self.failed = False
+        self.reached_known = False
+        self.first_page = 1
+        self.page = 1
+        self.stagnant_count = 0
+        self.empty_count = 0
+        self.last_oldest_time = float('inf')
+        self.oldest_seen = float('inf')
+        self.relocate_from = None
+
+    @property
+    def page_limit(self):
+        """允许抓取的最大页码（max_pages 从起始页开始计数），不限制时为 None"""
+        return self.first_page + self.max_pages - 1 if self.max_pages else None
+
+    def start_at(self, page):
+        """从定位到的页开始抓取"""
+        print(f"🎯 分区 {self.region_id} 从第 {page} 页开始抓取（发布时间 {datetime.fromtimestamp(self.start_timestamp)} 所在的页）")
+        self.first_page = self.page = page
+
+    def jump_to(self, page):
+        """定位完成后跳到指定页（至少前进一页，避免原地重复抓取）"""
+        target = max(page, self.page + 1)
+        print(f"🎯 分区 {self.region_id} 按发布时间定位，从第 {self.page} 页跳到第 {target} 页")
+        self.page = target
+        self.relocate_from = None
+
+    def fail(self, reason="请求失败"):
+        """
+        当前页请求重试耗尽或写入失败：停止抓取并标记 failed（不能当作空页跳过，否则该页的视频会被漏掉；
+        调用方不更新水位线和全量扫描时间，下一轮从头重新抓取）
+
+        返回：
+            False - 与 advance 一致，表示停止
+        """
+        print(f"⏹ 分区 {self.region_id} 第 {self.page} 页{reason}，停止本轮抓取（不更新水位线）")
+        self.failed = True
+        return False
+
+    def advance(self, min_pub_timestamp, max_pub_timestamp):
+        """
+        根据当前页的发布时间范围推进页码
+
+        参数：
+            min_pub_timestamp / max_pub_timestamp: 当前页最早/最晚发布时间戳，无数据时为 None
+
+        返回：
+            bool - True 表示继续抓取 self.page，False 表示停止
+        """
+        if self.stop_event is not None and self.stop_event.is_set():
+            print(f"⏹ 分区 {self.region_id} 收到停止信号，停止抓取")
+            self.stopped = True
+            return False
+
+        # 空页：继续下一页，连续多页为空则停止
+        if max_pub_timestamp is None:
+            self.empty_count += 1
+            if self.empty_count >= self.max_empty_pages:
+                print(f"⏹ 分区 {self.region_id} 连续 {self.empty_count} 页无数据，停止抓取")
+                return False
+            if self.page_limit and self.page >= self.page_limit:
+                print(f"⏹ 已达到最大页数限制 {self.max_pages}")
+                return False
+            self.page += 1
+            return True
+        self.empty_count = 0
+
+        # 检查是否达到截止日期
+        if max_pub_timestamp < self.cutoff_timestamp:
+            print(f"📅 当前最大发布时间戳: {max_pub_timestamp} ({datetime.fromtimestamp(max_pub_timestamp)})")
+            print(f"📅 截止日期: {self.cutoff_timestamp} ({datetime.fromtimestamp(self.cutoff_timestamp)})")
+            print(f"⏹ 已达到截止日期 {datetime.fromtimestamp(self.cutoff_timestamp).strftime('%Y-%m-%d')}，停止抓取")
+            self.reached_known = True
+            return False
+
+        # 检查是否到达上次抓取的最新视频（增量抓取）
+        if self.known_timestamp is not None and min_pub_timestamp <= self.known_timestamp:
+            print(f"⏹ 已到达水位线 {datetime.fromtimestamp(self.known_timestamp)}（之后均为已抓取视频），增量抓取结束")
+            self.reached_known = True
+            return False
+
+        # 检查是否卡页
+        if min_pub_timestamp > self.last_oldest_time:
+            self.stagnant_count += 1
+        else:
+            self.stagnant_count = 0
+        self.oldest_seen = min(self.oldest_seen, min_pub_timestamp)
+        if self.last_oldest_time != float('inf'):
+            print(f"📅 上一次最晚时间戳：{self.last_oldest_time} ({datetime.fromtimestamp(self.last_oldest_time)})")
+        self.last_oldest_time = min_pub_timestamp
+        if self.stagnant_count >= self.max_stagnant:
+            print(f"📅 当前最小发布时间戳：{min_pub_timestamp} ({datetime.fromtimestamp(min_pub_timestamp)})")
+            self.stagnant_count = 0
+            if self.adaptive_skip:
+                # 从已到达的最早发布时间继续：查找第一页最早发布时间不晚于 oldest_seen 的页
+                print(f"⚠️ 检测到卡页，按发布时间查找 {datetime.fromtimestamp(self.oldest_seen)} 所在的页...")
+                self.relocate_from = (self.oldest_seen, self.page + 1)
+                return True
+            print(f"⚠️ 检测到卡页，尝试跳过 {self.skip_step} 页...")
+            self.page += self.skip_step
+            self.skip_step += 2
+            return True
+
+        # 检查是否达到最大页数限制
+        if self.page_limit and self.page >= self.page_limit:
+            print(f"⏹ 已达到最大页数限制 {self.max_pages}")
+            return False
+
+        self.page += 1
+        return True
+
+# 按发布时间定位页码：newlist 按发布时间倒序排列，页码越大发布时间越早
+def page_search(target_timestamp, first_page=1, max_page=None):
+    """
+    查找第一个“最早发布时间不晚于 target_timestamp”的页（倍增探测 + 二分查找）的生成器：
+    每次 yield 一个待探测的页码，调用方 send 回该页的 (最早, 最晚) 发布时间戳，空页或请求失败时 send None，
+    查找结束时通过 StopIteration.value 返回页码（探测次数约为 2·log2(目标页码)）
+
+    空页和请求失败都视为“已越过目标”，结果只会偏早不会偏晚，不会漏掉目标时间之后的视频
+    """
+    def reached(bounds):
+        return bounds is None or bounds[0] <= target_timestamp
+
+    # 倍增探测：first_page, first_page+1, first_page+3, first_page+7 ...，直到越过目标
+    low, step, page = first_page - 1, 1, first_page
+    while True:
+        if max_page and page >= max_page:
+            page = max_page
+            if not reached((yield page)):
+                return max_page
+            break
+        if reached((yield page)):
+            break
+        low, page = page, first_page - 1 + 2 * step
+        step *= 2
+
+    # 二分查找：low 未越过目标（或为起始页之前），page 已越过目标
+    high = page
+    while high - low > 1:
+        mid = (low + high) // 2
+        if reached((yield mid)):
+            high = mid
+        else:
+            low = mid
+    return high
+
+def locate_page(fetch_bounds, target_timestamp, first_page=1, max_page=None):
+    """
+    同步驱动 page_search
+
+    参数：
+        fetch_bounds: callable(page) -> (最早, 最晚) 发布时间戳，空页或失败返回 None
+
+    返回：
+        (page, probes) - 定位到的页码和探测的页数
+    """
+    search = page_search(target_timestamp, first_page, max_page)
+    probes = 0
+    try:
+        page = next(search)
+        while True:
+            probes += 1
+            page = search.send(fetch_bounds(page))
+    except StopIteration as stop:
+        return stop.value, probes
+
+async def locate_page_async(fetch_bounds, target_timestamp, first_page=1, max_page=None):
+    """
+    异步驱动 page_search（fetch_bounds 为协程函数），返回值同 locate_page
+    """
+    search = page_search(target_timestamp, first_page, max_page)
+    probes = 0
+    try:
+        page = next(search)
+        while True:
+            probes += 1
+            page = search.send(await fetch_bounds(page))
+    except StopIteration as stop:
+        return stop.value, probes
+
+# 令牌桶限速器（asyncio 版本），可在多个抓取任务之间共享
+class TokenBucket:
+    """
+    以 rate 个/秒的速度补充令牌，桶容量为 capacity
+    每次请求前调用 acquire() 获取一个令牌，令牌不足时等待
+    """
+
+    def __init__(self, rate, capacity=None):
+        if rate <= 0:
+            raise ValueError("rate 必须大于 0")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self.tokens = self.capacity
+        self.updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated_at) * self.rate)
+        self.updated_at = now
+
+    async def acquire(self, key=None):
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                await asyncio.sleep((1 - self.tokens) / self.rate)
+
+# 多分区公平限速器：共享同一个令牌桶，按分区轮询发放令牌
+class FairTokenBucket(TokenBucket):
+    """
+    每个分区（key）一个等待队列，令牌按分区轮流发放，
+    避免某个分区的大量预取请求占满共享的请求配额
+    """
+
+    def __init__(self, rate, capacity=None):
+        super().__init__(rate, capacity)
+        self.queues = OrderedDict()
+        self._dispatcher = None
+
+    async def acquire(self, key=None):
+        waiter = asyncio.get_running_loop().create_future()
+        self.queues.setdefault(key, deque()).append(waiter)
+        if self._dispatcher is None or self._dispatcher.done():
+            self._dispatcher = asyncio.create_task(self._dispatch())
+        await waiter
+
+    async def _dispatch(self):
+        while self.queues:
+            # 取队首分区的一个请求，然后把该分区移到队尾（轮询）
+            key, queue = next(iter(self.queues.items()))
+            waiter = queue.popleft()
+            if queue:
+                self.queues.move_to_end(key)
+            else:
+                del self.queues[key]
+            if waiter.cancelled():
+                continue
+            await TokenBucket.acquire(self)
+            if not waiter.cancelled():
+                waiter.set_result(None)
+
+# 异步请求最新投稿列表（重试策略与同步客户端一致）
+async def fetch_newlist_async(session, limiter, api_base, rid, pn, ps):
+    """
+    异步获取一页最新投稿列表，返回 API 的 JSON 数据；重试耗尽或 code 不为 0 时返回 None
+    （空页返回 code 为 0、archives 为空的数据，调用方据此区分“请求失败”和“没有数据”）
+
+    是否重试、等待多久（指数退避、412 / code=-412 风控等待、Retry-After）由 bili_http 的
+    classify_failure 和共享客户端的 retry_wait 决定，重试次数为共享客户端的 max_retries
+    """
+    endpoint = "/x/web-interface/newlist"
+    url = f"{api_base}{endpoint}"
+    params = {"rid": rid, "pn": pn, "ps": ps, "type": 0}
+    policy = get_client()
+    metrics = get_metrics()
+
+    data = None
+    for attempt in range(1, policy.max_retries + 1):
+        await limiter.acquire(rid)
+        status, data, invalid_json, reason, retry_after = None, None, False, None, None
+        start = time.perf_counter()
+        try:
+            async with session.get(url, params=params, headers=build_headers()) as response:
+                status = response.status
+                retry_after = response.headers.get("Retry-After")
+                if response.status < 400:
+                    data = decode_newlist(await response.read())
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status, reason = None, repr(e)
+        except ValueError as e:
+            invalid_json, reason = True, repr(e)
+        metrics.observe("http_request_seconds", time.perf_counter() - start, endpoint=endpoint)
+
+        failure = classify_failure(status, data, invalid_json)
+        if failure is None:
+            break
+        code, retryable, risk_blocked = failure
+        if reason is None:
+            reason = f"API code -412: {data.get('message')}" if code == -412 and status < 400 else f"HTTP {status}"
+        metrics.inc("api_errors_total", endpoint=endpoint, code=code)
+        if retryable and attempt < policy.max_retries:
+            metrics.inc("http_retries_total", endpoint=endpoint)
+            sleep_sec = policy.retry_wait(attempt, retry_after, risk_blocked)
+            print(f"⚠️ 第 {pn} 页请求失败（{reason}），第 {attempt} 次，等待 {sleep_sec:.1f}s 后重试...")
+            await asyncio.sleep(sleep_sec)
+        else:
+            print(f"❌ 第 {pn} 页请求失败: {reason}，已放弃")
+            return None
+
+    return check_api_data(endpoint, data)
+
+# 异步抓取单个分区：预取窗口内的页面并发请求，按页码顺序解析和保存
+async def crawl_region_async(state, session, limiter, parse_page, save_page, api_base,
+                             window=4, page_size=50):
+    """
+    按页码顺序处理页面，同时保持最多 window 个页面在途请求
+
+    参数：
+        state: CrawlState - 分区抓取进度与停止条件
+        parse_page: callable(data, rid) -> list[VideoRecord] - 将 API 数据解析为视频记录
+        save_page: callable(region_id, records) - 保存一页视频记录（同步函数，在线程池中执行）
+
+    返回：
+        int - 处理的页数
+    """
+    loop = asyncio.get_running_loop()
+    metrics = get_metrics()
+    inflight = {}
+    next_page = state.page
+    pages_done = 0
+
+    def within_limit(page):
+        return not state.page_limit or page <= max(state.page_limit, state.page)
+
+    async def fetch_bounds(page):
+        data = await fetch_newlist_async(session, limiter, api_base, state.region_id, page, page_size)
+        records = parse_page(data, state.region_id) if data else []
+        return page_bounds(records) if records else None
+
+    # 指定起始发布时间时，先定位到对应页码
+    if state.start_timestamp is not None:
+        page, probes = await locate_page_async(fetch_bounds, state.start_timestamp)
+        print(f"🔎 [分区 {state.region_id}] 定位起始页探测了 {probes} 页")
+        state.start_at(page)
+
+    try:
+        while True:
+            # 卡页跳页后，丢弃已经不需要的预取请求
+            for page in [p for p in inflight if p < state.page]:
+                inflight.pop(page).cancel()
+            next_page = max(next_page, state.page)
+            while len(inflight) < window and within_limit(next_page):
+                inflight[next_page] = asyncio.create_task(fetch_newlist_async(
+                    session, limiter, api_base, state.region_id, next_page, page_size))
+                next_page += 1
+            if state.page not in inflight:
+                break
+
+            print(f"📥 [分区 {state.region_id}] 正在处理第 {state.page} 页的视频数据...")
+            # 预取模式下每页耗时为等待该页响应 + 解析 + 保存的时间（与其他在途请求重叠的部分不计入）
+            page_start = time.perf_counter()
+            data = await inflight.pop(state.page)
+            if data is None:
+                # 重试耗尽的页不能当作空页跳过（该页的视频会被漏掉），停止本轮抓取
+                metrics.observe("page_seconds", time.perf_counter() - page_start, region=state.region_id)
+                state.fail()
+                break
+            records = parse_page(data, state.region_id)
+            metrics.observe("page_rows", len(records), region=state.region_id)
+            if records:
+                try:
+                    await loop.run_in_executor(None, save_page, state.region_id, records)
+                except Exception as e:
+                    # 写入失败的页同样不能跳过，否则水位线会越过未保存的视频
+                    print(f"❌ 保存数据时出错: {e}")
+                    metrics.observe("page_seconds", time.perf_counter() - page_start, region=state.region_id)
+                    state.fail("写入失败")
+                    break
+                keep_going = state.advance(*page_bounds(records))
+            else:
+                print("📭 未获取到视频数据")
+                keep_going = state.advance(None, None)
+            metrics.observe("page_seconds", time.perf_counter() - page_start, region=state.region_id)
+            pages_done += 1
+            if not keep_going:
+                break
+            if state.relocate_from:
+                page, probes = await locate_page_async(fetch_bounds, *state.relocate_from)
+                print(f"🔎 [分区 {state.region_id}] 卡页重新定位探测了 {probes} 页")
+                state.jump_to(page)
+    finally:
+        for task in inflight.values():
+            task.cancel()
+    return pages_done
+
+# 异步抓取入口：创建连接池和限速器后抓取一个或多个分区
+async def crawl_async(states, parse_page, save_page, api_base,
+                      window=4, rps=2.0, page_size=50, pool_size=10, timeout=10):
+    """
+    所有分区共享一个 aiohttp 连接池和一个公平令牌桶（总请求频率不超过 rps），
+    每个分区保留各自的抓取进度、截止时间和卡页状态
+
+    参数：
+        states: list[CrawlState] - 各分区的抓取状态
+
+    返回：
+        dict - region_id -> 处理的页数（抓取失败为 None）
+    """
+    if aiohttp is None:
+        raise RuntimeError("asyncio 抓取引擎需要安装 aiohttp：pip install aiohttp")
+    limiter = FairTokenBucket(rps)
+    connector = aiohttp.TCPConnector(limit=pool_size)
+    client_timeout = aiohttp.ClientTimeout(total=timeout)
+    async with aiohttp.ClientSession(connector=connector, timeout=client_timeout) as session:
+        pages = await asyncio.gather(*(
+            crawl_region_async(state, session, limiter, parse_page, save_page,
+                               api_base, window=window, page_size=page_size)
+            for state in states
+        ), return_exceptions=True)
+
+    results = {}
+    for state, result in zip(states, pages):
+        if isinstance(result, Exception):
+            print(f"❌ 分区 {state.region_id} 抓取失败: {result!r}")
+            result = None
+        results[state.region_id] = result
+    return results
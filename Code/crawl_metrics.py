@@ -0,0 +1,201 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-26 20:08:44
+LastEditors  : luyz
+LastEditTime : 2025-08-30 20:02:48
+Description  : 抓取过程的结构化指标（HTTP 延迟直方图、重试、错误码、每页行数、写锁等待/持有时间、每页耗时），导出为 JSON lines 或 Prometheus 文本
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+# 直方图桶上限：耗时（秒）和每页行数
+SECONDS_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+ROWS_BUCKETS = (0, 1, 5, 10, 20, 30, 40, 50)
+GROUP_BUCKETS = (1, 2, 4, 8, 16, 32, 64)
+DEPTH_BUCKETS = (0, 1, 2, 4, 8, 16)
+
+# 指标名 -> (类型, 说明, 直方图桶)
+METRIC_DEFINITIONS = {
+    "http_request_seconds": ("histogram", "单次 HTTP 请求耗时（每次尝试各记一次）", SECONDS_BUCKETS),
+    "http_retries_total": ("counter", "HTTP 请求重试次数", None),
+    "api_errors_total": ("counter", "API 错误次数（code 为 HTTP 状态码、API 错误码或 network）", None),
+    "page_rows": ("histogram", "每页解析出的视频数", ROWS_BUCKETS),
+    "page_seconds": ("histogram", "每页从请求到保存完成的总耗时", SECONDS_BUCKETS),
+    "db_lock_wait_seconds": ("histogram", "等待数据库写锁的时间", SECONDS_BUCKETS),
+    "db_lock_hold_seconds": ("histogram", "持有数据库写锁的时间（写入事务耗时）", SECONDS_BUCKETS),
+    "db_rows_written_total": ("counter", "写入数据库的行数", None),
+    "db_commit_seconds": ("histogram", "一个写入批次从提交到提交完成的时间（含等锁或等待写入进程）", SECONDS_BUCKETS),
+    "writer_group_size": ("histogram", "写入进程每次组提交合并的批次数", GROUP_BUCKETS),
+    "pipeline_stage_seconds": ("histogram", "流水线各阶段处理一页的耗时（stage 为 fetch/parse/classify/persist）", SECONDS_BUCKETS),
+    "pipeline_queue_depth": ("histogram", "流水线各阶段放入下游队列后的队列深度", DEPTH_BUCKETS)
+}
+
+def escape_label_value(value):
+    """转义 Prometheus 标签值中的反斜杠、双引号和换行"""
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+class Histogram:
+    """累积直方图：每个桶记录不大于上限的观测数，另记总数和总和"""
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+
+    def quantile(self, q):
+        """按桶估算分位数（返回所在桶的上限，超出最后一个桶时返回 inf）"""
+        if not self.count:
+            return None
+        rank = q * self.count
+        for bound, cumulative in zip(self.buckets, self.counts):
+            if cumulative >= rank:
+                return bound
+        return float("inf")
+
+class Metrics:
+    """
+    进程内指标注册表（线程安全），按 (指标名, 标签) 记录计数器和直方图
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}
+        self.histograms = {}
+        self.started_at = time.time()
+
+    @staticmethod
+    def key(name, labels):
+        return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, **labels):
+        key = self.key(name, labels)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram(METRIC_DEFINITIONS[name][2])
+            histogram.observe(value)
+
+    @contextmanager
+    def timer(self, name, **labels):
+        """记录 with 块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(name, time.perf_counter() - start, **labels)
+
+    @contextmanager
+    def timed_lock(self, lock, **labels):
+        """获取锁并分别记录等待时间和持有时间"""
+        start = time.perf_counter()
+        with lock:
+            acquired = time.perf_counter()
+            self.observe("db_lock_wait_seconds", acquired - start, **labels)
+            try:
+                yield
+            finally:
+                self.observe("db_lock_hold_seconds", time.perf_counter() - acquired, **labels)
+
+    def reset(self):
+        with self.lock:
+            self.counters.clear()
+            self.histograms.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        """导出为可 JSON 序列化的字典"""
+        with self.lock:
+            counters = [{"name": name, "labels": dict(labels), "value": value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{
+                "name": name, "labels": dict(labels), "count": h.count, "sum": round(h.sum, 6),
+                "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                "buckets": dict(zip(map(str, h.buckets), h.counts))
+            } for (name, labels), h in sorted(self.histograms.items())]
+        return {"started_at": int(self.started_at), "finished_at": int(time.time()),
+                "counters": counters, "histograms": histograms}
+
+    def write_jsonl(self, path, **extra):
+        """追加一行 JSON（每轮一行，extra 为附加字段，例如分区 ID）"""
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        record = {**extra, **self.snapshot()}
+        with open(path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def write_prometheus(self, path, **extra_labels):
+        """以 Prometheus 文本格式原子写入（可供 node_exporter textfile collector 采集）"""
+        def format_labels(labels, extra=()):
+            items = list(labels) + list(extra_labels.items()) + list(extra)
+            if not items:
+                return ""
+            return "{" + ",".join(f'{k}="{escape_label_value(v)}"' for k, v in items) + "}"
+
+        lines = []
+        with self.lock:
+            for name, (kind, help_text, _) in METRIC_DEFINITIONS.items():
+                full_name = f"bili_{name}"
+                if kind == "counter":
+                    series = [(labels, v) for (n, labels), v in sorted(self.counters.items()) if n == name]
+                    if not series:
+                        continue
+                    lines += [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} counter"]
+                    lines += [f"{full_name}{format_labels(labels)} {v}" for labels, v in series]
+                else:
+                    series = [(labels, h) for (n, labels), h in sorted(self.histograms.items()) if n == name]
+                    if not series:
+                        continue
+                    lines += [f"# HELP {full_name} {help_text}", f"# TYPE {full_name} histogram"]
+                    for labels, h in series:
+                        for bound, cumulative in zip(h.buckets, h.counts):
+                            lines.append(f"{full_name}_bucket{format_labels(labels, [('le', bound)])} {cumulative}")
+                        lines.append(f"{full_name}_bucket{format_labels(labels, [('le', '+Inf')])} {h.count}")
+                        lines.append(f"{full_name}_sum{format_labels(labels)} {h.sum:.6f}")
+                        lines.append(f"{full_name}_count{format_labels(labels)} {h.count}")
+
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        tmp_path = f"{path}.tmp.{os.getpid()}"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
+        os.replace(tmp_path, path)
+
+    def summary(self):
+        """按指标汇总耗时（秒）和次数，用于每轮结束时打印“时间花在哪里”"""
+        totals = {}
+        with self.lock:
+            for (name, _), h in self.histograms.items():
+                if name.endswith("_seconds"):
+                    total = totals.setdefault(name, [0.0, 0])
+                    total[0] += h.sum
+                    total[1] += h.count
+            retries = sum(v for (n, _), v in self.counters.items() if n == "http_retries_total")
+            errors = sum(v for (n, _), v in self.counters.items() if n == "api_errors_total")
+        parts = [f"{name}={total:.1f}s/{count}次" for name, (total, count) in sorted(totals.items())]
+        parts += [f"重试={retries}", f"错误={errors}"]
+        return "，".join(parts)
+
+# 进程内共享的指标注册表
+_metrics = Metrics()
+
+def get_metrics():
+    """获取进程内共享的指标注册表"""
+    return _metrics
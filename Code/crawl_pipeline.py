@@ -0,0 +1,255 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-30 19:18:26
+LastEditors  : luyz
+LastEditTime : 2025-09-05 21:46:33
+Description  : 流水线抓取：请求、解析、分类、写入四个阶段各占一个线程，阶段之间用有界队列连接，写入第 N 页时已在请求第 N+1 页
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import queue
+import threading
+import time
+from crawl_metrics import get_metrics
+from video_record import page_bounds
+
+# 各阶段之间队列的默认容量（请求阶段最多领先解析阶段 depth 页）
+DEFAULT_QUEUE_DEPTH = 2
+
+# 队列结束标记
+STOP = object()
+
+class PageCursor:
+    """
+    请求阶段的下一页页码：请求阶段按顺序预取，解析阶段在 CrawlState 跳页时重置（generation 加一，
+    之前预取的旧页面在解析阶段被丢弃），抓取结束时 finish 让请求阶段退出
+    """
+
+    def __init__(self, page):
+        self.cond = threading.Condition()
+        self.page = page
+        self.generation = 0
+        self.done = False
+
+    def reset(self, page):
+        with self.cond:
+            self.generation += 1
+            self.page = page
+            self.cond.notify_all()
+
+    def finish(self):
+        with self.cond:
+            self.done = True
+            self.cond.notify_all()
+
+    def next(self, limit):
+        """
+        领取下一页；页码超过 limit() 时等待解析阶段跳页或结束
+
+        返回：
+            (generation, page) 或 None（抓取已结束）
+        """
+        with self.cond:
+            while not self.done and not limit(self.page):
+                self.cond.wait(timeout=1)
+            if self.done:
+                return None
+            page = self.page
+            self.page += 1
+            return self.generation, page
+
+class PipelineStats:
+    """
+    各阶段处理的页数和忙碌时间（吞吐量 = 页数 / 忙碌时间），以及各队列每次放入后的深度
+    同时写入共享指标（pipeline_stage_seconds、pipeline_queue_depth）
+    """
+
+    def __init__(self, region_id):
+        self.region_id = region_id
+        self.lock = threading.Lock()
+        self.stages = {}
+        self.queues = {}
+        self.dropped = 0
+        self.started_at = time.perf_counter()
+
+    def record_stage(self, stage, seconds):
+        get_metrics().observe("pipeline_stage_seconds", seconds, stage=stage, region=self.region_id)
+        with self.lock:
+            items, busy = self.stages.get(stage, (0, 0.0))
+            self.stages[stage] = (items + 1, busy + seconds)
+
+    def record_depth(self, name, depth):
+        get_metrics().observe("pipeline_queue_depth", depth, queue=name, region=self.region_id)
+        with self.lock:
+            count, total, peak = self.queues.get(name, (0, 0, 0))
+            self.queues[name] = (count + 1, total + depth, max(peak, depth))
+
+    def summary(self):
+        elapsed = max(time.perf_counter() - self.started_at, 1e-9)
+        with self.lock:
+            stages = [f"{stage} {items} 页 {items / max(busy, 1e-9):.1f} 页/秒（忙碌 {busy / elapsed:.0%}）"
+                      for stage, (items, busy) in self.stages.items()]
+            queues = [f"{name} 平均 {total / count:.1f} 最大 {peak}"
+                      for name, (count, total, peak) in self.queues.items()]
+        text = "，".join(stages)
+        if queues:
+            text += "；队列深度：" + "，".join(queues)
+        if self.dropped:
+            text += f"；跳页丢弃预取 {self.dropped} 页"
+        return text
+
+def put_item(q, name, item, stats):
+    """放入队列（队列已满时阻塞，形成背压）并记录放入后的深度"""
+    q.put(item)
+    stats.record_depth(name, q.qsize())
+
+def run_stage(name, func, inbox, outbox, stats, failed):
+    """
+    通用阶段：从 inbox 取出一项交给 func 处理，结果放入 outbox（None 表示丢弃）；
+    出错时设置 failed（threading.Event），由解析阶段停止本轮抓取（出错的页没有写入数据库，不能当作已抓取），
+    之后的页面不再处理；收到结束标记时向下游传递并退出
+    """
+    while True:
+        item = inbox.get()
+        if item is STOP:
+            if outbox is not None:
+                outbox.put(STOP)
+            return
+        if failed.is_set():
+            continue  # 已有页面处理失败，本轮抓取即将停止，丢弃剩余页面
+        start = time.perf_counter()
+        try:
+            result = func(item)
+        except Exception as e:
+            print(f"❌ [{name}] 处理出错，停止本轮抓取: {e}")
+            failed.set()
+            result = None
+        stats.record_stage(name, time.perf_counter() - start)
+        if outbox is not None and result is not None:
+            put_item(outbox, name, result, stats)
+
+def crawl_pipeline(state, fetch_page, parse_page, classify_page, persist_page, locate=None,
+                   depth=DEFAULT_QUEUE_DEPTH, pace=None):
+    """
+    以流水线方式抓取单个分区，停止条件与逐页抓取一致（由 CrawlState 判断）
+
+    各阶段：
+        fetch: fetch_page(page) -> data（API 原始数据，失败为 None，解析阶段遇到失败的页时停止抓取），按页码顺序预取
+        parse: parse_page(data) -> records（VideoRecord 列表），并调用 state.advance 决定下一页或停止
+        classify: classify_page(records) -> payload（组装批次、计算时间类型等，None 表示无需写入）
+        persist: persist_page(payload)，写入数据库
+    解析、分类或写入出错时调用 state.fail 停止本轮抓取（与请求失败一致，调用方不更新水位线）
+
+    参数：
+        locate: callable(target_timestamp, first_page) -> (page, probes) - 卡页时按发布时间重新定位页码
+        pace: callable 或 None - 每次请求之后调用（控制请求频率）
+
+    返回：
+        (int, PipelineStats) - 处理的页数、各阶段统计
+    """
+    stats = PipelineStats(state.region_id)
+    cursor = PageCursor(state.page)
+    parse_q = queue.Queue(maxsize=depth)
+    classify_q = queue.Queue(maxsize=depth)
+    persist_q = queue.Queue(maxsize=depth)
+    failed = threading.Event()
+
+    def within_limit(page):
+        return not state.page_limit or page <= max(state.page_limit, state.page)
+
+    def fetch_loop():
+        try:
+            while True:
+                ticket = cursor.next(within_limit)
+                if ticket is None:
+                    return
+                generation, page = ticket
+                start = time.perf_counter()
+                try:
+                    data = fetch_page(page)
+                except Exception as e:
+                    print(f"❌ [fetch] 请求第 {page} 页出错: {e}")
+                    data = None
+                stats.record_stage("fetch", time.perf_counter() - start)
+                put_item(parse_q, "fetch", (generation, page, data), stats)
+                if pace:
+                    pace()
+        finally:
+            parse_q.put(STOP)
+
+    workers = [
+        threading.Thread(target=fetch_loop, name="pipeline-fetch", daemon=True),
+        threading.Thread(target=run_stage, args=("classify", classify_page, classify_q, persist_q, stats, failed),
+                         name="pipeline-classify", daemon=True),
+        threading.Thread(target=run_stage, args=("persist", persist_page, persist_q, None, stats, failed),
+                         name="pipeline-persist", daemon=True)
+    ]
+    for worker in workers:
+        worker.start()
+
+    # 解析阶段在当前线程中运行：只有它修改 CrawlState，并负责在跳页时重置请求阶段
+    metrics = get_metrics()
+    pages_done = 0
+    item = None
+    try:
+        while True:
+            item = parse_q.get()
+            if item is STOP:
+                break  # 请求阶段异常退出
+            generation, page, data = item
+            if failed.is_set():
+                state.fail("之前的页面分类或写入失败")
+                break
+            if generation != cursor.generation or page != state.page:
+                stats.dropped += 1  # 跳页前预取的页面
+                continue
+
+            start = time.perf_counter()
+            print(f"📥 [分区 {state.region_id}] 正在处理第 {page} 页的视频数据...")
+            if data is None:
+                # 请求失败（重试耗尽）的页不能当作空页跳过，停止本轮抓取
+                stats.record_stage("parse", time.perf_counter() - start)
+                state.fail()
+                break
+            try:
+                records = parse_page(data)
+            except Exception as e:
+                print(f"❌ [parse] 解析第 {page} 页出错: {e}")
+                stats.record_stage("parse", time.perf_counter() - start)
+                state.fail("解析失败")
+                break
+            metrics.observe("page_rows", len(records), region=state.region_id)
+            if records:
+                keep_going = state.advance(*page_bounds(records))
+            else:
+                print("📭 未获取到视频数据")
+                keep_going = state.advance(None, None)
+            stats.record_stage("parse", time.perf_counter() - start)
+            if records:
+                put_item(classify_q, "parse", records, stats)
+            pages_done += 1
+            if not keep_going:
+                break
+
+            if state.relocate_from and locate:
+                target, probes = locate(*state.relocate_from)
+                print(f"🔎 [分区 {state.region_id}] 卡页重新定位探测了 {probes} 页")
+                state.jump_to(target)
+            elif state.relocate_from:
+                state.jump_to(state.page + 1)
+            if state.page != page + 1:
+                cursor.reset(state.page)  # 跳页：之前预取的页面作废
+    finally:
+        # 结束请求阶段（排空队列，避免它阻塞在已满的队列上），再等待分类和写入阶段处理完剩余页面
+        cursor.finish()
+        while item is not STOP:
+            item = parse_q.get()
+        classify_q.put(STOP)
+        for worker in workers:
+            worker.join()
+    if failed.is_set() and not state.failed:
+        # 解析阶段结束后才处理完的页面写入失败
+        state.fail("之前的页面分类或写入失败")
+    return pages_done, stats
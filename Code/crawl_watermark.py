@@ -0,0 +1,156 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-14 20:41:09
+LastEditors  : luyz
+LastEditTime : 2025-09-05 20:36:12
+Description  : 增量抓取水位线（每个分区记录已抓取的最新视频和上次全量扫描时间）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import sqlite3
+import time
+from datetime import datetime
+from filelock import FileLock
+from db_schema import connect_db
+
+# 抓取模式
+# full:    每轮从第 1 页抓取到截止日期（原有行为）
+# fresh:   只抓取新投稿，遇到已抓取过的视频即停止
+# refresh: 从第 1 页抓取到截止日期，刷新旧视频的统计数据，并记录全量扫描时间
+# auto:    距离上次足够深的全量扫描超过 refresh_interval 时执行 refresh，否则执行 fresh
+CRAWL_MODES = ["full", "fresh", "refresh", "auto"]
+
+# last_full_sweep_cutoff 为上次全量扫描的截止时间戳（扫描深度）：5 天榜单和 1 年榜单的循环共用同一行，
+# 浅的全量扫描不能让深的 refresh 误以为已经完成
+CREATE_CRAWL_STATE_SQL = '''
+    CREATE TABLE IF NOT EXISTS crawl_state (
+        region_id INTEGER PRIMARY KEY,
+        high_water_pub_timestamp INTEGER,
+        high_water_bvid TEXT,
+        last_full_sweep INTEGER,
+        last_full_sweep_cutoff INTEGER
+    )
+'''
+
+# 比较扫描深度时允许的误差（截止日期按天对齐，同一循环两轮的深度最多相差一天）
+SWEEP_DEPTH_TOLERANCE = 86400
+
+def ensure_crawl_state_table(conn):
+    """
+    如果不存在则创建 crawl_state 水位线表（旧表原地补充 last_full_sweep_cutoff 列）
+    """
+    conn.execute(CREATE_CRAWL_STATE_SQL)
+    columns = [row[1] for row in conn.execute("PRAGMA table_info(crawl_state)").fetchall()]
+    if "last_full_sweep_cutoff" not in columns:
+        conn.execute("ALTER TABLE crawl_state ADD COLUMN last_full_sweep_cutoff INTEGER")
+
+def load_crawl_state(db_path, region_id):
+    """
+    读取分区水位线
+
+    返回：
+        dict - high_water_pub_timestamp / high_water_bvid / last_full_sweep / last_full_sweep_cutoff（无记录时均为 None）
+    """
+    keys = ["high_water_pub_timestamp", "high_water_bvid", "last_full_sweep", "last_full_sweep_cutoff"]
+    conn = sqlite3.connect(db_path)
+    try:
+        row = conn.execute(f"SELECT {', '.join(keys)} FROM crawl_state WHERE region_id = ?", (region_id,)).fetchone()
+    except sqlite3.OperationalError:
+        row = None
+    finally:
+        conn.close()
+    return dict(zip(keys, row if row else (None,) * len(keys)))
+
+def plan_crawl_pass(db_path, region_id, mode, refresh_interval, cutoff_timestamp=None):
+    """
+    根据抓取模式和水位线决定本轮的抓取方式
+
+    参数：
+        mode: str - full / fresh / refresh / auto
+        refresh_interval: int - auto 模式下两次全量扫描的最小间隔（秒）
+        cutoff_timestamp: float - 本轮的截止时间戳；auto 模式下只有截止时间不晚于它的全量扫描才算数
+            （上次全量扫描深度未知时视为不够深）
+
+    返回：
+        (full_sweep, known_timestamp)
+        full_sweep: bool - 本轮是否为抓取到截止日期的全量扫描
+        known_timestamp: int 或 None - fresh 抓取的停止水位线（None 表示不按水位线停止）
+    """
+    if mode == "full":
+        return True, None
+
+    state = load_crawl_state(db_path, region_id)
+    high_water = state["high_water_pub_timestamp"]
+    last_sweep = state["last_full_sweep"]
+    sweep_cutoff = state["last_full_sweep_cutoff"]
+
+    if mode == "auto":
+        deep_enough = sweep_cutoff is not None and (cutoff_timestamp is None or sweep_cutoff <= cutoff_timestamp)
+        due = last_sweep is None or not deep_enough or time.time() - last_sweep >= refresh_interval
+        mode = "refresh" if due else "fresh"
+    if mode == "refresh":
+        print(f"🔁 分区 {region_id} 执行 refresh 全量扫描"
+              + (f"（上次全量扫描: {datetime.fromtimestamp(last_sweep)}）" if last_sweep else ""))
+        return True, None
+
+    if high_water is None:
+        print(f"🆕 分区 {region_id} 尚无水位线，本轮抓取到截止日期")
+        return False, None
+    print(f"⚡ 分区 {region_id} 执行 fresh 增量抓取，水位线: {state['high_water_bvid']} "
+          f"({datetime.fromtimestamp(high_water)})")
+    return False, high_water
+
+def update_crawl_state(db_path, region_id, full_sweep, reached_known=True, cutoff_timestamp=None):
+    """
+    抓取结束后，根据数据库中该分区最新的视频更新水位线；全量扫描时同时记录扫描时间和截止时间戳（扫描深度）
+    已记录的全量扫描更深时（例如 1 年循环的 refresh 之后运行 5 天循环的 full），保留更深的记录
+
+    参数：
+        cutoff_timestamp: float - 本轮的截止时间戳（全量扫描深度）
+        reached_known: bool - 本轮是否抓取到了旧水位线或截止日期（CrawlState.reached_known）；
+            为 False 时（因最大页数、连续空页等提前停止）旧水位线与停止位置之间可能有未抓取的视频，
+            保留旧水位线，下一轮增量抓取仍抓到旧水位线为止（尚无水位线时照常记录）
+    """
+    lock_path = db_path + ".lock"
+    conn = connect_db(db_path)
+    try:
+        with FileLock(lock_path):
+            with conn:
+                previous = conn.execute(
+                    "SELECT high_water_pub_timestamp, high_water_bvid, last_full_sweep, last_full_sweep_cutoff "
+                    "FROM crawl_state WHERE region_id = ?",
+                    (region_id,)
+                ).fetchone()
+                if reached_known or not previous or previous[0] is None:
+                    newest = conn.execute(
+                        "SELECT pub_timestamp, bvid FROM videos WHERE region_id = ? ORDER BY pub_timestamp DESC LIMIT 1",
+                        (region_id,)
+                    ).fetchone()
+                    pub_timestamp, bvid = newest if newest else (None, None)
+                else:
+                    pub_timestamp, bvid = previous[:2]
+                    print(f"⚠️ 分区 {region_id} 本轮未抓取到旧水位线或截止日期，保留水位线 {bvid} "
+                          f"({datetime.fromtimestamp(pub_timestamp)})")
+                now = int(time.time())
+                sweep = (now, int(cutoff_timestamp) if cutoff_timestamp is not None else None) if full_sweep else None
+                if sweep and previous and previous[2] is not None and previous[3] is not None:
+                    # 比较深度（扫描时间 - 截止时间），新的全量扫描明显更浅时保留原记录
+                    new_depth = now - sweep[1] if sweep[1] is not None else 0
+                    if new_depth + SWEEP_DEPTH_TOLERANCE < previous[2] - previous[3]:
+                        sweep = None
+                last_sweep, sweep_cutoff = sweep if sweep else (None, None)
+                conn.execute('''
+                    INSERT INTO crawl_state (region_id, high_water_pub_timestamp, high_water_bvid, last_full_sweep,
+                                             last_full_sweep_cutoff)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT(region_id) DO UPDATE SET
+                        high_water_pub_timestamp = excluded.high_water_pub_timestamp,
+                        high_water_bvid = excluded.high_water_bvid,
+                        last_full_sweep = COALESCE(excluded.last_full_sweep, crawl_state.last_full_sweep),
+                        last_full_sweep_cutoff = CASE WHEN excluded.last_full_sweep IS NULL
+                            THEN crawl_state.last_full_sweep_cutoff ELSE excluded.last_full_sweep_cutoff END
+                ''', (region_id, pub_timestamp, bvid, last_sweep, sweep_cutoff))
+    finally:
+        conn.close()
@@ -0,0 +1,143 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-17 14:08:26
+LastEditors  : luyz
+LastEditTime : 2025-09-05 22:12:40
+Description  : SQLite 连接参数（WAL / PRAGMA）与带版本号的表结构迁移（报表查询索引）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import sqlite3
+from filelock import FileLock
+
+# 每个连接都需要设置的 PRAGMA（WAL 模式下 synchronous=NORMAL 不会损坏数据库，只可能丢失最后一次提交）
+CONNECTION_PRAGMAS = [
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 30000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -20000"  # 约 20MB 页缓存
+]
+
+def seed_uploaders_from_video_types(conn):
+    """
+    迁移步骤：旧版本 video_types 表逐行保存粉丝数（follower 列），升级后粉丝数改由 uploaders 维度表提供，
+    将每个 UP 主最近一次非空的粉丝数（及其采集时间）写入 uploaders 和粉丝数历史，避免升级后榜单粉丝数全部为空；
+    新建的 video_types 表没有 follower 列时跳过
+    """
+    from follower_service import ensure_uploader_table  # follower_service 依赖本模块，延迟导入避免循环
+    if "follower" not in get_table_columns(conn, "video_types"):
+        return
+    ensure_uploader_table(conn)
+    latest = '''
+        SELECT up_id, up_name, follower, MAX(fetch_timestamp) AS fetched_at
+        FROM video_types
+        WHERE up_id IS NOT NULL AND follower IS NOT NULL AND fetch_timestamp IS NOT NULL
+        GROUP BY up_id
+    '''
+    conn.execute(f'''
+        INSERT INTO uploaders (up_id, up_name, follower, fetched_at, last_attempt_at)
+        SELECT up_id, up_name, follower, fetched_at, fetched_at FROM ({latest}) WHERE 1
+        ON CONFLICT(up_id) DO UPDATE SET
+            up_name = COALESCE(uploaders.up_name, excluded.up_name),
+            follower = excluded.follower,
+            fetched_at = excluded.fetched_at
+        WHERE uploaders.fetched_at IS NULL OR uploaders.fetched_at < excluded.fetched_at
+    ''')
+    conn.execute(f'''
+        INSERT OR IGNORE INTO uploader_follower_history (up_id, fetched_at, follower)
+        SELECT up_id, fetched_at, follower FROM ({latest})
+    ''')
+
+# 表结构迁移：按主表名区分数据库类型，每一步为 (版本号, 说明, 步骤列表)
+# 步骤为 SQL 字符串，或接收连接的函数（需要按现有表结构决定是否执行的迁移）
+# 版本号记录在 PRAGMA user_version 中，只执行高于当前版本的步骤；新增迁移时在列表末尾追加
+MIGRATIONS = {
+    "videos": [
+        (1, "报表查询索引（按发布时间过滤、按播放数排序）与分区水位线索引", [
+            "CREATE INDEX IF NOT EXISTS idx_videos_pub_view ON videos (pub_timestamp, view)",
+            "CREATE INDEX IF NOT EXISTS idx_videos_region_pub ON videos (region_id, pub_timestamp)"
+        ])
+    ],
+    "video_types": [
+        (1, "报表查询索引（按类型过滤、按播放数排序）", [
+            "CREATE INDEX IF NOT EXISTS idx_video_types_type_view ON video_types (type, view)",
+            "CREATE INDEX IF NOT EXISTS idx_video_types_type_pub ON video_types (type, pub_timestamp)"
+        ]),
+        (2, "将 video_types 中已有的粉丝数迁移到 uploaders 维度表", [seed_uploaders_from_video_types])
+    ]
+}
+
+class DBConnection(sqlite3.Connection):
+    """
+    带表结构缓存的连接（sqlite3.Connection 不支持弱引用和自定义属性，缓存只能挂在子类实例上）
+    """
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.table_columns_cache = {}
+
+def connect_db(db_path):
+    """
+    打开数据库连接并设置连接级 PRAGMA
+    """
+    conn = sqlite3.connect(db_path, factory=DBConnection)
+    for pragma in CONNECTION_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+def get_table_columns(conn, table_name):
+    """
+    通过 PRAGMA table_info 获取表的列名列表（表不存在时返回空列表）
+    使用 connect_db 打开的连接会缓存结果，同一连接内重复调用不再查询
+    """
+    cache = getattr(conn, "table_columns_cache", None)
+    if cache is not None and table_name in cache:
+        return cache[table_name]
+    columns = [row[1] for row in conn.execute(f"PRAGMA table_info(`{table_name}`)").fetchall()]
+    if cache is not None:
+        cache[table_name] = columns
+    return columns
+
+def get_schema_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+def migrate_db(db_path, table_name):
+    """
+    启用 WAL 并执行 table_name 对应数据库的未完成迁移（需在建表之后调用）
+    迁移在文件锁内执行，每一步单独一个事务，失败时回滚该步骤
+
+    返回：
+        int - 迁移后的版本号
+    """
+    steps = MIGRATIONS.get(table_name, [])
+    conn = connect_db(db_path)
+    try:
+        with FileLock(db_path + ".lock"):
+            # WAL 模式持久化在数据库文件中，读写互不阻塞
+            conn.execute("PRAGMA journal_mode = WAL")
+            version = get_schema_version(conn)
+            for target, description, statements in steps:
+                if target <= version:
+                    continue
+                with conn:
+                    conn.execute("BEGIN")
+                    for step in statements:
+                        if callable(step):
+                            step(conn)
+                        else:
+                            conn.execute(step)
+                    conn.execute(f"PRAGMA user_version = {int(target)}")
+                print(f"🛠️ 数据库迁移到版本 {target}: {description}")
+                version = target
+            # 让查询规划器根据需要收集索引统计信息（在索引之间选择更优的计划）
+            conn.execute("PRAGMA optimize")
+    finally:
+        conn.close()
+    return version
+
+def explain_query_plan(conn, sql, params=()):
+    """
+    返回查询计划的说明文字列表（EXPLAIN QUERY PLAN 的 detail 列）
+    """
+    return [row[-1] for row in conn.execute(f"EXPLAIN QUERY PLAN {sql}", params).fetchall()]
@@ -0,0 +1,285 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-27 20:11:06
+LastEditors  : luyz
+LastEditTime : 2025-09-03 21:52:17
+Description  : 单写入进程模式：爬虫通过 Unix socket 提交写入批次，写入进程持有 SQLite 连接（WAL）并按组提交
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import os
+import queue
+import socket
+import sqlite3
+import threading
+import time
+from multiprocessing import AuthenticationError
+from multiprocessing.connection import Client, Listener
+from filelock import FileLock
+from crawl_metrics import get_metrics
+from db_schema import connect_db
+
+# 组提交参数：收到第一个批次后最多再等待 group_wait 秒，把期间到达的批次（不超过 max_group 个）合并为一个事务
+DEFAULT_GROUP_WAIT = 0.005
+DEFAULT_MAX_GROUP = 64
+
+# 客户端等待写入进程回复的最长时间（秒）：超时视为写入进程已失效，报错而不是一直阻塞
+DEFAULT_REPLY_TIMEOUT = 120
+
+# 仅用于确认连接方是本项目的爬虫，不是安全边界（socket 文件权限才是）
+AUTHKEY = b"bili-db-writer"
+
+class DBWriterError(sqlite3.Error):
+    """写入进程执行批次失败（继承 sqlite3.Error，调用方无需区分写入模式）"""
+
+def execute_statements(conn, statements):
+    """
+    依次执行一个批次中的语句（需在调用方的事务内执行）
+
+    参数：
+        statements: list - (sql, rows)，rows 为空时跳过
+    """
+    rows_written = 0
+    for sql, rows in statements:
+        if rows:
+            conn.executemany(sql, rows)
+            rows_written += len(rows)
+    return rows_written
+
+def write_with_lock(db_path, statements, table=None):
+    """
+    FileLock 模式：打开连接，在文件锁内用一个事务执行整个批次（记录等锁和持锁时间）
+    """
+    conn = connect_db(db_path)  # 建立连接不涉及写入，放在锁外
+    try:
+        with get_metrics().timed_lock(FileLock(db_path + ".lock"), table=table):
+            with conn:  # 单个事务：全部成功则提交，失败则整体回滚
+                return execute_statements(conn, statements)
+    finally:
+        conn.close()
+
+class DBWriterServer:
+    """
+    单写入进程：每个客户端连接一个接收线程，所有批次进入同一个队列，由唯一的写入线程按数据库分组提交
+
+    组内任一批次失败时整组回滚，再逐个批次单独重试，只让出错的批次返回错误；
+    打开数据库、加锁等整组失败时该组所有批次返回错误，写入线程继续处理后续批次
+    写入时仍持有数据库的 FileLock，与迁移、水位线更新、粉丝数刷新等其他写入方互斥（每组只加锁一次）
+    """
+
+    def __init__(self, address, group_wait=DEFAULT_GROUP_WAIT, max_group=DEFAULT_MAX_GROUP):
+        self.address = address
+        self.group_wait = group_wait
+        self.max_group = max_group
+        self.jobs = queue.Queue()
+        self.connections = {}
+        self.stopped = threading.Event()
+        if os.path.exists(address):
+            os.remove(address)  # 上次异常退出残留的 socket 文件
+        self.listener = Listener(address, family="AF_UNIX", authkey=AUTHKEY)
+        os.chmod(address, 0o600)
+
+    def serve_forever(self):
+        writer = threading.Thread(target=self.writer_loop, daemon=True)
+        writer.start()
+        try:
+            while True:
+                try:
+                    conn = self.listener.accept()
+                except (OSError, EOFError, AuthenticationError):
+                    conn = None  # 握手失败的连接直接丢弃
+                if self.stopped.is_set():
+                    break
+                if conn is not None:
+                    threading.Thread(target=self.handle_client, args=(conn,), daemon=True).start()
+        finally:
+            self.listener.close()
+            if os.path.exists(self.address):
+                os.remove(self.address)
+            self.jobs.put(None)
+            writer.join()
+
+    def shutdown(self):
+        """从其他线程停止 serve_forever：已收到的批次提交完成后返回"""
+        if self.stopped.is_set():
+            return
+        self.stopped.set()
+        # 关闭监听 socket 不会唤醒阻塞中的 accept，连接一次让它返回
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as wakeup:
+            try:
+                wakeup.connect(self.address)
+            except OSError:
+                pass
+
+    def handle_client(self, conn):
+        """接收客户端的批次，等待写入线程提交后回复 (成功, 写入行数或错误信息)"""
+        try:
+            while True:
+                try:
+                    db_path, statements = conn.recv()
+                except (EOFError, OSError):
+                    break
+                reply = queue.Queue(maxsize=1)
+                self.jobs.put((db_path, statements, reply))
+                conn.send(reply.get())
+        finally:
+            conn.close()
+
+    def next_group(self):
+        """取出一组批次：阻塞等待第一个，之后在 group_wait 内尽量多取；收到停止信号时返回 None"""
+        job = self.jobs.get()
+        if job is None:
+            return None
+        group = [job]
+        deadline = time.monotonic() + self.group_wait
+        while len(group) < self.max_group:
+            remaining = deadline - time.monotonic()
+            try:
+                job = self.jobs.get(timeout=remaining) if remaining > 0 else self.jobs.get_nowait()
+            except queue.Empty:
+                break
+            if job is None:
+                self.jobs.put(None)  # 先提交已取出的批次，下一轮再退出
+                break
+            group.append(job)
+        return group
+
+    def writer_loop(self):
+        try:
+            while True:
+                group = self.next_group()
+                if group is None:
+                    break
+                by_db = {}
+                for job in group:
+                    by_db.setdefault(job[0], []).append(job)
+                for db_path, jobs in by_db.items():
+                    try:
+                        self.commit_group(db_path, jobs)
+                    except Exception as e:
+                        # 例如数据库文件无法打开：该组批次全部返回错误，写入线程不能因此退出（否则客户端会一直等待回复）
+                        print(f"❌ 写入 {db_path} 失败: {e!r}")
+                        for _, _, reply in jobs:
+                            try:
+                                reply.put_nowait((False, f"{type(e).__name__}: {e}"))
+                            except queue.Full:
+                                pass  # 该批次已经回复过
+        finally:
+            for conn in self.connections.values():  # 连接只能在创建它的写入线程中关闭
+                conn.close()
+
+    def commit_group(self, db_path, jobs):
+        metrics = get_metrics()
+        conn = self.connections.get(db_path)
+        if conn is None:
+            conn = self.connections[db_path] = connect_db(db_path)
+        with metrics.timed_lock(FileLock(db_path + ".lock"), table="writer"):
+            try:
+                with conn:
+                    results = [(True, execute_statements(conn, statements)) for _, statements, _ in jobs]
+            except Exception:
+                # 整组回滚后逐个重试，定位出错的批次（参数个数不对等坏批次也可能抛出非 sqlite3 异常）
+                results = []
+                for _, statements, _ in jobs:
+                    try:
+                        with conn:
+                            results.append((True, execute_statements(conn, statements)))
+                    except Exception as e:
+                        results.append((False, str(e)))
+        metrics.observe("writer_group_size", len(jobs))
+        for (_, _, reply), result in zip(jobs, results):
+            reply.put(result)
+
+class DBWriterClient:
+    """
+    写入进程的客户端：提交批次并等待提交完成（最多等待 timeout 秒）
+    每个线程使用各自的连接，同一进程内多个线程（例如调度器中并行的抓取任务）的批次可以在写入进程中合并提交
+    """
+
+    def __init__(self, address, timeout=DEFAULT_REPLY_TIMEOUT):
+        self.address = address
+        self.timeout = timeout
+        self.local = threading.local()
+        self.connections = []
+        self.lock = threading.Lock()
+        self.connection()  # 立即连接一次，写入进程未启动时尽早报错
+
+    def connection(self):
+        conn = getattr(self.local, "conn", None)
+        if conn is None:
+            conn = self.local.conn = Client(self.address, family="AF_UNIX", authkey=AUTHKEY)
+            with self.lock:
+                self.connections.append(conn)
+        return conn
+
+    def write(self, db_path, statements):
+        """
+        提交一个批次（在写入进程中作为一个整体提交）
+
+        返回：
+            int - 写入的行数
+        """
+        conn = self.connection()
+        try:
+            conn.send((os.path.abspath(db_path), statements))
+            if not conn.poll(self.timeout):
+                raise DBWriterError(f"写入进程 {self.timeout} 秒内没有回复（写入进程可能已失效）")
+            ok, result = conn.recv()
+        except (EOFError, OSError) as e:
+            self.drop_connection(conn)
+            raise DBWriterError(f"与写入进程的连接已断开: {e!r}")
+        except DBWriterError:
+            self.drop_connection(conn)  # 迟到的回复会被当作下一个批次的回复，超时后不再使用该连接
+            raise
+        if not ok:
+            raise DBWriterError(result)
+        return result
+
+    def drop_connection(self, conn):
+        """关闭当前线程的连接，下一次写入时重新连接"""
+        self.local.conn = None
+        with self.lock:
+            if conn in self.connections:
+                self.connections.remove(conn)
+        conn.close()
+
+    def close(self):
+        with self.lock:
+            for conn in self.connections:
+                conn.close()
+            self.connections.clear()
+
+# 进程内共享的写入进程客户端（未配置时为 None，使用 FileLock 模式）
+_writer = None
+
+def configure_writer(address, timeout=DEFAULT_REPLY_TIMEOUT):
+    """
+    连接写入进程；address 为空时恢复为 FileLock 模式
+    """
+    global _writer
+    if _writer is not None:
+        _writer.close()
+    _writer = DBWriterClient(address, timeout=timeout) if address else None
+    return _writer
+
+def get_writer():
+    return _writer
+
+def write_statements(db_path, statements, table=None):
+    """
+    写入一个批次：配置了写入进程时提交给写入进程，否则在本进程内加 FileLock 写入
+    两种模式都记录从提交到提交完成的时间（db_commit_seconds）
+
+    返回：
+        int - 各语句写入的总行数
+    """
+    metrics = get_metrics()
+    writer = get_writer()
+    with metrics.timer("db_commit_seconds", table=table, mode="writer" if writer else "filelock"):
+        if writer:
+            rows = writer.write(db_path, statements)
+        else:
+            rows = write_with_lock(db_path, statements, table=table)
+    return rows
@@ -0,0 +1,457 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-20 20:16:42
+LastEditors  : luyz
+LastEditTime : 2025-09-05 21:05:42
+Description  : 飞书表格写入（tenant_access_token 及其磁盘缓存、values_batch_update、基于本地快照的增量同步）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from requests.adapters import HTTPAdapter
+from filelock import FileLock
+from openpyxl.utils import column_index_from_string, get_column_letter
+from bili_http import parse_retry_after
+
+# 飞书开放平台 API 地址
+FEISHU_API_BASE = "https://open.feishu.cn/open-apis"
+
+# 两段变化行之间相隔不超过该行数时合并为一个 valueRange（减少 range 数量）
+MERGE_GAP_ROWS = 2
+
+# 距离上次全量写入超过该时长（秒）后执行一次全量写入，纠正表格被手动修改造成的偏差
+DEFAULT_SNAPSHOT_MAX_AGE = 24 * 3600
+
+# 单个请求的上限：单元格数、请求体字节数（飞书接口单次写入不超过 5000 行、请求体不超过 10MB，这里留有余量）
+DEFAULT_MAX_CELLS = 10000
+DEFAULT_MAX_BYTES = 2 * 1024 * 1024
+MAX_ROWS_PER_RANGE = 5000
+
+# 需要重试的 HTTP 状态码，以及表示频率限制的飞书错误码
+RETRY_STATUS = {429, 500, 502, 503, 504}
+RATE_LIMIT_CODES = {99991400, 90217}
+
+# tenant_access_token 有效期约 2 小时（接口未返回 expire 时使用该值）；缓存的 token 距离过期不足
+# TOKEN_REFRESH_MARGIN 秒时提前刷新，避免一轮上传途中失效
+DEFAULT_TOKEN_EXPIRE = 7200
+TOKEN_REFRESH_MARGIN = 600
+
+def fetch_tenant_access_token(app_id, app_secret, api_base=FEISHU_API_BASE):
+    """
+    向飞书开放平台请求新的 tenant_access_token
+
+    返回：
+        (token, expire) - expire 为剩余有效期（秒）
+    """
+    url = f"{api_base}/auth/v3/tenant_access_token/internal/"
+    payload = {
+        "app_id": app_id,
+        "app_secret": app_secret
+    }
+    try:
+        response = requests.post(url, json=payload, timeout=10)
+        data = response.json()
+    except Exception as e:
+        raise RuntimeError(f"请求 tenant_access_token 失败: {e}")
+
+    if response.status_code != 200 or "tenant_access_token" not in data:
+        raise RuntimeError(f"获取 tenant_access_token 出错: {response.status_code}, 响应: {response.text}")
+
+    return data["tenant_access_token"], int(data.get("expire", DEFAULT_TOKEN_EXPIRE))
+
+def load_token_cache(cache_path):
+    """读取 token 缓存文件，不存在或损坏时返回空字典"""
+    try:
+        with open(cache_path, "r", encoding="utf-8") as f:
+            cache = json.load(f)
+        return cache if isinstance(cache, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_token_cache(cache_path, cache):
+    """原子写入 token 缓存（仅当前用户可读写）"""
+    os.makedirs(os.path.dirname(os.path.abspath(cache_path)), exist_ok=True)
+    tmp_path = f"{cache_path}.tmp.{os.getpid()}"
+    fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w", encoding="utf-8") as f:
+        json.dump(cache, f)
+    os.replace(tmp_path, cache_path)
+
+# 进程内的 token 缓存（常驻进程中反复调用时无需每次读取磁盘缓存）：key -> {"token", "expires_at"}
+_token_memo = {}
+_token_memo_lock = threading.Lock()
+
+def get_tenant_access_token(app_id, app_secret, api_base=FEISHU_API_BASE, cache_path=None,
+                            refresh_margin=TOKEN_REFRESH_MARGIN):
+    """
+    获取 tenant_access_token，用于访问飞书开放平台 API。
+
+    指定 cache_path 时，token 及其过期时间保存在磁盘上（按 api_base + app_id 区分），
+    多个进程通过文件锁共享同一个 token，距离过期不足 refresh_margin 秒时才重新请求。
+    同一进程内的 token 另外保存在内存中，未过期时直接返回。
+    """
+    key = f"{api_base}|{app_id}"
+    with _token_memo_lock:
+        entry = _token_memo.get(key)
+        if entry and entry["expires_at"] - refresh_margin > time.time():
+            return entry["token"]
+        token, expires_at = load_or_fetch_token(app_id, app_secret, api_base, cache_path, refresh_margin)
+        _token_memo[key] = {"token": token, "expires_at": expires_at}
+        return token
+
+def load_or_fetch_token(app_id, app_secret, api_base, cache_path, refresh_margin):
+    """读取磁盘缓存中未过期的 token，否则重新请求；返回 (token, expires_at)"""
+    if not cache_path:
+        token, expire = fetch_tenant_access_token(app_id, app_secret, api_base)
+        return token, int(time.time()) + expire
+
+    key = f"{api_base}|{app_id}"
+    with FileLock(f"{cache_path}.lock"):
+        cache = load_token_cache(cache_path)
+        entry = cache.get(key)
+        if entry and entry.get("expires_at", 0) - refresh_margin > time.time():
+            return entry["token"], entry["expires_at"]
+
+        token, expire = fetch_tenant_access_token(app_id, app_secret, api_base)
+        cache[key] = {"token": token, "expires_at": int(time.time()) + expire}
+        try:
+            save_token_cache(cache_path, cache)
+        except OSError as e:
+            print(f"⚠️ 保存 tenant_access_token 缓存失败: {e}")
+        return token, cache[key]["expires_at"]
+
+def parse_start_cell(start_cell):
+    """
+    解析起始单元格（如 A1），返回 (列序号, 行号)，列序号从 1 开始
+    """
+    match = re.fullmatch(r"([A-Za-z]*)(\d+)", start_cell.strip())
+    if not match:
+        raise ValueError(f"起始单元格格式无效: {start_cell}")
+    col_letters, row = match.groups()
+    return (column_index_from_string(col_letters.upper()) if col_letters else 1), int(row)
+
+def cell_range(sheet_id, col_start, row_start, num_rows, num_cols):
+    """
+    生成飞书 range 字符串，例如 sheet_id!A1:S100
+    """
+    start = f"{get_column_letter(col_start)}{row_start}"
+    end = f"{get_column_letter(col_start + num_cols - 1)}{row_start + num_rows - 1}"
+    return f"{sheet_id}!{start}:{end}"
+
+def write_value_ranges(token, spreadsheet_token, value_ranges, api_base=FEISHU_API_BASE, uploader=None):
+    """
+    写入多个 range：按单元格预算拆分为多个请求，并发发送（失败自动重试）
+
+    返回：
+        dict - 上传统计（见 FeishuUploader.upload）
+    """
+    if uploader is None:
+        uploader = FeishuUploader(api_base=api_base)
+        try:
+            return uploader.upload(token, spreadsheet_token, value_ranges)
+        finally:
+            uploader.close()
+    return uploader.upload(token, spreadsheet_token, value_ranges)
+
+def range_start(range_str):
+    """解析 range 字符串，返回 (sheet_id, 列序号, 行号)"""
+    sheet_id, cells = range_str.split("!", 1)
+    col_start, row_start = parse_start_cell(cells.split(":", 1)[0])
+    return sheet_id, col_start, row_start
+
+def split_value_ranges(value_ranges, max_cells=DEFAULT_MAX_CELLS, max_bytes=DEFAULT_MAX_BYTES):
+    """
+    将 valueRanges 按行切块并打包为多个请求，每个请求的单元格数和估算字节数不超过预算
+
+    返回：
+        list - 每个元素为一个请求的 valueRanges 列表
+    """
+    chunks = []
+    for value_range in value_ranges:
+        values = value_range["values"]
+        if not values:
+            continue
+        sheet_id, col_start, row_start = range_start(value_range["range"])
+        width = max(len(row) for row in values)
+        rows_per_chunk = max(1, min(MAX_ROWS_PER_RANGE, max_cells // max(width, 1)))
+        begin = 0
+        while begin < len(values):
+            end = min(begin + rows_per_chunk, len(values))
+            # 字节数超出预算时继续缩小（长文本列，例如简介）
+            while end - begin > 1 and len(json.dumps(values[begin:end], ensure_ascii=False).encode("utf-8")) > max_bytes:
+                end = begin + (end - begin) // 2
+            rows = values[begin:end]
+            chunks.append({
+                "range": cell_range(sheet_id, col_start, row_start + begin, len(rows), width),
+                "values": rows
+            })
+            begin = end
+
+    # 将较小的块合并到同一个请求中
+    requests_ranges = []
+    cells = size = 0
+    for chunk in chunks:
+        chunk_cells = sum(len(row) for row in chunk["values"])
+        chunk_size = len(json.dumps(chunk, ensure_ascii=False).encode("utf-8"))
+        if requests_ranges and cells + chunk_cells <= max_cells and size + chunk_size <= max_bytes:
+            requests_ranges[-1].append(chunk)
+            cells += chunk_cells
+            size += chunk_size
+        else:
+            requests_ranges.append([chunk])
+            cells, size = chunk_cells, chunk_size
+    return requests_ranges
+
+class FeishuRetryableError(RuntimeError):
+    """可重试的写入失败（频率限制、5xx、网络错误）"""
+    def __init__(self, message, retry_after=None):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+class FeishuUploader:
+    """
+    飞书表格分块上传：
+    1. 按单元格数和请求体大小拆分请求
+    2. 有上限的线程池并发发送，共享长连接
+    3. 频率限制（429 / 错误码 99991400）、5xx 和网络错误按指数退避重试，优先遵循 Retry-After
+    """
+
+    def __init__(self, api_base=FEISHU_API_BASE, max_workers=4, max_cells=DEFAULT_MAX_CELLS,
+                 max_bytes=DEFAULT_MAX_BYTES, max_retries=5, backoff=1, max_wait=30, timeout=30):
+        self.api_base = api_base.rstrip("/")
+        self.max_workers = max_workers
+        self.max_cells = max_cells
+        self.max_bytes = max_bytes
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_wait = max_wait
+        self.timeout = timeout
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=max_workers, pool_maxsize=max_workers)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+
+    def post_once(self, token, spreadsheet_token, value_ranges):
+        """发送一个 values_batch_update 请求，可重试的失败抛出 FeishuRetryableError"""
+        url = f"{self.api_base}/sheets/v2/spreadsheets/{spreadsheet_token}/values_batch_update"
+        headers = {
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {token}"
+        }
+        try:
+            response = self.session.post(url, json={"valueRanges": value_ranges}, headers=headers, timeout=self.timeout)
+        except requests.RequestException as e:
+            raise FeishuRetryableError(f"网络错误: {e}")
+        retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        if response.status_code in RETRY_STATUS:
+            raise FeishuRetryableError(f"HTTP {response.status_code}", retry_after)
+        try:
+            result = response.json()
+        except ValueError:
+            raise FeishuRetryableError(f"响应无法解析: HTTP {response.status_code}")
+        code = result.get("code", -1)
+        if code in RATE_LIMIT_CODES:
+            raise FeishuRetryableError(f"频率限制: 错误码 {code}", retry_after)
+        if code != 0:
+            raise RuntimeError(f"写入飞书表格失败: 错误码 {code}, 信息: {result.get('msg')}")
+        return result
+
+    def post_with_retry(self, token, spreadsheet_token, value_ranges):
+        """发送一个请求并在可重试的失败后退避重试，返回重试次数"""
+        for attempt in range(1, self.max_retries + 1):
+            try:
+                self.post_once(token, spreadsheet_token, value_ranges)
+                return attempt - 1
+            except FeishuRetryableError as e:
+                if attempt == self.max_retries:
+                    raise RuntimeError(f"写入飞书表格失败（已重试 {attempt - 1} 次）: {e}")
+                wait = min(self.backoff * 2 ** (attempt - 1), self.max_wait)
+                if e.retry_after is not None:
+                    wait = min(e.retry_after, self.max_wait)
+                print(f"⚠️ 飞书写入失败（{e}），第 {attempt} 次，等待 {wait:.1f}s 后重试...")
+                time.sleep(wait)
+
+    def upload(self, token, spreadsheet_token, value_ranges):
+        """
+        拆分并并发上传 valueRanges；任一请求最终失败时抛出 RuntimeError
+
+        返回：
+            dict - requests（请求数）、cells（单元格数）、bytes（请求体字节数估算）、
+                   retries（重试次数）、seconds（耗时）、cells_per_sec（吞吐量）
+        """
+        batches = split_value_ranges(value_ranges, self.max_cells, self.max_bytes)
+        start = time.perf_counter()
+        cells = sum(len(row) for batch in batches for r in batch for row in r["values"])
+        size = sum(len(json.dumps({"valueRanges": batch}, ensure_ascii=False).encode("utf-8")) for batch in batches)
+        retries = 0
+        if batches:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                futures = [executor.submit(self.post_with_retry, token, spreadsheet_token, batch) for batch in batches]
+                for future in futures:
+                    retries += future.result()
+        seconds = time.perf_counter() - start
+        return {
+            "requests": len(batches),
+            "cells": cells,
+            "bytes": size,
+            "retries": retries,
+            "seconds": seconds,
+            "cells_per_sec": cells / seconds if seconds > 0 else 0.0
+        }
+
+    def close(self):
+        self.session.close()
+
+def write_to_feishu_sheet(token, spreadsheet_token, sheet_id, start_cell, values, api_base=FEISHU_API_BASE,
+                          uploader=None):
+    """
+    将数据整体写入飞书 Sheets 表格（全量写入）。
+    """
+    col_start, row_start = parse_start_cell(start_cell)
+    num_cols = max((len(row) for row in values), default=0)
+    if not values or num_cols == 0:
+        return {"requests": 0, "cells": 0}
+    value_ranges = [{"range": cell_range(sheet_id, col_start, row_start, len(values), num_cols), "values": values}]
+    return write_value_ranges(token, spreadsheet_token, value_ranges, api_base, uploader)
+
+# ====================== 增量同步 ======================
+
+def snapshot_path(snapshot_dir, spreadsheet_token, sheet_id):
+    """每个 (spreadsheet_token, sheet_id) 一个快照文件"""
+    return os.path.join(snapshot_dir, f"{spreadsheet_token}_{sheet_id}.json")
+
+def load_snapshot(path):
+    """读取上次推送的表格快照，不存在或损坏时返回 None"""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+def save_snapshot(path, start_cell, values, dirty=False, full_at=None):
+    """
+    原子写入快照（先写临时文件再替换）
+    dirty=True 表示正在写入、表格内容未知：不能用于增量比较，只用于下次全量写入时确定需要清除的范围
+    full_at 为最近一次全量写入成功的时间戳（超过 snapshot_max_age 后重新全量写入，修复表格中的手动修改）
+    """
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = f"{path}.tmp.{os.getpid()}"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({"start_cell": start_cell, "saved_at": int(time.time()), "full_at": full_at, "values": values,
+                   "dirty": dirty}, f, ensure_ascii=False)
+    os.replace(tmp_path, path)
+
+def normalize_grid(values):
+    """统一为 JSON 往返后的形式（元组转列表等），保证与快照比较时一致"""
+    return json.loads(json.dumps(values, ensure_ascii=False))
+
+def cover_grid(old, new):
+    """
+    将新表格补齐到新旧两者的行数和列宽（多出的行、列写空值），全量写入时覆盖并清除旧内容
+    """
+    width = max((len(row) for row in old + new), default=0)
+    total = max(len(old), len(new))
+    return [list(row) + [""] * (width - len(row)) for row in new] + [[""] * width] * (total - len(new))
+
+def diff_row_ranges(old, new, merge_gap=MERGE_GAP_ROWS):
+    """
+    比较新旧表格，返回需要写入的行区间列表 [(起始行下标, 结束行下标), ...]（左闭右开）
+    新表格变短时，多出的旧行也在区间内（写入空值清除）
+    """
+    total = max(len(old), len(new))
+    ranges = []
+    for i in range(total):
+        old_row = old[i] if i < len(old) else None
+        new_row = new[i] if i < len(new) else None
+        if old_row == new_row:
+            continue
+        if ranges and i - ranges[-1][1] <= merge_gap:
+            ranges[-1][1] = i + 1
+        else:
+            ranges.append([i, i + 1])
+    return [tuple(r) for r in ranges]
+
+def build_delta_ranges(sheet_id, start_cell, old, new):
+    """
+    根据新旧表格生成 valueRanges：只包含变化的行区间，行宽取新旧两者的最大值（多出的列写空值清除）
+    """
+    col_start, row_start = parse_start_cell(start_cell)
+    value_ranges = []
+    for begin, end in diff_row_ranges(old, new):
+        width = max(len(row) for row in (old[begin:end] + new[begin:end]))
+        if width == 0:
+            continue
+        rows = []
+        for i in range(begin, end):
+            row = list(new[i]) if i < len(new) else []
+            rows.append(row + [""] * (width - len(row)))
+        value_ranges.append({
+            "range": cell_range(sheet_id, col_start, row_start + begin, end - begin, width),
+            "values": rows
+        })
+    return value_ranges
+
+def sync_sheet(token, spreadsheet_token, sheet_id, start_cell, values, snapshot_dir=None,
+               force_full=False, snapshot_max_age=DEFAULT_SNAPSHOT_MAX_AGE, api_base=FEISHU_API_BASE,
+               uploader=None):
+    """
+    同步表格：有可用快照时只写入变化的行（并清除多余的旧行），否则全量写入；写入成功后更新快照
+    写入前先把快照标记为 dirty，写入中途失败时表格处于未知状态，下次同步改为全量写入；
+    距离上次全量写入（full_at）超过 snapshot_max_age 时同样全量写入
+    不指定 snapshot_dir 时与 write_to_feishu_sheet 相同（每次全量写入）
+
+    返回：
+        dict - mode（full / delta / unchanged）、ranges（range 数）、rows（写入行数）、cells（写入单元格数），
+               以及上传统计 upload（见 FeishuUploader.upload，未写入时为 None）
+    """
+    values = normalize_grid(values)
+    path = snapshot_path(snapshot_dir, spreadsheet_token, sheet_id) if snapshot_dir else None
+    snapshot = load_snapshot(path) if path and not force_full else None
+    if snapshot and (snapshot.get("start_cell") != start_cell or snapshot.get("dirty")
+                     or time.time() - (snapshot.get("full_at") or 0) > snapshot_max_age):
+        snapshot = None
+
+    if snapshot is None:
+        mode = "full"
+        # 全量写入时也要清除上次推送中多余的行（如果知道的话，dirty 快照覆盖了上次尝试写入的范围）
+        previous = load_snapshot(path) if path else None
+        old = previous["values"] if previous and previous.get("start_cell") == start_cell else []
+        col_start, row_start = parse_start_cell(start_cell)
+        rows = cover_grid(old, values)
+        width = len(rows[0]) if rows else 0
+        value_ranges = [{"range": cell_range(sheet_id, col_start, row_start, len(rows), width), "values": rows}] \
+            if rows and width else []
+    else:
+        mode = "delta"
+        old = snapshot["values"]
+        value_ranges = build_delta_ranges(sheet_id, start_cell, old, values)
+        if not value_ranges:
+            mode = "unchanged"
+
+    upload_stats = None
+    if value_ranges:
+        if path:
+            # 先标记 dirty（范围覆盖新旧表格），写入成功后才保存新快照
+            save_snapshot(path, start_cell, cover_grid(old, values), dirty=True)
+        upload_stats = write_value_ranges(token, spreadsheet_token, value_ranges, api_base, uploader)
+    if path:
+        # 只有全量写入成功才刷新 full_at，增量和无变化的同步沿用上次全量写入的时间
+        full_at = int(time.time()) if mode == "full" else snapshot.get("full_at")
+        save_snapshot(path, start_cell, values, full_at=full_at)
+
+    return {
+        "mode": mode,
+        "ranges": len(value_ranges),
+        "rows": sum(len(r["values"]) for r in value_ranges),
+        "cells": sum(len(row) for r in value_ranges for row in r["values"]),
+        "upload": upload_stats
+    }
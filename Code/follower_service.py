@@ -0,0 +1,214 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-09 10:12:47
+LastEditors  : luyz
+LastEditTime : 2025-09-04 21:02:44
+Description  : UP 主维度表（uploaders + 粉丝数历史）与按热度分级的粉丝数刷新调度
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+from filelock import FileLock
+from bili_http import get_client
+from db_schema import connect_db, get_table_columns
+
+# UP 主维度表：每个 UP 主一行，fetched_at 为最近一次成功查询粉丝数的时间戳（新登记的 UP 主为 NULL）
+# failed_attempts 为自上次成功以来连续查询失败的次数，last_attempt_at 为最近一次查询（成功或失败）的时间戳
+CREATE_UPLOADERS_SQL = '''
+    CREATE TABLE IF NOT EXISTS uploaders (
+        up_id INTEGER PRIMARY KEY,
+        up_name TEXT,
+        follower INTEGER,
+        fetched_at INTEGER,
+        failed_attempts INTEGER NOT NULL DEFAULT 0,
+        last_attempt_at INTEGER
+    )
+'''
+
+# 旧版本 uploaders 表缺少的列（原地 ALTER TABLE 补充）
+UPLOADER_ADDED_COLUMNS = {
+    "failed_attempts": "INTEGER NOT NULL DEFAULT 0",
+    "last_attempt_at": "INTEGER"
+}
+
+# 粉丝数历史：每次成功查询追加一行
+CREATE_FOLLOWER_HISTORY_SQL = '''
+    CREATE TABLE IF NOT EXISTS uploader_follower_history (
+        up_id INTEGER NOT NULL,
+        fetched_at INTEGER NOT NULL,
+        follower INTEGER,
+        PRIMARY KEY (up_id, fetched_at)
+    ) WITHOUT ROWID
+'''
+
+# 按粉丝数分级的刷新间隔（秒）：粉丝越多变化越快、越常出现在榜单中，刷新越频繁
+# (粉丝数下限, 刷新间隔)，从高到低匹配，都不满足时使用 DEFAULT_REFRESH_INTERVAL
+FOLLOWER_REFRESH_TIERS = [
+    (1_000_000, 2 * 3600),
+    (100_000, 6 * 3600),
+    (10_000, 12 * 3600)
+]
+DEFAULT_REFRESH_INTERVAL = 48 * 3600
+
+# 查询失败后的退避：第 n 次连续失败后等待 FAILURE_BACKOFF_BASE * 2^(n-1) 秒再重试，最长 FAILURE_BACKOFF_MAX
+# （已注销等永久失败的 UP 主不会每轮都排在最前面占满 max_requests）
+FAILURE_BACKOFF_BASE = 3600
+FAILURE_BACKOFF_MAX = 7 * 24 * 3600
+
+# 默认并发查询数，以及每次调度最多发起的查询数
+DEFAULT_FOLLOWER_WORKERS = 4
+DEFAULT_MAX_REQUESTS = 600
+
+def ensure_uploader_table(conn):
+    """
+    如果不存在则创建 uploaders 维度表和粉丝数历史表
+    """
+    conn.execute(CREATE_UPLOADERS_SQL)
+    conn.execute(CREATE_FOLLOWER_HISTORY_SQL)
+    columns = get_table_columns(conn, "uploaders")
+    missing = [column for column in UPLOADER_ADDED_COLUMNS if column not in columns]
+    for column in missing:
+        conn.execute(f"ALTER TABLE uploaders ADD COLUMN {column} {UPLOADER_ADDED_COLUMNS[column]}")
+    if missing and hasattr(conn, "table_columns_cache"):
+        conn.table_columns_cache.pop("uploaders", None)
+
+def register_uploaders_statement(uploaders):
+    """
+    生成登记 UP 主的 (sql, rows)：新 UP 主等待调度器查询粉丝数，已有的只更新名称
+
+    参数：
+        uploaders: dict - up_id -> up_name
+    """
+    sql = '''
+        INSERT INTO uploaders (up_id, up_name) VALUES (?, ?)
+        ON CONFLICT(up_id) DO UPDATE SET up_name = COALESCE(excluded.up_name, uploaders.up_name)
+    '''
+    return sql, [(up_id, up_name) for up_id, up_name in uploaders.items() if up_id is not None]
+
+def register_uploaders(conn, uploaders):
+    """
+    登记 UP 主（需在调用方的事务和写锁内执行）
+    """
+    conn.executemany(*register_uploaders_statement(uploaders))
+
+def query_follower(up_id):
+    """查询单个 UP 主的粉丝数，失败返回 None"""
+    data = get_client().get_json("/x/relation/stat", params={"vmid": up_id})
+    if data and 'data' in data and 'follower' in data['data']:
+        return data['data']['follower']
+    return None
+
+def fetch_followers(up_ids, fetch_func, max_workers=DEFAULT_FOLLOWER_WORKERS):
+    """
+    使用有界线程池并发查询粉丝数
+
+    返回：
+        dict - up_id -> follower（查询失败为 None）
+    """
+    up_ids = list(up_ids)
+    if not up_ids:
+        return {}
+    with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(up_ids)))) as pool:
+        return dict(zip(up_ids, pool.map(fetch_func, up_ids)))
+
+def save_followers_to_cache(conn, fresh):
+    """
+    将新查询的粉丝数写入 uploaders（清零连续失败次数）并追加到粉丝数历史（需在调用方的事务和写锁内执行）
+
+    参数：
+        fresh: list - (up_id, up_name, follower, fetched_at)
+    """
+    if not fresh:
+        return
+    conn.executemany('''
+        INSERT INTO uploaders (up_id, up_name, follower, fetched_at, failed_attempts, last_attempt_at)
+        VALUES (?, ?, ?, ?, 0, ?4)
+        ON CONFLICT(up_id) DO UPDATE SET
+            up_name = COALESCE(excluded.up_name, uploaders.up_name),
+            follower = excluded.follower,
+            fetched_at = excluded.fetched_at,
+            failed_attempts = 0,
+            last_attempt_at = excluded.last_attempt_at
+    ''', fresh)
+    conn.executemany('''
+        INSERT OR IGNORE INTO uploader_follower_history (up_id, fetched_at, follower) VALUES (?, ?, ?)
+    ''', [(up_id, fetched_at, follower) for up_id, _, follower, fetched_at in fresh])
+
+def record_follower_failures(conn, up_ids, attempted_at):
+    """
+    记录查询失败的 UP 主：连续失败次数加一并记录尝试时间，按退避时间推迟下次查询（需在调用方的事务和写锁内执行）
+    """
+    conn.executemany('''
+        UPDATE uploaders SET failed_attempts = failed_attempts + 1, last_attempt_at = ? WHERE up_id = ?
+    ''', [(attempted_at, up_id) for up_id in up_ids])
+
+def failure_backoff_sql():
+    """生成连续失败后的退避时间（秒）SQL 表达式（未失败过时为 0）"""
+    return (f"CASE WHEN failed_attempts > 0 THEN MIN({FAILURE_BACKOFF_BASE} * (1 << MIN(failed_attempts - 1, 20)), "
+            f"{FAILURE_BACKOFF_MAX}) ELSE 0 END")
+
+def refresh_interval_sql(column="follower"):
+    """生成按粉丝数分级计算刷新间隔的 SQL 表达式"""
+    cases = " ".join(f"WHEN {column} >= {floor} THEN {interval}" for floor, interval in FOLLOWER_REFRESH_TIERS)
+    return f"CASE {cases} ELSE {DEFAULT_REFRESH_INTERVAL} END"
+
+def select_due_uploaders(conn, limit, now=None):
+    """
+    选出到期需要刷新的 UP 主：从未查询过的优先，其次按粉丝数从高到低；
+    查询失败过的 UP 主在退避时间内不会被选出，到期后排在从未失败过的之后
+
+    返回：
+        list - (up_id, up_name)
+    """
+    now = int(now if now is not None else time.time())
+    return conn.execute(f'''
+        SELECT up_id, up_name FROM uploaders
+        WHERE (fetched_at IS NULL OR fetched_at + {refresh_interval_sql()} <= ?1)
+            AND (last_attempt_at IS NULL OR last_attempt_at + {failure_backoff_sql()} <= ?1)
+        ORDER BY fetched_at IS NOT NULL, failed_attempts, follower DESC
+        LIMIT ?2
+    ''', (now, limit)).fetchall()
+
+def query_follower_paced(up_id):
+    """查询粉丝数并随机等待（在并发查询线程中执行，控制单个线程的请求频率）"""
+    follower = query_follower(up_id)
+    time.sleep(random.uniform(0.01, 0.2))
+    return follower
+
+def refresh_due_uploaders(db_path, max_requests=DEFAULT_MAX_REQUESTS, max_workers=DEFAULT_FOLLOWER_WORKERS,
+                          batch_size=100, fetch_func=query_follower_paced):
+    """
+    刷新调度：查询到期 UP 主的粉丝数，每批在一个事务内写入 uploaders 和粉丝数历史，并记录查询失败的 UP 主
+
+    返回：
+        dict - due / fetched / failed
+    """
+    conn = connect_db(db_path)
+    try:
+        with FileLock(db_path + ".lock"):
+            with conn:
+                ensure_uploader_table(conn)
+        due = select_due_uploaders(conn, max_requests)
+        up_names = dict(due)
+        stats = {"due": len(due), "fetched": 0, "failed": 0}
+        for i in range(0, len(due), batch_size):
+            batch = [up_id for up_id, _ in due[i:i + batch_size]]
+            fetched_at = int(time.time())
+            followers = fetch_followers(batch, fetch_func, max_workers)
+            fresh = [(up_id, up_names[up_id], follower, fetched_at)
+                     for up_id, follower in followers.items() if follower is not None]
+            failed = [up_id for up_id, follower in followers.items() if follower is None]
+            with FileLock(db_path + ".lock"):
+                with conn:
+                    save_followers_to_cache(conn, fresh)
+                    record_follower_failures(conn, failed, fetched_at)
+            stats["fetched"] += len(fresh)
+            stats["failed"] += len(failed)
+            print(f"👥 [{i + len(batch)}/{len(due)}] 粉丝数查询成功 {len(fresh)}/{len(batch)}")
+    finally:
+        conn.close()
+    return stats
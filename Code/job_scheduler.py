@@ -0,0 +1,120 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-28 19:42:15
+LastEditors  : luyz
+LastEditTime : 2025-08-28 21:58:33
+Description  : 常驻调度器：多个任务按各自的间隔在线程中并行运行，同一任务不会重叠执行（取代 bash while-true 循环 + flock）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from filelock import FileLock, Timeout
+
+class Job:
+    """
+    一个周期任务：上一次运行结束后间隔 interval 秒再次运行（与 bash 循环的“运行 + sleep”一致）
+
+    参数：
+        func: callable - 无参数的任务函数
+        interval: float - 两次运行之间的间隔（秒）
+        lock_path: str 或 None - 跨进程的防重叠锁文件；已被其他进程持有时跳过本次运行（相当于 flock -n）
+        delay: float - 首次运行前的等待时间（秒）
+    """
+
+    def __init__(self, name, func, interval, lock_path=None, delay=0):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.lock_path = lock_path
+        self.next_run = time.time() + delay
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.skipped = 0
+        self.last_duration = None
+
+    def run(self):
+        """执行一次任务（在调度器的线程池中运行），返回是否成功"""
+        lock = FileLock(self.lock_path) if self.lock_path else None
+        if lock:
+            try:
+                lock.acquire(timeout=0)
+            except Timeout:
+                self.skipped += 1
+                print(f"⏭️ [{self.name}] 另一个进程正在运行该任务，跳过本次")
+                return False
+        start = time.time()
+        try:
+            self.func()
+            return True
+        except Exception:
+            self.failures += 1
+            print(f"❌ [{self.name}] 任务出错:\n{traceback.format_exc()}")
+            return False
+        finally:
+            if lock:
+                lock.release()
+            self.runs += 1
+            self.last_duration = time.time() - start
+
+class Scheduler:
+    """
+    在同一个进程中运行全部任务：解释器、HTTP 连接池、飞书 token、数据库写入进程等在各轮之间保持可用
+    每个任务占用一个线程，抓取等待网络响应时榜单生成和上传可以同时进行
+    """
+
+    def __init__(self, jobs):
+        self.jobs = list(jobs)
+        self.stopped = threading.Event()
+        self.wake = threading.Event()
+        self.lock = threading.RLock()  # 任务瞬间完成时回调会在 start_job 所在线程中同步执行
+        self.executor = ThreadPoolExecutor(max_workers=max(1, len(self.jobs)), thread_name_prefix="job")
+
+    def start_job(self, job):
+        job.running = True
+        print(f"▶️ [{datetime.now():%F %T}] 任务 {job.name} 开始（第 {job.runs + 1} 次）")
+        future = self.executor.submit(job.run)
+        future.add_done_callback(lambda f: self.finish_job(job, f))
+
+    def finish_job(self, job, future):
+        with self.lock:
+            job.running = False
+            job.next_run = time.time() + job.interval
+        status = "完成" if not future.exception() and future.result() else "未完成"
+        print(f"⏹ [{datetime.now():%F %T}] 任务 {job.name} {status}，耗时 {job.last_duration or 0:.1f} 秒，"
+              f"{job.interval / 60:g} 分钟后再次运行")
+        self.wake.set()  # 重新计算下一次唤醒时间
+
+    def run_forever(self):
+        """运行到 stop() 被调用；停止时等待正在运行的任务结束"""
+        try:
+            while not self.stopped.is_set():
+                self.wake.clear()
+                with self.lock:
+                    now = time.time()
+                    due = [job for job in self.jobs if not job.running and job.next_run <= now]
+                    for job in due:
+                        self.start_job(job)
+                    idle = [job.next_run for job in self.jobs if not job.running]
+                # 睡到最早的下一次运行时间，任务结束或收到停止信号时提前醒来
+                timeout = min([max(0.0, t - time.time()) for t in idle] + [60.0])
+                self.wake.wait(timeout)
+        finally:
+            print("🛑 调度器停止，等待正在运行的任务结束...")
+            self.executor.shutdown(wait=True)
+
+    def stop(self):
+        self.stopped.set()
+        self.wake.set()
+
+    def status(self):
+        """各任务的运行次数、失败次数、跳过次数和上一次耗时"""
+        return {job.name: {"runs": job.runs, "failures": job.failures, "skipped": job.skipped,
+                           "last_duration": job.last_duration, "running": job.running}
+                for job in self.jobs}
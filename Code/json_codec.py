@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-09-01 20:12:37
+LastEditors  : luyz
+LastEditTime : 2025-09-01 22:05:49
+Description  : API 响应的 JSON 解码层：已安装 msgspec 或 orjson 时使用它们，否则使用标准库 json
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import json
+from typing import List, Optional
+
+try:
+    import msgspec
+except ImportError:  # 可选依赖：未安装时使用 orjson 或标准库
+    msgspec = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+# 可选的解码后端（按优先级排列），auto 表示选择已安装的第一个
+DECODER_BACKENDS = ["msgspec", "orjson", "json"]
+
+if msgspec is not None:
+    # newlist 接口的类型化结构：只声明用到的字段，其余字段在解码时直接跳过
+    # 缺失的字段和 null 解码为 None；非严格模式下 "123" 之类的字符串数字也能解码为整数
+    class Owner(msgspec.Struct):
+        mid: Optional[int] = None
+        name: Optional[str] = None
+
+    class Stat(msgspec.Struct):
+        view: Optional[int] = None
+        like: Optional[int] = None
+        reply: Optional[int] = None
+        danmaku: Optional[int] = None
+        favorite: Optional[int] = None
+        coin: Optional[int] = None
+        share: Optional[int] = None
+
+    class Archive(msgspec.Struct):
+        bvid: Optional[str] = None
+        title: Optional[str] = None
+        pubdate: Optional[int] = None
+        desc: Optional[str] = None
+        pic: Optional[str] = None
+        duration: Optional[int] = None
+        tag: Optional[str] = None
+        owner: Owner = msgspec.field(default_factory=Owner)
+        stat: Stat = msgspec.field(default_factory=Stat)
+
+    class NewlistData(msgspec.Struct):
+        archives: Optional[List[Archive]] = None
+
+    class NewlistResponse(msgspec.Struct):
+        code: Optional[int] = None
+        message: Optional[str] = None
+        data: Optional[NewlistData] = None
+
+    generic_decoder = msgspec.json.Decoder()
+    newlist_decoder = msgspec.json.Decoder(NewlistResponse, strict=False)
+
+def installed_backends():
+    """当前环境可用的解码后端"""
+    return [name for name, module in (("msgspec", msgspec), ("orjson", orjson), ("json", json)) if module is not None]
+
+# 进程内使用的解码后端
+_backend = None
+
+def configure_decoder(backend="auto"):
+    """
+    选择解码后端：auto（默认，msgspec > orjson > json）或指定后端名
+
+    异常：
+        ValueError - 指定的后端未安装
+    """
+    global _backend
+    available = installed_backends()
+    if backend == "auto":
+        backend = available[0]
+    if backend not in available:
+        raise ValueError(f"JSON 解码后端 {backend} 未安装，可用：{', '.join(available)}")
+    _backend = backend
+    return _backend
+
+def get_decoder():
+    """当前使用的解码后端名（首次调用时自动选择）"""
+    if _backend is None:
+        configure_decoder()
+    return _backend
+
+def decode(content):
+    """
+    将响应体（bytes）解码为 dict / list 等普通 Python 对象
+
+    异常：
+        ValueError - 响应体不是合法的 JSON
+    """
+    backend = get_decoder()
+    if backend == "msgspec":
+        return generic_decoder.decode(content)
+    if backend == "orjson":
+        return orjson.loads(content)
+    return json.loads(content)
+
+def decode_newlist(content):
+    """
+    解码 newlist 接口的响应体，返回 {"code", "message", "data": {"archives": [...]}}
+
+    使用 msgspec 时 archives 直接解码为 Archive 结构（owner / stat 为嵌套结构，缺失时为全 None），
+    由 video_record.parse_archive 按属性读取；结构不符合预期时退回普通解码，由逐条校验跳过坏数据
+
+    异常：
+        ValueError - 响应体不是合法的 JSON
+    """
+    if get_decoder() != "msgspec":
+        return decode(content)
+    try:
+        response = newlist_decoder.decode(content)
+    except msgspec.ValidationError:
+        return decode(content)
+    archives = response.data.archives if response.data is not None else None
+    return {"code": response.code, "message": response.message, "data": {"archives": archives or []}}
@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-18 20:02:15
+LastEditors  : luyz
+LastEditTime : 2025-09-04 22:34:51
+Description  : 一次读取生成全部榜单：声明式榜单列表、单个数据库连接、单个读事务
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import json
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+
+import pandas as pd
+from db_schema import connect_db
+from feishu_sheet import sync_sheet
+from report_format import frame_to_grid, write_excel
+from stats_history import milestone_sql
+
+# videos / video_types 表的列（与建表顺序一致）
+VIDEO_COLUMNS = ["bvid", "title", "up_name", "up_id", "pub_timestamp", "view", "like", "reply",
+                 "danmaku", "favorite", "coin", "share", "description", "cover", "duration",
+                 "tag", "video_url", "fetch_timestamp", "region_id"]
+TYPE_COLUMNS = VIDEO_COLUMNS + ["type", "follower"]
+
+# 默认榜单（与 Script/9 循环脚本中的十个榜单一致）
+# kind=videos: 从 videos 表取发布时间不早于 start_offset_days 天前（0 点）的视频
+# kind=types:  从 video_types 表取指定类型的视频；interpolate=true 时改为从统计历史表插值计算，
+#              历史记录不足以插值的视频仍使用 video_types 中的窗口快照（统计历史表刚开始积累时榜单不会变空）
+DEFAULT_RANKINGS = [
+    {"name": "Today", "kind": "videos", "start_offset_days": 1, "top_n": 100},
+    {"name": "Week", "kind": "videos", "start_offset_days": 8, "top_n": 500},
+    {"name": "Month", "kind": "videos", "start_offset_days": 31, "top_n": 1000},
+    {"name": "Year", "kind": "videos", "start_offset_days": 366, "top_n": 3000},
+    {"name": "1_Day", "kind": "types", "type": "1_day", "top_n": 1000, "interpolate": True},
+    {"name": "3_Day", "kind": "types", "type": "3_day", "top_n": 1000, "interpolate": True},
+    {"name": "7_Day", "kind": "types", "type": "7_day", "top_n": 1000, "interpolate": True},
+    {"name": "30_Day", "kind": "types", "type": "30_day", "top_n": 1000, "interpolate": True},
+    {"name": "90_Day", "kind": "types", "type": "90_day", "top_n": 1000, "interpolate": True},
+    {"name": "360_Day", "kind": "types", "type": "360_day", "top_n": 1000, "interpolate": True}
+]
+
+def load_rankings(path=None):
+    """
+    读取榜单列表（JSON 数组，字段同 DEFAULT_RANKINGS），未指定时使用默认榜单
+    """
+    if not path:
+        return DEFAULT_RANKINGS
+    with open(path, "r", encoding="utf-8") as f:
+        rankings = json.load(f)
+    for r in rankings:
+        if r.get("kind") not in ("videos", "types") or "name" not in r:
+            raise ValueError(f"榜单配置无效: {r}")
+    return rankings
+
+def window_start(offset_days, today=None):
+    """返回 offset_days 天前 0 点的时间戳"""
+    today = today or datetime.now()
+    start = (today - timedelta(days=offset_days)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return int(start.timestamp())
+
+def ranking_query(ranking, has_types, has_history, has_uploaders=False):
+    """
+    生成单个榜单的 SQL 和参数；所需的表不存在时返回 (None, None)
+    粉丝数不再逐行保存在 video_types 中，统一关联类型数据库的 uploaders 维度表
+    插值榜单在没有统计历史表时退回 video_types 的窗口快照
+    """
+    sort_by = ranking.get("sort_by", "view")
+    order = "DESC" if ranking.get("desc", True) else "ASC"
+    top_n = int(ranking.get("top_n", 100))
+
+    if ranking["kind"] == "videos":
+        if sort_by not in VIDEO_COLUMNS:
+            raise ValueError(f"排序列 `{sort_by}` 不存在")
+        sql = f'''
+            SELECT {', '.join(f'`{c}`' for c in VIDEO_COLUMNS)} FROM videos
+            WHERE pub_timestamp >= ?
+            ORDER BY `{sort_by}` {order} LIMIT ?
+        '''
+        return sql, (window_start(ranking.get("start_offset_days", 1)), top_n)
+
+    if sort_by not in TYPE_COLUMNS:
+        raise ValueError(f"排序列 `{sort_by}` 不存在")
+    if has_uploaders:
+        follower_column = "u.follower"
+        uploader_join = "LEFT JOIN types.uploaders u ON u.up_id = v.up_id"
+    else:
+        follower_column, uploader_join = "NULL", ""
+    if ranking.get("interpolate") and has_history:
+        match = re.fullmatch(r"(\d+)_day", ranking["type"])
+        if not match:
+            raise ValueError(f"插值榜单需要形如 N_day 的类型: {ranking['type']}")
+        stat_columns = {"view", "like", "reply", "danmaku", "favorite", "coin", "share", "fetch_timestamp"}
+        qualified = {c: f"m.`{c}`" if c in stat_columns else f"v.`{c}`" for c in VIDEO_COLUMNS}
+        qualified["follower"] = follower_column
+        interpolated = f'''
+            SELECT {', '.join(f"{qualified[c]} AS `{c}`" for c in VIDEO_COLUMNS)}, ? AS type, {follower_column} AS follower
+            FROM m
+            JOIN videos v ON v.bvid = m.bvid
+            {uploader_join}
+        '''
+        if not has_types:
+            sql = f'''
+                WITH m AS ({milestone_sql(int(match.group(1)))})
+                SELECT * FROM ({interpolated}) ORDER BY `{sort_by}` {order} LIMIT ?
+            '''
+            return sql, (ranking["type"], top_n)
+        # 无法插值的视频（历史记录不足）使用 video_types 中的窗口快照
+        sql = f'''
+            WITH m AS ({milestone_sql(int(match.group(1)))})
+            SELECT * FROM (
+                {interpolated}
+                UNION ALL
+                SELECT {', '.join(f'v.`{c}`' for c in VIDEO_COLUMNS)}, v.type, {follower_column} AS follower
+                FROM types.video_types v
+                {uploader_join}
+                WHERE v.type = ? AND v.bvid NOT IN (SELECT bvid FROM m)
+            ) ORDER BY `{sort_by}` {order} LIMIT ?
+        '''
+        return sql, (ranking["type"], ranking["type"], top_n)
+
+    if not has_types:
+        return None, None
+    sort_column = follower_column if sort_by == "follower" else f"v.`{sort_by}`"
+    sql = f'''
+        SELECT {', '.join(f'v.`{c}`' for c in VIDEO_COLUMNS)}, v.type, {follower_column} AS follower
+        FROM types.video_types v
+        {uploader_join}
+        WHERE v.type = ?
+        ORDER BY {sort_column} {order} LIMIT ?
+    '''
+    return sql, (ranking["type"], top_n)
+
+def iter_query_chunks(conn, sql, chunk_size, params=None):
+    """
+    按块读取查询结果（DataFrame 迭代器），读取完毕或中途停止时关闭连接
+    """
+    try:
+        for chunk in pd.read_sql_query(sql, conn, params=params, chunksize=chunk_size):
+            yield chunk
+    finally:
+        conn.close()
+
+def query_rankings(video_db, type_db, rankings):
+    """
+    打开一次数据库（类型数据库以 ATTACH 方式挂载），在同一个读事务中执行全部榜单查询
+
+    返回：
+        dict - 榜单名 -> DataFrame（无法查询的榜单不在结果中）
+    """
+    conn = connect_db(video_db)
+    results = {}
+    try:
+        type_tables = set()
+        if type_db and os.path.isfile(type_db):
+            conn.execute("ATTACH DATABASE ? AS types", (type_db,))
+            type_tables = {row[0] for row in conn.execute("SELECT name FROM types.sqlite_master WHERE type='table'")}
+        has_types = "video_types" in type_tables
+        has_uploaders = "uploaders" in type_tables
+        has_history = conn.execute(
+            "SELECT 1 FROM sqlite_master WHERE type='table' AND name='video_stats_history'").fetchone() is not None
+
+        # 单个读事务：所有榜单基于同一份数据快照（WAL 模式下不阻塞抓取进程写入）
+        conn.execute("BEGIN")
+        try:
+            for ranking in rankings:
+                sql, params = ranking_query(ranking, has_types, has_history, has_uploaders)
+                if sql is None:
+                    print(f"⚠️ 榜单 {ranking['name']} 所需的表不存在，跳过")
+                    continue
+                results[ranking["name"]] = pd.read_sql_query(sql, conn, params=params)
+        finally:
+            conn.rollback()  # 只读事务，结束即可
+    finally:
+        conn.close()
+    return results
+
+def publish_reports(video_db, type_db, rankings, excel_dir=None, feishu_targets=None, token=None,
+                    snapshot_dir=None, start_cell="A1", uploader=None, force_full=False):
+    """
+    查询全部榜单，直接将查询结果转换为表格写入飞书（不经过 Excel 文件）；
+    指定 excel_dir 时在后台线程中另外保存一份 Excel 存档
+
+    参数：
+        feishu_targets: dict - 榜单名 -> (spreadsheet_token, sheet_id)，不在其中的榜单不上传
+        token: str - tenant_access_token
+
+    返回：
+        dict - 榜单名 -> {"excel": 路径或 None, "feishu": sync_sheet 统计或 None}
+    """
+    feishu_targets = feishu_targets or {}
+    frames = query_rankings(video_db, type_db, rankings)
+    results = {}
+    excel_jobs = {}
+    executor = None
+    if excel_dir:
+        os.makedirs(excel_dir, exist_ok=True)
+        executor = ThreadPoolExecutor(max_workers=1)  # Excel 存档只是副产品，串行写入即可
+
+    try:
+        for ranking in rankings:
+            name = ranking["name"]
+            df = frames.get(name)
+            if df is None:
+                continue
+            results[name] = {"excel": None, "feishu": None}
+            if executor:
+                output_path = os.path.join(excel_dir, f"{name}.xlsx")
+                excel_jobs[name] = (output_path, executor.submit(write_excel, df, ranking["kind"], output_path))
+
+            target = feishu_targets.get(name)
+            if not target:
+                continue
+            if df.empty:
+                print(f"（无数据）榜单 {name} 不上传飞书")
+                continue
+            try:
+                grid = frame_to_grid(df, ranking["kind"])
+                stats = sync_sheet(token, target[0], target[1], start_cell, grid,
+                                   snapshot_dir=snapshot_dir, force_full=force_full, uploader=uploader)
+                results[name]["feishu"] = stats
+                print(f"✅ 榜单 {name} 已写入飞书表格: 模式={stats['mode']}，写入行数={stats['rows']}，"
+                      f"写入单元格数={stats['cells']}")
+            except Exception as e:
+                print(f"❌ 榜单 {name} 写入飞书表格失败: {e}")
+    finally:
+        if executor:
+            executor.shutdown(wait=True)
+
+    for name, (output_path, future) in excel_jobs.items():
+        if future.result():
+            results[name]["excel"] = output_path
+    return results
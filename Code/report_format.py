@@ -0,0 +1,181 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-18 19:36:52
+LastEditors  : luyz
+LastEditTime : 2025-09-05 22:31:55
+Description  : 榜单输出格式（列名映射、时间和时长格式化、列顺序），供 Code/2、Code/4 和报表入口共用
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import numpy as np
+import pandas as pd
+from openpyxl import Workbook
+
+# 数据库列名 -> 输出列名
+COLUMN_NAMES = {
+    "bvid": "视频ID", "title": "标题", "up_name": "频道名称", "up_id": "频道ID",
+    "pub_timestamp": "发布时间", "view": "播放数", "like": "点赞数", "reply": "评论数",
+    "danmaku": "弹幕数", "favorite": "收藏数", "coin": "投币数", "share": "分享数",
+    "description": "简介", "cover": "封面", "duration": "时长", "tag": "标签",
+    "video_url": "视频链接", "fetch_timestamp": "采集时间", "region_id": "分区ID",
+    "type": "类型", "follower": "粉丝数"
+}
+
+# 各类榜单的输出列顺序
+# videos: 最新数据榜单（Code/2）；types: 固定时间长度榜单（Code/4）
+OUTPUT_COLUMNS = {
+    "videos": [
+        "视频ID", "标题", "时长", "频道名称", "发布时间", "播放数", "点赞数",
+        "评论数", "弹幕数", "收藏数", "投币数", "分享数", "简介", "视频链接", "封面",
+        "标签", "分区ID", "频道ID", "采集时间"
+    ],
+    "types": [
+        "视频ID", "标题", "时长", "频道名称", "发布时间", "粉丝数", "播放数", "点赞数",
+        "评论数", "弹幕数", "收藏数", "投币数", "分享数", "简介", "视频链接", "封面",
+        "标签", "分区ID", "采集时间"
+    ]
+}
+
+def needed_columns(kind):
+    """
+    输出 kind 类榜单需要从数据库读取的列（不在输出中的列不读取）
+    """
+    outputs = set(OUTPUT_COLUMNS[kind])
+    return [col for col, name in COLUMN_NAMES.items() if name in outputs]
+
+# 查找表：00 ~ 99 的两位数字符串（100 小时以内的小时）和一小时内全部 3600 个 MM:SS 字符串
+TWO_DIGITS = np.array([f"{i:02}" for i in range(100)], dtype=object)
+MINUTE_SECONDS = np.array([f"{m:02}:{s:02}" for m in range(60) for s in range(60)], dtype=object)
+
+def format_duration(seconds):
+    """将秒数转换为 HH:MM:SS 格式，不到1小时不显示小时（单个值，逐行格式化时使用）"""
+    if pd.isna(seconds):
+        return ""
+    seconds = int(seconds)
+    hours, remainder = divmod(seconds, 3600)
+    minutes, seconds = divmod(remainder, 60)
+    if hours > 0:
+        return f"{hours:02}:{minutes:02}:{seconds:02}"
+    return f"{minutes:02}:{seconds:02}"
+
+def format_durations(values):
+    """
+    format_duration 的向量化版本：NumPy 整数 divmod 拆分出小时和一小时内的秒数，
+    MM:SS 部分直接查表，只有超过一小时的行才拼接小时前缀
+
+    参数：
+        values: Series / 数组 - 秒数（缺失值输出为空字符串）
+
+    返回：
+        ndarray(object) - 格式化后的字符串
+    """
+    seconds = pd.to_numeric(pd.Series(values), errors="coerce")
+    missing = seconds.isna().to_numpy()
+    secs = seconds.fillna(0).to_numpy(dtype=np.int64)
+    hours, remainder = np.divmod(secs, 3600)
+
+    result = MINUTE_SECONDS[remainder]
+    has_hours = hours > 0
+    if has_hours.any():
+        h = hours[has_hours]
+        # 超过 99 小时的极少数情况直接转字符串
+        h_text = np.where(h < 100, TWO_DIGITS[np.minimum(h, 99)], h.astype(str).astype(object))
+        result[has_hours] = h_text + ":" + result[has_hours]
+    result[missing] = ""
+    return result
+
+def format_frame(df, kind):
+    """
+    将查询结果整理为输出表格（重命名列、转换时间和时长、调整列顺序）
+
+    参数：
+        df: DataFrame - 列名为数据库列名
+        kind: str - videos / types
+    """
+    df = df.rename(columns=COLUMN_NAMES)
+    # 转换时间戳为时间格式
+    for col in ("发布时间", "采集时间"):
+        if col in df.columns:
+            df[col] = pd.to_datetime(df[col], unit='s', errors='coerce')
+    if "时长" in df.columns:
+        df["时长"] = format_durations(df["时长"])
+    return df[[col for col in OUTPUT_COLUMNS[kind] if col in df.columns]]
+
+# 表格中时间的显示格式（与从 Excel 读回后转换的格式一致）
+DATETIME_FORMAT = "%Y-%m-%d %H:%M:%S"
+
+def frame_to_grid(df, kind):
+    """
+    将查询结果直接转换为可 JSON 序列化的二维列表（表头 + 数据行），无需经过 Excel 文件
+    时间转为字符串，缺失值转为空字符串，整数值的浮点列（例如含空值的粉丝数）转为整数
+    """
+    frame = format_frame(df, kind)
+    columns = {}
+    for col in frame.columns:
+        series = frame[col]
+        if pd.api.types.is_datetime64_any_dtype(series):
+            series = series.dt.strftime(DATETIME_FORMAT)
+        elif pd.api.types.is_float_dtype(series):
+            valid = series.dropna()
+            if (valid == np.floor(valid)).all():
+                series = series.astype("Int64")
+        columns[col] = series.astype(object).where(series.notna(), "")
+    body = pd.DataFrame(columns, index=frame.index).values.tolist()
+    return [list(frame.columns)] + body
+
+def write_excel(df, kind, output_path):
+    """
+    格式化并写入 Excel 文件
+
+    返回：
+        bool - 是否写入成功（无数据时不写文件，返回 False）
+    """
+    if df.empty:
+        print(f"（无数据）{output_path}")
+        return False
+    try:
+        format_frame(df, kind).to_excel(output_path, index=False)
+        print(f"✅ 数据已保存到: {output_path}")
+        return True
+    except Exception as e:
+        print(f"❌ 写入文件失败: {e}")
+        return False
+
+def write_excel_stream(chunks, kind, output_path):
+    """
+    逐块格式化并写入 Excel（openpyxl 只写模式），内存中只保留当前块
+
+    参数：
+        chunks: DataFrame 迭代器 - 列名为数据库列名
+
+    返回：
+        int - 写入的行数；写入失败时返回 None
+    """
+    workbook = None
+    rows = 0
+    try:
+        for chunk in chunks:
+            if chunk.empty:
+                continue
+            frame = format_frame(chunk, kind)
+            if workbook is None:
+                # 有数据时才创建工作簿（只写模式的工作簿创建后必须保存）
+                workbook = Workbook(write_only=True)
+                sheet = workbook.create_sheet("Sheet1")  # 与 DataFrame.to_excel 的默认工作表名一致
+                sheet.append(list(frame.columns))
+            # NaN / NaT 写为空单元格
+            frame = frame.astype(object).where(frame.notna(), None)
+            for row in frame.itertuples(index=False, name=None):
+                sheet.append(row)
+            rows += len(frame)
+        if rows == 0:
+            print(f"（无数据）{output_path}")
+            return 0
+        workbook.save(output_path)
+        print(f"✅ 数据已保存到: {output_path}（{rows} 行）")
+        return rows
+    except Exception as e:
+        print(f"❌ 写入文件失败: {e}")
+        return None
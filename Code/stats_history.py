@@ -0,0 +1,146 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-16 15:27:34
+LastEditors  : luyz
+LastEditTime : 2025-09-04 22:15:37
+Description  : 视频统计数据时间序列（追加写入）以及按发布后 N 天插值计算统计值
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+# 统计历史表：每次抓取追加一行，(bvid, fetch_timestamp) 为聚簇主键（WITHOUT ROWID，无额外索引开销）
+CREATE_HISTORY_SQL = '''
+    CREATE TABLE IF NOT EXISTS video_stats_history (
+        bvid TEXT NOT NULL,
+        fetch_timestamp INTEGER NOT NULL,
+        pub_timestamp INTEGER NOT NULL,
+        view INTEGER,
+        like INTEGER,
+        reply INTEGER,
+        danmaku INTEGER,
+        favorite INTEGER,
+        coin INTEGER,
+        share INTEGER,
+        PRIMARY KEY (bvid, fetch_timestamp)
+    ) WITHOUT ROWID
+'''
+
+# 统计指标列
+STAT_COLUMNS = ['view', 'like', 'reply', 'danmaku', 'favorite', 'coin', 'share']
+
+# 采样间隔：同一视频两次记录之间至少间隔 max(HISTORY_MIN_GAP, 视频年龄 * HISTORY_GAP_RATIO) 秒
+# 新视频采样密集，老视频采样稀疏，插值精度约为目标天数的 2%
+HISTORY_MIN_GAP = 1800
+HISTORY_GAP_RATIO = 0.02
+
+def ensure_history_table(conn):
+    """
+    如果不存在则创建 video_stats_history 表
+    """
+    conn.execute(CREATE_HISTORY_SQL)
+
+def to_int(value):
+    """统计值统一存为整数，缺失值（None / NaN）存为 NULL"""
+    if value is None or value != value:
+        return None
+    return int(value)
+
+def history_statement(records):
+    """
+    生成将一页视频的统计数据追加到历史表的 (sql, rows)，无可追加数据时 rows 为空列表
+    距离该视频上一条记录不足采样间隔的数据在执行时被跳过
+
+    参数：
+        records: list[VideoRecord] - 一页视频记录
+    """
+    rows = []
+    for record in records:
+        fetch_ts = to_int(record.fetch_timestamp)
+        pub_ts = to_int(record.pub_timestamp)
+        if fetch_ts is None or pub_ts is None:
+            continue
+        gap = max(HISTORY_MIN_GAP, int((fetch_ts - pub_ts) * HISTORY_GAP_RATIO))
+        rows.append((record.bvid, fetch_ts, pub_ts, *(to_int(getattr(record, col)) for col in STAT_COLUMNS), gap))
+
+    columns = ['bvid', 'fetch_timestamp', 'pub_timestamp'] + STAT_COLUMNS
+    params = ', '.join(f'?{i}' for i in range(1, len(columns) + 1))
+    gap_param = f'?{len(columns) + 1}'
+    sql = f'''
+        INSERT OR IGNORE INTO video_stats_history ({', '.join(columns)})
+        SELECT {params}
+        WHERE NOT EXISTS (
+            SELECT 1 FROM video_stats_history
+            WHERE bvid = ?1 AND fetch_timestamp > ?2 - {gap_param}
+        )
+    '''
+    return sql, rows
+
+def append_history(conn, records):
+    """
+    将一页视频的统计数据追加到历史表（需在调用方的事务和写锁内执行）
+
+    返回：
+        int - 尝试追加的行数
+    """
+    sql, rows = history_statement(records)
+    if rows:
+        conn.executemany(sql, rows)
+    return len(rows)
+
+def milestone_sql(days, tolerance=0.05, max_gap_ratio=0.25, schema="main"):
+    """
+    生成计算“发布后 N 天”统计值的 SQL（子查询），结果列为 bvid、fetch_timestamp（目标时刻）和各统计指标
+
+    对每个视频取目标时刻前后最近的两次记录做线性插值，两次记录的间隔不能超过
+    max(N 天 * tolerance, N 天 * max_gap_ratio)（间隔过大时线性插值误差过大）；
+    不能插值时，若某一侧记录与目标时刻相差不超过 N 天 * tolerance，则直接使用较近的记录，否则丢弃该视频
+
+    参数：
+        days: int - 目标天数
+        tolerance: float - 单侧记录允许的误差比例（默认 5%，与旧的窗口快照一致）
+        max_gap_ratio: float - 插值时前后两次记录的最大间隔占 N 天的比例（默认 25%）
+        schema: str - 历史表所在的数据库名（ATTACH 的别名）
+    """
+    secs = int(days * 86400)
+    slack = int(secs * tolerance)
+    max_gap = max(slack, int(secs * max_gap_ratio))
+    table = f"{schema}.video_stats_history"
+
+    stat_select = []
+    for col in STAT_COLUMNS:
+        stat_select.append(f'''
+            CASE
+                WHEN bracketed AND t1 = t0 THEN {col}_0
+                WHEN bracketed THEN CAST(ROUND({col}_0 + ({col}_1 - {col}_0) * 1.0 * (t - t0) / (t1 - t0)) AS INTEGER)
+                WHEN t0 IS NOT NULL AND t - t0 <= {slack} AND (t1 IS NULL OR t - t0 <= t1 - t) THEN {col}_0
+                ELSE {col}_1
+            END AS `{col}`''')
+    sample_select = ",\n".join(f"h0.`{col}` AS {col}_0, h1.`{col}` AS {col}_1" for col in STAT_COLUMNS)
+
+    return f'''
+        SELECT bvid, t AS fetch_timestamp,{",".join(stat_select)}
+        FROM (
+            SELECT b.bvid, b.t, b.t0, b.t1,
+                (b.t0 IS NOT NULL AND b.t1 IS NOT NULL AND b.t1 - b.t0 <= {max_gap}) AS bracketed,
+                {sample_select}
+            FROM (
+                SELECT bvid, t,
+                    (SELECT MAX(fetch_timestamp) FROM {table} h
+                     WHERE h.bvid = targets.bvid AND h.fetch_timestamp <= targets.t) AS t0,
+                    (SELECT MIN(fetch_timestamp) FROM {table} h
+                     WHERE h.bvid = targets.bvid AND h.fetch_timestamp >= targets.t) AS t1
+                FROM (
+                    SELECT bvid, MIN(pub_timestamp) + {secs} AS t
+                    FROM {table}
+                    GROUP BY bvid
+                    HAVING MAX(fetch_timestamp) >= MIN(pub_timestamp) + {secs - slack}
+                ) targets
+            ) b
+            LEFT JOIN {table} h0 ON h0.bvid = b.bvid AND h0.fetch_timestamp = b.t0
+            LEFT JOIN {table} h1 ON h1.bvid = b.bvid AND h1.fetch_timestamp = b.t1
+            WHERE (b.t0 IS NOT NULL AND b.t1 IS NOT NULL AND b.t1 - b.t0 <= {max_gap})
+               OR b.t - b.t0 <= {slack}
+               OR b.t1 - b.t <= {slack}
+        )
+    '''
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-31 19:26:13
+LastEditors  : luyz
+LastEditTime : 2025-09-01 21:37:20
+Description  : 视频记录类型 VideoRecord（NamedTuple，字段顺序与 videos 表一致，可直接作为 executemany 的参数），以及从 newlist 接口数据解析
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import time
+from typing import NamedTuple, Optional
+
+class VideoRecord(NamedTuple):
+    """一个视频的一次抓取结果，字段顺序即 videos 表的列顺序"""
+    bvid: str
+    title: Optional[str]
+    up_name: Optional[str]
+    up_id: Optional[int]
+    pub_timestamp: int
+    view: Optional[int]
+    like: Optional[int]
+    reply: Optional[int]
+    danmaku: Optional[int]
+    favorite: Optional[int]
+    coin: Optional[int]
+    share: Optional[int]
+    description: Optional[str]
+    cover: Optional[str]
+    duration: Optional[int]
+    tag: Optional[str]
+    video_url: str
+    fetch_timestamp: int
+    region_id: int
+
+# videos 表的列（与 VideoRecord 字段一一对应）
+VIDEO_FIELDS = VideoRecord._fields
+
+def parse_archive(archive, rid, fetch_timestamp):
+    """
+    将 newlist 接口的一条 archive 解析为 VideoRecord
+    archive 为普通解码得到的 dict，或 msgspec 类型化解码得到的 json_codec.Archive 结构（字段已按类型解码，直接按属性读取）
+
+    异常：
+        ValueError - BVID 为空或发布时间戳无效
+    """
+    if not isinstance(archive, dict):
+        if not archive.bvid:
+            raise ValueError("BVID 为空")
+        if archive.pubdate is None:
+            raise ValueError("发布时间戳无效: None")
+        owner, stat = archive.owner, archive.stat
+        return VideoRecord(
+            archive.bvid, archive.title, owner.name, owner.mid, archive.pubdate,
+            stat.view, stat.like, stat.reply, stat.danmaku, stat.favorite, stat.coin, stat.share,
+            archive.desc, archive.pic, archive.duration, archive.tag,
+            f"https://www.bilibili.com/video/{archive.bvid}", fetch_timestamp, rid
+        )
+
+    bvid = archive.get("bvid")
+    if not bvid:
+        raise ValueError("BVID 为空")
+    try:
+        pub_timestamp = int(archive.get("pubdate"))
+    except (TypeError, ValueError):
+        raise ValueError(f"发布时间戳无效: {archive.get('pubdate')}")
+    owner = archive.get("owner") or {}
+    stat = archive.get("stat") or {}
+    return VideoRecord(
+        bvid, archive.get("title"), owner.get("name"), owner.get("mid"), pub_timestamp,
+        stat.get("view"), stat.get("like"), stat.get("reply"), stat.get("danmaku"),
+        stat.get("favorite"), stat.get("coin"), stat.get("share"),
+        archive.get("desc"), archive.get("pic"), archive.get("duration"), archive.get("tag"),
+        f"https://www.bilibili.com/video/{bvid}", fetch_timestamp, rid
+    )
+
+def parse_archives(data, rid, fetch_timestamp=None):
+    """
+    将 newlist 接口的 JSON 数据解析为 VideoRecord 列表，无法解析的 archive 连同原因放入 rejects
+
+    返回：
+        (records, rejects) - rejects 为 (bvid, 错误原因) 列表
+    """
+    archives = (data.get("data") or {}).get("archives") or []
+    fetch_timestamp = int(fetch_timestamp if fetch_timestamp is not None else time.time())
+    records, rejects = [], []
+    for archive in archives:
+        try:
+            records.append(parse_archive(archive, rid, fetch_timestamp))
+        except ValueError as e:
+            bvid = archive.get("bvid") if isinstance(archive, dict) else archive.bvid
+            rejects.append((bvid, str(e)))
+    return records, rejects
+
+def page_bounds(records):
+    """
+    一页视频的 (最早, 最晚) 发布时间戳，空页返回 (None, None)
+    """
+    if not records:
+        return None, None
+    pub_timestamps = [r.pub_timestamp for r in records]
+    return min(pub_timestamps), max(pub_timestamps)
@@ -27,6 +27,10 @@ echo "🧨 尝试查杀所有包含 loop_run_with_lock 进程..."
 ps aux | grep "[l]oop_run_with_lock" | awk '{print $2}' | while read -r pid; do
   kill "$pid" && echo "✅ kill $pid（脚本进程）" || echo "❌ 无法 kill $pid"
 done
+echo "🧨 尝试停止所有常驻调度进程（SIGTERM：抓取在下一页之前停止）..."
+ps aux | grep "[s]cheduler_daemon.py" | awk '{print $2}' | while read -r pid; do
+  kill "$pid" && echo "✅ kill $pid（调度进程）" || echo "❌ 无法 kill $pid"
+done
 echo "🧨 尝试查杀所有包含 spider_video_details_to_sqlite 进程..."
 ps aux | grep "[s]pider_video_details_to_sqlite" | awk '{print $2}' | while read -r pid; do
   kill "$pid" && echo "✅ kill $pid（脚本进程）" || echo "❌ 无法 kill $pid"
@@ -0,0 +1,70 @@
+#!/bin/bash
+
+# 在同一个 Python 进程中抓取所有分区（共享请求配额），替代每个分区一个循环脚本的方式
+# 分区列表取自 Config/Example 下的一级子目录名（与 10.all_region_loop_task.sh 一致）
+
+# 获取当前脚本所在的目录（支持软链接和相对路径）
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+CONFIG_DIR="${SCRIPT_DIR}/Config/Example"
+CONFIG_FILE="${CONFIG_DIR}/config.conf"
+# 检查配置文件是否存在
+if [ ! -f "$CONFIG_FILE" ]; then
+    echo "❌ 配置文件不存在: $CONFIG_FILE"
+    exit 1
+fi
+
+# 加载配置
+source "$CONFIG_FILE"
+
+# 抓取参数（可在 config.conf 中覆盖）
+max_pages=${max_pages:-1000000}
+rps=${rps:-4}
+prefetch=${prefetch:-4}
+sleep_seconds=${sleep_seconds:-1800}
+
+# 收集分区ID
+REGION_IDS=()
+for dir in "${CONFIG_DIR}"/*; do
+  if [[ -d "$dir" ]]; then
+    REGION_IDS+=("$(basename "$dir")")
+  fi
+done
+if [ ${#REGION_IDS[@]} -eq 0 ]; then
+    echo "❌ 未找到任何分区配置目录: $CONFIG_DIR"
+    exit 1
+fi
+
+echo "✅ 已加载配置文件: $CONFIG_FILE"
+echo "项目目录：$project_dir"
+echo "分区ID：${REGION_IDS[*]}"
+echo "每秒请求数上限：$rps"
+
+mkdir -p "$log_dir/multi_region"
+SCRIPT_SPIDER_SQLITE="$project_dir/Code/6.spider_video_details_to_sqlite_with_lock.py"
+
+# 无限循环：每轮抓取所有分区 + 休息
+while true; do
+
+  # end_date 为 5天 前
+  end_date=$(date -d '5 days ago' +%F)
+
+  TIME_STAMP=$(date '+%Y%m%d_%H%M%S')
+  FILE_LOG="$log_dir/multi_region/${TIME_STAMP}_5day.log"
+
+  echo "[$(date '+%F %T')] Starting new round. regions=${REGION_IDS[*]} end_date=${end_date}" | tee "$FILE_LOG"
+
+  # 数据库路径中的 {region_id} 由 Python 脚本按分区替换，保持与单分区脚本相同的目录结构
+  python "$SCRIPT_SPIDER_SQLITE" "${REGION_IDS[@]}" \
+    --video_details_db "$result_dir/Sqlite/{region_id}/video_details.db" \
+    --video_details_with_type_db "$result_dir/Sqlite/{region_id}/video_details_with_type.db" \
+    --engine async \
+    --rps $rps \
+    --prefetch $prefetch \
+    --max_pages $max_pages \
+    --end_date "$end_date" \
+    >> "$FILE_LOG" 2>&1
+
+  echo "[$(date '+%F %T')] Task finished. Sleeping for ${sleep_seconds} seconds..." >> "$FILE_LOG"
+  sleep $sleep_seconds
+done
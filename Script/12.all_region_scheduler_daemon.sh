@@ -0,0 +1,40 @@
+#!/bin/bash
+
+# 为 Config/Example 下的每个分区启动一个常驻调度进程（取代 10.all_region_loop_task.sh 启动的两个循环脚本）
+
+# 获取当前脚本所在的目录（支持软链接和相对路径）
+SCRIPT_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+
+CONFIG_DIR="${SCRIPT_DIR}/Config/Example"
+CONFIG_FILE="${CONFIG_DIR}/config.conf"
+# 检查配置文件是否存在
+if [ ! -f "$CONFIG_FILE" ]; then
+    echo "❌ 配置文件不存在: $CONFIG_FILE"
+    exit 1
+fi
+
+# 加载配置
+source "$CONFIG_FILE"
+
+echo "✅ 已加载配置文件: $CONFIG_FILE"
+echo "项目目录：$project_dir"
+echo "日志目录：$log_dir"
+
+for dir in "${CONFIG_DIR}"/*; do
+  if [[ -d "$dir" ]]; then
+
+    REGION_ID=$(basename "$dir")
+
+    CURRENT_REGION_CONFIG_FILE="${dir}/config.conf"
+    if [ ! -f "$CURRENT_REGION_CONFIG_FILE" ]; then
+      echo "❌ 配置文件不存在: $CURRENT_REGION_CONFIG_FILE"
+      continue
+    fi
+
+    mkdir -p "$log_dir/$REGION_ID"
+    nohup $project_dir/Script/12.run_scheduler_daemon.sh "$CURRENT_REGION_CONFIG_FILE" > "$log_dir/$REGION_ID/scheduler_daemon_stdout.log" 2>&1 &
+    echo "✅ 启动分区 $REGION_ID 的调度进程，日志输出到 $log_dir/$REGION_ID/scheduler_daemon_stdout.log"
+    # 错开各分区的启动时间，避免同时请求
+    sleep 10
+  fi
+done
@@ -0,0 +1,78 @@
+#!/bin/bash
+
+# 常驻调度进程：在一个 Python 进程内运行 5day/1year 抓取、粉丝数刷新和榜单上传任务
+# 取代 9.loop_run_with_lock_5day.sh + 9.loop_run_with_lock_1year.sh（解释器、连接池、飞书 token 在各轮之间保持可用）
+
+# 检查是否传入了配置文件路径作为参数
+if [ $# -lt 1 ]; then
+    echo "❌ 使用方式: $0 <配置文件路径>"
+    exit 1
+fi
+
+# 从参数中获取配置文件路径（支持相对路径）
+CONFIG_FILE="$(realpath "$1")"
+
+# 检查配置文件是否存在
+if [ ! -f "$CONFIG_FILE" ]; then
+    echo "❌ 配置文件不存在: $CONFIG_FILE"
+    exit 1
+fi
+
+# 加载配置
+source "$CONFIG_FILE"
+
+echo "✅ 已加载配置文件: $CONFIG_FILE"
+echo "项目目录：$project_dir"
+echo "结果目录：$result_dir"
+echo "日志目录：$log_dir"
+echo "分区ID：$region_id"
+echo "最大页数：$max_pages"
+echo "间隔时间：$interval 秒"
+
+mkdir -p "$log_dir/$region_id"
+
+# 数据库路径
+DB_PATH="$result_dir/Sqlite/$region_id/video_details.db"
+DB_WITH_TYPE_PATH="$result_dir/Sqlite/$region_id/video_details_with_type.db"
+mkdir -p "$result_dir/Sqlite/$region_id"
+# 脚本路径
+SCRIPT_SCHEDULER="$project_dir/Code/11.scheduler_daemon.py"
+# 输出目录
+OUTDIR_EXCEL="$result_dir/Excel/$region_id"
+mkdir -p "$OUTDIR_EXCEL"
+FEISHU_SNAPSHOT_DIR="$result_dir/FeishuSnapshot"
+FEISHU_TOKEN_CACHE="$result_dir/FeishuToken/tenant_access_token.json"
+
+# 任务与间隔（分钟）：
+#   crawl_5day   每 30 分钟抓取到 5 天前（full）
+#   crawl_1year  每 60 分钟抓取到一年零一个月前（auto：每 24 小时全量刷新一次，其余轮次只抓新投稿）
+#   uploaders    每 30 分钟刷新到期 UP 主的粉丝数
+#   reports      每 30 分钟生成全部榜单并写入飞书表格（与抓取并行）
+# 停止：kill -TERM <pid>，抓取任务在下一页之前停止，其余任务运行完当前一轮后退出
+exec python "$SCRIPT_SCHEDULER" $region_id \
+  --video_details_db "$DB_PATH" \
+  --video_details_with_type_db "$DB_WITH_TYPE_PATH" \
+  --crawl 5day 5 30 full \
+  --crawl 1year 395 60 auto \
+  --max_pages $max_pages \
+  --interval $interval \
+  --refresh_interval 24 \
+  --metrics_jsonl "$log_dir/$region_id/metrics.jsonl" \
+  --uploader_interval 30 \
+  --max_requests 600 \
+  --report_interval 30 \
+  --excel_dir "$OUTDIR_EXCEL" \
+  --app_id "$app_id" \
+  --app_secret "$app_secret" \
+  --snapshot_dir "$FEISHU_SNAPSHOT_DIR" \
+  --token_cache "$FEISHU_TOKEN_CACHE" \
+  --feishu_sheet Today "$spreadsheet_token" "$sheet_id_day" \
+  --feishu_sheet Week "$spreadsheet_token" "$sheet_id_week" \
+  --feishu_sheet Month "$spreadsheet_token" "$sheet_id_month" \
+  --feishu_sheet Year "$spreadsheet_token" "$sheet_id_year" \
+  --feishu_sheet 1_Day "$spreadsheet_type_token" "$sheet_id_1_day" \
+  --feishu_sheet 3_Day "$spreadsheet_type_token" "$sheet_id_3_day" \
+  --feishu_sheet 7_Day "$spreadsheet_type_token" "$sheet_id_7_day" \
+  --feishu_sheet 30_Day "$spreadsheet_type_token" "$sheet_id_30_day" \
+  --feishu_sheet 90_Day "$spreadsheet_type_token" "$sheet_id_90_day" \
+  --feishu_sheet 360_Day "$spreadsheet_type_token" "$sheet_id_360_day"
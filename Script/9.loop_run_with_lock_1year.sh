@@ -54,13 +54,16 @@ DB_PATH="$result_dir/Sqlite/$region_id/video_details.db"
 DB_WITH_TYPE_PATH="$result_dir/Sqlite/$region_id/video_details_with_type.db"
 # 脚本路径
 SCRIPT_SPIDER_SQLITE="$project_dir/Code/6.spider_video_details_to_sqlite_with_lock.py"
-SCRIPT_GET_DATA="$project_dir/Code/2.get_video_data.py"
-SCRIPT_WRITE_FEISHU="$project_dir/Code/3.write_excel_to_feishu.py"
-SCRIPT_GET_TYPE_DATA="$project_dir/Code/4.get_video_type_data.py"
+SCRIPT_GENERATE_REPORTS="$project_dir/Code/8.generate_reports.py"
+SCRIPT_REFRESH_UPLOADERS="$project_dir/Code/9.refresh_uploaders.py"
 
 # 输出目录
 OUTDIR_EXCEL="$result_dir/Excel/$region_id"
 mkdir -p "$OUTDIR_EXCEL"
+# 飞书表格快照目录（增量同步：只写入与上次推送相比变化的行）
+FEISHU_SNAPSHOT_DIR="$result_dir/FeishuSnapshot"
+# tenant_access_token 缓存文件（各分区、各循环脚本共享同一个 token，过期前才重新获取）
+FEISHU_TOKEN_CACHE="$result_dir/FeishuToken/tenant_access_token.json"
 
 # 无限循环：每轮运行任务 + 休息60分钟
 while true; do
@@ -76,194 +79,48 @@ while true; do
 
   # =================== 1. 抓取视频数据并存入 SQLite 数据库 ===================
   # 执行 Python 脚本并输出日志
+  # 每轮的结构化指标（HTTP 延迟、重试、错误码、每页行数与耗时、写锁等待/持有时间）追加到 metrics.jsonl
+  # auto 模式：每 24 小时做一次回溯到 end_date 的全量刷新，其余轮次只抓取新投稿（到达水位线即停止）
   python "$SCRIPT_SPIDER_SQLITE" $region_id \
     --video_details_db "$DB_PATH" \
     --video_details_with_type_db "$DB_WITH_TYPE_PATH" \
     --max_pages $max_pages \
     --interval $interval \
+    --mode auto \
+    --refresh_interval 24 \
     --end_date "$end_date" \
+    --metrics_jsonl "$log_dir/$region_id/metrics.jsonl" \
     >> "$FILE_LOG" 2>&1
 
-  # =================== 2. 获取热门视频数据并写入 Excel 和飞书表格 ===================
-  # 获取日期边界
-  # TODAY_START=$(date +%F)
-  # WEEK_START=$(date -d "$TODAY_START -$(($(date +%u)-1)) days" +%F)
-  # MONTH_START=$(date +%Y-%m-01)
-  # YEAR_START=$(date +%Y-01-01)
-  # 获取昨天的日期（最近1天）
-  TODAY_START=$(date -d "yesterday" +%F)
-  # 获取 7 天前的日期（最近1周）
-  WEEK_START=$(date -d "$TODAY_START -7 days" +%F)
-  # 获取 30 天前的日期（最近1月）
-  MONTH_START=$(date -d "$TODAY_START -30 days" +%F)
-  # 获取 1 年前的日期（最近1年）
-  YEAR_START=$(date -d "$TODAY_START -365 days" +%F)
+  # =================== 1.1 刷新到期 UP 主的粉丝数 ===================
+  # 粉丝数保存在 uploaders 维度表中（榜单查询时关联），粉丝越多刷新越频繁，每轮最多查询 --max_requests 个
+  python "$SCRIPT_REFRESH_UPLOADERS" "$DB_WITH_TYPE_PATH" \
+    --max_requests 600 \
+    >> "$FILE_LOG" 2>&1
 
-  # 2.1 每日热门
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_DATA" "$DB_PATH" "$OUTDIR_EXCEL/Today.xlsx" \
-    --start "$TODAY_START" \
-    --sort_by view \
-    --desc \
-    --topN 100
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/Today.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_token" \
-    --sheet_id "$sheet_id_day" \
-    --start_cell "A1"
-  # 2.2 本周热门
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_DATA" "$DB_PATH" "$OUTDIR_EXCEL/Week.xlsx" \
-    --start "$WEEK_START" \
-    --sort_by view \
-    --desc \
-    --topN 500
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/Week.xlsx" \
-    --sheet_name "Sheet1" \
+  # =================== 2. 生成全部榜单并写入飞书表格 ===================
+  # 查询结果直接转换为表格写入飞书（不经过 Excel 文件），Excel 存档在后台另外保存
+  # 热门榜单：Today/Week/Month/Year；固定时间长度榜单：1/3/7/30/90/360 天
+  python3 "$SCRIPT_GENERATE_REPORTS" "$DB_PATH" \
+    --type_db "$DB_WITH_TYPE_PATH" \
+    --excel_dir "$OUTDIR_EXCEL" \
     --app_id "$app_id" \
     --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_token" \
-    --sheet_id "$sheet_id_week" \
-    --start_cell "A1"
-  # 2.3 本月热门
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_DATA" "$DB_PATH" "$OUTDIR_EXCEL/Month.xlsx" \
-    --start "$MONTH_START" \
-    --sort_by view \
-    --desc \
-    --topN 1000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/Month.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_token" \
-    --sheet_id "$sheet_id_month" \
-    --start_cell "A1"
-  # 2.4 本年热门
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_DATA" "$DB_PATH" "$OUTDIR_EXCEL/Year.xlsx" \
-    --start "$YEAR_START" \
-    --sort_by view \
-    --desc \
-    --topN 3000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/Year.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_token" \
-    --sheet_id "$sheet_id_year" \
-    --start_cell "A1"
+    --snapshot_dir "$FEISHU_SNAPSHOT_DIR" \
+    --token_cache "$FEISHU_TOKEN_CACHE" \
+    --feishu_sheet Today "$spreadsheet_token" "$sheet_id_day" \
+    --feishu_sheet Week "$spreadsheet_token" "$sheet_id_week" \
+    --feishu_sheet Month "$spreadsheet_token" "$sheet_id_month" \
+    --feishu_sheet Year "$spreadsheet_token" "$sheet_id_year" \
+    --feishu_sheet 1_Day "$spreadsheet_type_token" "$sheet_id_1_day" \
+    --feishu_sheet 3_Day "$spreadsheet_type_token" "$sheet_id_3_day" \
+    --feishu_sheet 7_Day "$spreadsheet_type_token" "$sheet_id_7_day" \
+    --feishu_sheet 30_Day "$spreadsheet_type_token" "$sheet_id_30_day" \
+    --feishu_sheet 90_Day "$spreadsheet_type_token" "$sheet_id_90_day" \
+    --feishu_sheet 360_Day "$spreadsheet_type_token" "$sheet_id_360_day" \
+    >> "$FILE_LOG" 2>&1
   echo "[$(date '+%F %T')] Data collection and upload completed." >> "$FILE_LOG"
 
-  # =================== 3. 获取固定时间长度视频统计数据并写入飞书表格 ===================
-  # 3.1 1天
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_TYPE_DATA" "$DB_WITH_TYPE_PATH" "$OUTDIR_EXCEL/1_Day.xlsx" \
-    --type_filter "1_day" \
-    --sort_by view \
-    --desc \
-    --topN 1000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/1_Day.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_type_token" \
-    --sheet_id "$sheet_id_1_day" \
-    --start_cell "A1"
-  # 3.3 3天
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_TYPE_DATA" "$DB_WITH_TYPE_PATH" "$OUTDIR_EXCEL/3_Day.xlsx" \
-    --type_filter "3_day" \
-    --sort_by view \
-    --desc \
-    --topN 1000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/3_Day.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_type_token" \
-    --sheet_id "$sheet_id_3_day" \
-    --start_cell "A1"
-  # 3.3 7天
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_TYPE_DATA" "$DB_WITH_TYPE_PATH" "$OUTDIR_EXCEL/7_Day.xlsx" \
-    --type_filter "7_day" \
-    --sort_by view \
-    --desc \
-    --topN 1000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/7_Day.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_type_token" \
-    --sheet_id "$sheet_id_7_day" \
-    --start_cell "A1"
-  # 3.4 30天
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_TYPE_DATA" "$DB_WITH_TYPE_PATH" "$OUTDIR_EXCEL/30_Day.xlsx" \
-    --type_filter "30_day" \
-    --sort_by view \
-    --desc \
-    --topN 1000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/30_Day.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_type_token" \
-    --sheet_id "$sheet_id_30_day" \
-    --start_cell "A1"
-  # 3.5 90天
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_TYPE_DATA" "$DB_WITH_TYPE_PATH" "$OUTDIR_EXCEL/90_Day.xlsx" \
-    --type_filter "90_day" \
-    --sort_by view \
-    --desc \
-    --topN 1000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/90_Day.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_type_token" \
-    --sheet_id "$sheet_id_90_day" \
-    --start_cell "A1"
-  # 3.6 360天
-  # 从数据库获取数据并保存为 Excel
-  python3 "$SCRIPT_GET_TYPE_DATA" "$DB_WITH_TYPE_PATH" "$OUTDIR_EXCEL/360_Day.xlsx" \
-    --type_filter "360_day" \
-    --sort_by view \
-    --desc \
-    --topN 1000
-  # 将 Excel 写入飞书表格
-  python3 "$SCRIPT_WRITE_FEISHU" \
-    --excel_path "$OUTDIR_EXCEL/360_Day.xlsx" \
-    --sheet_name "Sheet1" \
-    --app_id "$app_id" \
-    --app_secret "$app_secret" \
-    --spreadsheet_token "$spreadsheet_type_token" \
-    --sheet_id "$sheet_id_360_day" \
-    --start_cell "A1"
-  echo "[$(date '+%F %T')] Type data collection and upload completed." >> "$FILE_LOG"
-
   echo "[$(date '+%F %T')] Task finished. Sleeping for 10 minute..." >> "$FILE_LOG"
 
   # 休息60分钟（3600秒）
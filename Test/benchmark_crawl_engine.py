@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-10 19:45:03
+LastEditors  : luyz
+LastEditTime : 2025-08-30 22:30:18
+Description  : 使用本地模拟服务器离线对比同步抓取、asyncio 抓取与流水线抓取引擎的吞吐量
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import importlib.util
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from mock_bilibili_server import start_mock_server
+
+# 加载爬虫脚本（文件名以数字开头，无法直接 import）
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+spec = importlib.util.spec_from_file_location(
+    "spider_with_lock", os.path.join(CODE_DIR, "6.spider_video_details_to_sqlite_with_lock.py"))
+spider = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(spider)
+from bili_http import configure_client
+
+def count_rows(db_path):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute("SELECT COUNT(*) FROM videos").fetchone()[0]
+    finally:
+        conn.close()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线对比同步抓取、asyncio 抓取与流水线抓取引擎")
+    parser.add_argument("--pages", type=int, default=30, help="每种引擎抓取的页数，默认为30")
+    parser.add_argument("--latency", type=float, default=0.1, help="模拟服务器的请求延迟（秒），默认为0.1")
+    parser.add_argument("--interval", type=float, default=0.0, help="同步引擎和流水线引擎的抓取间隔（秒），默认为0")
+    parser.add_argument("--prefetch", type=int, default=8, help="async 引擎的预取窗口，默认为8")
+    parser.add_argument("--rps", type=float, default=20.0, help="async 引擎每秒请求数上限，默认为20")
+    parser.add_argument("--queue_depth", type=int, default=2, help="流水线引擎的队列容量，默认为2")
+    parser.add_argument("--engines", type=str, nargs="+", choices=["sync", "async", "pipeline"],
+                        default=["sync", "async", "pipeline"], help="参与对比的引擎")
+    args = parser.parse_args()
+
+    server, config, api_base = start_mock_server(total=args.pages * 50 * 2, latency=args.latency)
+    configure_client(api_base=api_base)
+    end_date = (datetime.now() - timedelta(days=365)).strftime("%Y-%m-%d")
+    print(f"🚀 模拟服务器: {api_base}，请求延迟 {args.latency}s")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for engine in args.engines:
+            video_db = os.path.join(tmp_dir, f"{engine}_video_details.db")
+            type_db = os.path.join(tmp_dir, f"{engine}_video_details_with_type.db")
+            spider.init_video_db(video_db)
+            spider.init_video_type_db(type_db)
+
+            start = time.perf_counter()
+            if engine == "sync":
+                spider.continuously_spider_video_data(
+                    1, video_db, type_db,
+                    end_date=end_date, max_pages=args.pages, interval=args.interval)
+            elif engine == "pipeline":
+                spider.continuously_spider_video_data_pipeline(
+                    1, video_db, type_db, end_date=end_date, max_pages=args.pages, interval=args.interval,
+                    depth=args.queue_depth)
+            else:
+                spider.continuously_spider_video_data_async(
+                    1, video_db, type_db, end_date=end_date, max_pages=args.pages,
+                    prefetch=args.prefetch, rps=args.rps)
+            elapsed = time.perf_counter() - start
+            results.append((engine, elapsed, count_rows(video_db)))
+
+    server.shutdown()
+    print("\n========== 基准测试结果 ==========")
+    for engine, elapsed, rows in results:
+        print(f"{engine:<8} 页数={args.pages:<5} 耗时={elapsed:7.2f}s "
+              f"页/秒={args.pages / elapsed:6.2f} 行/秒={rows / elapsed:8.1f}")
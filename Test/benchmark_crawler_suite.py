@@ -0,0 +1,237 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-09-02 22:47:36
+LastEditors  : luyz
+LastEditTime : 2025-09-03 00:12:58
+Description  : 爬虫基准测试套件：在回放服务器上离线运行 continuously_spider_video_data，统计页/秒、行/秒和数据库提交延迟，并与基线对比发现性能回退
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import contextlib
+import importlib.util
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+from mock_bilibili_server import start_mock_server
+from replay_bilibili_server import record_fixtures, start_replay_server
+
+# 加载爬虫脚本（文件名以数字开头，无法直接 import）
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+spec = importlib.util.spec_from_file_location(
+    "spider_with_lock", os.path.join(CODE_DIR, "6.spider_video_details_to_sqlite_with_lock.py"))
+spider = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(spider)
+from bili_http import configure_client
+from crawl_metrics import METRIC_DEFINITIONS, Histogram, get_metrics
+
+# 与基线对比的指标：(字段, 越大越好)
+COMPARED_FIELDS = [("pages_per_sec", True), ("rows_per_sec", True), ("commit_mean_ms", False), ("commit_p95_ms", False)]
+
+def record_mock_fixtures(fixture_dir, region_id, pages):
+    """没有指定 fixture 目录时，从本地模拟服务器录制一份（与录制真实 API 的流程相同）"""
+    server, config, api_base = start_mock_server(total=pages * 50, latency=0)
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        record_fixtures(fixture_dir, [region_id], pages, api_base=api_base, uploaders=50, interval=0)
+    server.shutdown()
+
+def merge_histogram(snapshot, name):
+    """将指标快照中某个直方图的所有标签组合并为一个 Histogram"""
+    merged = Histogram(METRIC_DEFINITIONS[name][2])
+    for h in snapshot["histograms"]:
+        if h["name"] != name:
+            continue
+        merged.count += h["count"]
+        merged.sum += h["sum"]
+        merged.counts = [c + h["buckets"][str(bound)] for c, bound in zip(merged.counts, merged.buckets)]
+    return merged
+
+def counter_total(snapshot, name, **labels):
+    return sum(c["value"] for c in snapshot["counters"]
+               if c["name"] == name and all(c["labels"].get(k) == str(v) for k, v in labels.items()))
+
+def run_engine(engine, region_id, video_db, type_db, args):
+    end_date = (datetime.now() - timedelta(days=args.days)).strftime("%Y-%m-%d")
+    if engine == "sync":
+        spider.continuously_spider_video_data(
+            region_id, video_db, type_db, end_date=end_date, max_pages=args.pages, interval=args.interval)
+    elif engine == "pipeline":
+        spider.continuously_spider_video_data_pipeline(
+            region_id, video_db, type_db, end_date=end_date, max_pages=args.pages, interval=args.interval,
+            depth=args.queue_depth)
+    else:
+        spider.continuously_spider_video_data_async(
+            region_id, video_db, type_db, end_date=end_date, max_pages=args.pages,
+            prefetch=args.prefetch, rps=args.rps)
+
+def run_round(engine, region_id, tmp_dir, round_index, args):
+    """
+    运行一轮抓取（全新的数据库和指标），返回本轮的页数、行数、耗时和提交延迟
+    """
+    video_db = os.path.join(tmp_dir, f"{engine}_{round_index}_video_details.db")
+    type_db = os.path.join(tmp_dir, f"{engine}_{round_index}_video_details_with_type.db")
+    metrics = get_metrics()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        spider.init_video_db(video_db)
+        spider.init_video_type_db(type_db)
+        metrics.reset()
+        random.seed(round_index)  # 同步引擎每页的随机等待在各次运行之间保持一致
+        start = time.perf_counter()
+        run_engine(engine, region_id, video_db, type_db, args)
+        elapsed = time.perf_counter() - start
+
+    snapshot = metrics.snapshot()
+    commit = merge_histogram(snapshot, "db_commit_seconds")
+    return {
+        "elapsed": elapsed,
+        "pages": merge_histogram(snapshot, "page_rows").count,
+        "rows": counter_total(snapshot, "db_rows_written_total", table="videos"),
+        "commit_mean_ms": commit.sum / commit.count * 1000 if commit.count else None,
+        "commit_p95_ms": commit.quantile(0.95) * 1000 if commit.count else None,
+        "retries": counter_total(snapshot, "http_retries_total"),
+        "errors": counter_total(snapshot, "api_errors_total")
+    }
+
+def summarize_case(engine, rounds, args):
+    """取各轮的中位数作为该用例的结果"""
+    elapsed = statistics.median(r["elapsed"] for r in rounds)
+    pages = statistics.median(r["pages"] for r in rounds)
+    rows = statistics.median(r["rows"] for r in rounds)
+    commit_mean = [r["commit_mean_ms"] for r in rounds if r["commit_mean_ms"] is not None]
+    commit_p95 = [r["commit_p95_ms"] for r in rounds if r["commit_p95_ms"] is not None]
+    return {
+        "case": case_name(engine, args), "engine": engine, "rounds": len(rounds),
+        "pages": pages, "rows": rows, "elapsed": round(elapsed, 3),
+        "pages_per_sec": round(pages / elapsed, 3), "rows_per_sec": round(rows / elapsed, 1),
+        "commit_mean_ms": round(statistics.median(commit_mean), 3) if commit_mean else None,
+        "commit_p95_ms": round(statistics.median(commit_p95), 3) if commit_p95 else None,
+        "retries": statistics.median(r["retries"] for r in rounds),
+        "errors": statistics.median(r["errors"] for r in rounds)
+    }
+
+def case_name(engine, args):
+    """用例名包含影响结果的参数，只与参数相同的基线结果对比"""
+    return (f"{engine}-latency{args.latency}-error{args.error_rate}-risk{args.risk_rate}"
+            f"-pages{args.pages}-interval{args.interval}")
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def load_baseline(path):
+    """读取基线 JSON lines 文件，每个用例取最后一条结果"""
+    baseline = {}
+    with open(path, encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                result = json.loads(line)
+                baseline[result["case"]] = result
+    return baseline
+
+def compare(result, base, tolerance):
+    """
+    与基线对比，返回性能回退超过 tolerance（比例）的指标说明列表
+    """
+    regressions = []
+    for field, higher_is_better in COMPARED_FIELDS:
+        new, old = result.get(field), base.get(field)
+        if not new or not old:
+            continue
+        change = (new - old) / old
+        if (change < -tolerance) if higher_is_better else (change > tolerance):
+            regressions.append(f"{field} {old} -> {new}（{change:+.0%}）")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="离线爬虫基准测试：回放录制的 API 响应，统计页/秒、行/秒和数据库提交延迟")
+    parser.add_argument("--fixtures", type=str, default=None, help="fixture 目录（replay_bilibili_server.py record 录制）；默认从本地模拟服务器录制一份")
+    parser.add_argument("--region_id", type=int, default=None, help="抓取的分区 ID，默认为 fixture 中页数最多的分区")
+    parser.add_argument("--pages", type=int, default=20, help="每轮抓取的最大页数（未指定 fixture 时也是录制的页数），默认为20")
+    parser.add_argument("--engines", type=str, nargs="+", choices=["sync", "async", "pipeline"], default=["sync"],
+                        help="参与测试的引擎，默认只测 sync（continuously_spider_video_data）")
+    parser.add_argument("--rounds", type=int, default=3, help="每个引擎运行的轮数（取中位数），默认为3")
+    parser.add_argument("--latency", type=float, default=0.05, help="回放服务器的请求延迟（秒），默认为0.05")
+    parser.add_argument("--jitter", type=float, default=0.0, help="请求延迟的随机波动（秒），默认为0")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="回放服务器返回 500 的概率，默认为0")
+    parser.add_argument("--risk_rate", type=float, default=0.0, help="回放服务器返回 412 风控的概率，默认为0")
+    parser.add_argument("--retry_after", type=int, default=1, help="风控响应的 Retry-After（秒），默认为1")
+    parser.add_argument("--backoff", type=float, default=1, help="客户端重试退避的初始等待（秒），默认为1（与线上一致）")
+    parser.add_argument("--interval", type=float, default=0.0, help="sync / pipeline 引擎的抓取间隔（秒），默认为0")
+    parser.add_argument("--days", type=int, default=365, help="截止日期为多少天前，默认为365（抓完 fixture 为止）")
+    parser.add_argument("--prefetch", type=int, default=8, help="async 引擎的预取窗口，默认为8")
+    parser.add_argument("--rps", type=float, default=20.0, help="async 引擎每秒请求数上限，默认为20")
+    parser.add_argument("--queue_depth", type=int, default=2, help="pipeline 引擎的队列容量，默认为2")
+    parser.add_argument("--output", type=str, default=None, help="将结果追加到该 JSON lines 文件（用于跟踪历史结果）")
+    parser.add_argument("--baseline", type=str, default=None, help="基线 JSON lines 文件：与同名用例的最后一条结果对比，回退时以状态码 1 退出")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="允许的性能回退比例，默认为0.1（10%%）")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        fixture_dir = args.fixtures
+        if fixture_dir is None:
+            fixture_dir = os.path.join(tmp_dir, "fixtures")
+            record_mock_fixtures(fixture_dir, args.region_id or 1, args.pages)
+        server, config, api_base = start_replay_server(
+            fixture_dir, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate,
+            risk_rate=args.risk_rate, retry_after=args.retry_after, seed=0)
+        region_id = args.region_id or max(config.pages, key=config.pages.get)
+        configure_client(api_base=api_base, backoff=args.backoff)
+        print(f"🚀 回放服务器: {api_base}，分区 {region_id} 共 {config.pages[region_id]} 页，"
+              f"延迟 {args.latency}s，500 概率 {args.error_rate}，412 概率 {args.risk_rate}")
+
+        for engine in args.engines:
+            rounds = []
+            for round_index in range(args.rounds):
+                rounds.append(run_round(engine, region_id, tmp_dir, round_index, args))
+                print(f"⏱️ {engine} 第 {round_index + 1} 轮: {rounds[-1]['pages']} 页 {rounds[-1]['rows']} 行 "
+                      f"{rounds[-1]['elapsed']:.2f}s")
+            results.append(summarize_case(engine, rounds, args))
+        server.shutdown()
+        print(f"📡 回放服务器共 {config.request_count} 个请求，注入故障 {config.injected}")
+
+    print("\n========== 基准测试结果 ==========")
+    for result in results:
+        commit_mean = f"{result['commit_mean_ms']:.2f}ms" if result["commit_mean_ms"] is not None else "-"
+        commit_p95 = f"≤{result['commit_p95_ms']:g}ms" if result["commit_p95_ms"] is not None else "-"
+        print(f"{result['engine']:<8} 页数={result['pages']:<5g} 耗时={result['elapsed']:7.2f}s "
+              f"页/秒={result['pages_per_sec']:7.2f} 行/秒={result['rows_per_sec']:8.1f} "
+              f"提交延迟 平均={commit_mean} p95{commit_p95} 重试={result['retries']:g}")
+
+    revision, recorded_at = git_revision(), int(time.time())
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "a", encoding="utf-8") as f:
+            for result in results:
+                f.write(json.dumps({**result, "revision": revision, "recorded_at": recorded_at}, ensure_ascii=False) + "\n")
+        print(f"💾 结果已追加到 {args.output}")
+
+    if args.baseline:
+        baseline = load_baseline(args.baseline)
+        regressed = False
+        for result in results:
+            base = baseline.get(result["case"])
+            if base is None:
+                print(f"➖ {result['case']} 没有基线结果")
+                continue
+            regressions = compare(result, base, args.tolerance)
+            if regressions:
+                regressed = True
+                print(f"⚠️ {result['case']} 相比基线（{base.get('revision')}）性能回退: " + "；".join(regressions))
+            else:
+                print(f"✅ {result['case']} 与基线（{base.get('revision')}）相比无回退")
+        if regressed:
+            sys.exit(1)
@@ -0,0 +1,149 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-27 22:20:51
+LastEditors  : luyz
+LastEditTime : 2025-08-31 21:51:02
+Description  : 多个爬虫进程并发抓取模拟服务器并写入同一组数据库，对比 FileLock 写入与单写入进程组提交的吞吐量和提交延迟
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import contextlib
+import importlib.util
+import multiprocessing
+import os
+import signal
+import sqlite3
+import sys
+import tempfile
+import time
+
+from mock_bilibili_server import start_mock_server
+
+# 加载爬虫脚本（文件名以数字开头，无法直接 import）
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+spec = importlib.util.spec_from_file_location(
+    "spider_with_lock", os.path.join(CODE_DIR, "6.spider_video_details_to_sqlite_with_lock.py"))
+spider = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(spider)
+from bili_http import configure_client
+from db_writer import DBWriterServer, configure_writer
+
+def percentile(values, q):
+    values = sorted(values)
+    if not values:
+        return 0.0
+    return values[min(len(values) - 1, int(q * len(values)))]
+
+def run_writer(address, group_wait, ready):
+    server = DBWriterServer(address, group_wait=group_wait)
+    signal.signal(signal.SIGTERM, lambda *_: sys.exit(0))
+    ready.set()
+    try:
+        server.serve_forever()
+    except SystemExit:
+        pass
+    finally:
+        server.shutdown()
+
+def run_crawler(region_id, pages, api_base, video_db, type_db, address, results):
+    """
+    一个爬虫进程：逐页抓取并写入两个数据库，记录每页两次写入（videos、video_types）各自的提交延迟
+    """
+    configure_client(api_base=api_base)
+    if address:
+        configure_writer(address)
+    latencies = []
+    rows = 0
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for page in range(1, pages + 1):
+            records = spider.get_bilibili_newlist(rid=region_id, pn=page, ps=50)
+            if not records:
+                continue
+            start = time.perf_counter()
+            spider.save_video_to_db(records, video_db)
+            latencies.append(time.perf_counter() - start)
+            start = time.perf_counter()
+            spider.save_video_type_to_db(records, type_db)
+            latencies.append(time.perf_counter() - start)
+            rows += len(records)
+    results.put((rows, latencies))
+
+def count_rows(db_path, table):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+def run_mode(mode, args, api_base, tmp_dir):
+    video_db = os.path.join(tmp_dir, f"{mode}_video_details.db")
+    type_db = os.path.join(tmp_dir, f"{mode}_video_details_with_type.db")
+    spider.init_video_db(video_db)
+    spider.init_video_type_db(type_db)
+
+    writer = None
+    address = None
+    if mode == "writer":
+        address = os.path.join(tmp_dir, "db_writer.sock")
+        ready = multiprocessing.Event()
+        writer = multiprocessing.Process(target=run_writer, args=(address, args.group_wait_ms / 1000, ready))
+        writer.start()
+        ready.wait()
+
+    results = multiprocessing.Queue()
+    crawlers = [multiprocessing.Process(target=run_crawler, args=(
+        1000 + i, args.pages, api_base, video_db, type_db, address, results)) for i in range(args.crawlers)]
+    start = time.perf_counter()
+    for p in crawlers:
+        p.start()
+    collected = [results.get() for _ in crawlers]
+    elapsed = time.perf_counter() - start
+    for p in crawlers:
+        p.join()
+
+    if writer:
+        writer.terminate()  # SIGTERM：写入进程提交完已收到的批次后退出
+        writer.join()
+
+    latencies = [latency for _, batch in collected for latency in batch]
+    return {
+        "mode": mode,
+        "rows": sum(rows for rows, _ in collected),
+        "elapsed": elapsed,
+        "p50": percentile(latencies, 0.5),
+        "p99": percentile(latencies, 0.99),
+        "videos": count_rows(video_db, "videos"),
+        "video_types": count_rows(type_db, "video_types")
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比 FileLock 写入与单写入进程组提交")
+    parser.add_argument("--crawlers", type=int, default=8, help="并发爬虫进程数，默认为8")
+    parser.add_argument("--pages", type=int, default=20, help="每个爬虫抓取的页数，默认为20")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器的请求延迟（秒），默认为0（只比较写入）")
+    parser.add_argument("--spacing", type=int, default=180,
+                        help="模拟视频的发布间隔（秒），默认为180（20页约覆盖2天，包含1天类型的视频）")
+    parser.add_argument("--group_wait_ms", type=float, default=5, help="写入进程组提交等待时间（毫秒），默认为5")
+    parser.add_argument("--modes", type=str, nargs="+", choices=["filelock", "writer"], default=["filelock", "writer"])
+    args = parser.parse_args()
+
+    # 模拟服务器在主进程的后台线程中运行，爬虫进程 fork 后通过 HTTP 访问
+    multiprocessing.set_start_method("fork")
+    server, config, api_base = start_mock_server(total=args.pages * 50 + 50, latency=args.latency, spacing=args.spacing)
+    print(f"🚀 模拟服务器: {api_base}，{args.crawlers} 个爬虫进程 × {args.pages} 页")
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for mode in args.modes:
+            results.append(run_mode(mode, args, api_base, tmp_dir))
+    server.shutdown()
+
+    print("\n========== 基准测试结果 ==========")
+    for r in results:
+        print(f"{r['mode']:<9} 行数={r['rows']:<6} 耗时={r['elapsed']:7.2f}s 行/秒={r['rows'] / r['elapsed']:8.1f} "
+              f"提交延迟 p50={r['p50'] * 1000:7.1f}ms p99={r['p99'] * 1000:7.1f}ms "
+              f"(videos={r['videos']}, video_types={r['video_types']})")
@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-21 21:03:47
+LastEditors  : luyz
+LastEditTime : 2025-08-21 21:27:14
+Description  : 对比飞书表格单请求整体写入与分块并发上传（含频率限制 / 5xx 重试）的耗时和吞吐量
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import os
+import sys
+
+from mock_feishu_server import start_mock_server
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+from feishu_sheet import FeishuUploader, get_tenant_access_token, write_to_feishu_sheet
+
+def make_grid(rows, cols):
+    """生成与年度榜单相同规模的表格（表头 + rows 行，含长文本列）"""
+    header = [f"列{j}" for j in range(cols)]
+    body = [[f"BV{i:010d}" if j == 0 else ("简介" * 40 if j == 12 else i * cols + j) for j in range(cols)]
+            for i in range(rows)]
+    return [header] + body
+
+def run(label, api_base, config, grid, sheet_id, **uploader_kwargs):
+    token = get_tenant_access_token("mock_app", "mock_secret", api_base=api_base)
+    uploader = FeishuUploader(api_base=api_base, **uploader_kwargs)
+    try:
+        stats = write_to_feishu_sheet(token, "mock_spreadsheet", sheet_id, "A1", grid, uploader=uploader)
+    except RuntimeError as e:
+        print(f"{label:<22} ❌ {e}")
+        return
+    finally:
+        uploader.close()
+    ok = config.grid("mock_spreadsheet", sheet_id) == grid
+    print(f"{label:<22} 请求数={stats['requests']:<4} 重试={stats['retries']:<3} 耗时={stats['seconds']:6.2f}s "
+          f"吞吐量={stats['cells_per_sec']:9.0f} 单元格/秒 数据一致={'✅' if ok else '❌'}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="飞书表格上传基准测试（模拟服务器）")
+    parser.add_argument("--rows", type=int, default=3000, help="表格行数，默认为 3000（年度榜单）")
+    parser.add_argument("--cols", type=int, default=19, help="表格列数，默认为 19")
+    parser.add_argument("--server_max_cells", type=int, default=50000, help="模拟服务器单次请求的单元格上限")
+    parser.add_argument("--max_cells", type=int, default=10000, help="分块上传时每个请求的单元格预算")
+    parser.add_argument("--workers", type=int, default=4, help="分块上传的并发数")
+    args = parser.parse_args()
+
+    grid = make_grid(args.rows, args.cols)
+    print(f"📊 表格规模: {len(grid)} 行 × {args.cols} 列 = {len(grid) * args.cols} 个单元格")
+
+    server, config, api_base = start_mock_server(max_cells=args.server_max_cells)
+    big = 10 ** 9
+    run("单请求整体写入", api_base, config, grid, "sheet_single", max_workers=1, max_cells=big, max_bytes=big)
+    run("分块串行", api_base, config, grid, "sheet_serial", max_workers=1, max_cells=args.max_cells)
+    run("分块并发", api_base, config, grid, "sheet_parallel", max_workers=args.workers, max_cells=args.max_cells)
+
+    # 注入频率限制和服务器错误，验证重试
+    config.rate_limit_rate = 0.15
+    config.error_rate = 0.05
+    run("分块并发（注入错误）", api_base, config, grid, "sheet_faulty", max_workers=args.workers,
+        max_cells=args.max_cells, backoff=0.05)
+    server.shutdown()
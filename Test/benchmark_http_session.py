@@ -0,0 +1,67 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-12 22:30:16
+LastEditors  : luyz
+LastEditTime : 2025-08-12 23:02:44
+Description  : 对比每次新建连接（requests.get）与共享会话长连接（BiliClient）的请求延迟
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+from mock_bilibili_server import start_mock_server
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+from bili_http import BiliClient, build_headers
+
+def summarize(label, latencies_ms):
+    """打印延迟统计（毫秒）"""
+    latencies_ms = sorted(latencies_ms)
+    p95 = latencies_ms[max(int(len(latencies_ms) * 0.95) - 1, 0)]
+    print(f"{label:<14} 请求数={len(latencies_ms):<5} 平均={statistics.mean(latencies_ms):7.3f}ms "
+          f"中位数={statistics.median(latencies_ms):7.3f}ms p95={p95:7.3f}ms")
+
+def run_without_session(api_base, up_ids):
+    """旧写法：每次调用模块级 requests.get，每个请求都新建 TCP 连接"""
+    latencies = []
+    for up_id in up_ids:
+        start = time.perf_counter()
+        response = requests.get(f"{api_base}/x/relation/stat", params={"vmid": up_id},
+                                headers=build_headers(), timeout=10)
+        response.json()
+        latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+def run_with_session(api_base, up_ids):
+    """新写法：共享 BiliClient 会话，长连接复用"""
+    client = BiliClient(api_base=api_base)
+    latencies = []
+    for up_id in up_ids:
+        start = time.perf_counter()
+        client.get_json("/x/relation/stat", params={"vmid": up_id})
+        latencies.append((time.perf_counter() - start) * 1000)
+    client.close()
+    return latencies
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比 requests.get 与共享会话的请求延迟（本地模拟服务器）")
+    parser.add_argument("--requests", type=int, default=500, help="每种方式的请求数，默认为500")
+    parser.add_argument("--latency", type=float, default=0.0, help="模拟服务器的请求延迟（秒），默认为0")
+    args = parser.parse_args()
+
+    server, config, api_base = start_mock_server(latency=args.latency)
+    up_ids = list(range(1, args.requests + 1))
+    print(f"🚀 模拟服务器: {api_base}（HTTP，未包含 TLS 握手开销，真实环境差距会更大）")
+
+    summarize("requests.get", run_without_session(api_base, up_ids))
+    summarize("BiliClient", run_with_session(api_base, up_ids))
+    server.shutdown()
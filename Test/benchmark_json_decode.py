@@ -0,0 +1,123 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-09-01 22:10:05
+LastEditors  : luyz
+LastEditTime : 2025-09-01 22:58:31
+Description  : 对比标准库 json、orjson、msgspec（普通 / 类型化）解码 newlist 和 relation/stat 响应体并解析为 VideoRecord 的耗时
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import glob
+import os
+import statistics
+import sys
+import time
+
+import requests
+
+from mock_bilibili_server import start_mock_server
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+from json_codec import configure_decoder, decode, decode_newlist, installed_backends
+from video_record import parse_archives
+
+def record_fixtures(pages, uploaders, latency=0.0):
+    """
+    从本地模拟服务器录制响应体（原始 bytes），返回 {"newlist": [...], "relation": [...]}
+    """
+    server, config, api_base = start_mock_server(total=pages * 50, latency=latency)
+    fixtures = {"newlist": [], "relation": []}
+    with requests.Session() as session:
+        for pn in range(1, pages + 1):
+            response = session.get(f"{api_base}/x/web-interface/newlist", params={"rid": 17, "pn": pn, "ps": 50, "type": 0})
+            fixtures["newlist"].append(response.content)
+        for mid in range(1, uploaders + 1):
+            response = session.get(f"{api_base}/x/relation/stat", params={"vmid": mid})
+            fixtures["relation"].append(response.content)
+    server.shutdown()
+    return fixtures
+
+def load_fixtures(fixture_dir):
+    """
+    读取目录中录制好的响应体：文件名以 newlist 开头的为 newlist 响应，以 relation 开头的为 relation/stat 响应
+    """
+    fixtures = {"newlist": [], "relation": []}
+    for path in sorted(glob.glob(os.path.join(fixture_dir, "*.json"))):
+        kind = os.path.basename(path).split("_")[0]
+        if kind in fixtures:
+            with open(path, "rb") as f:
+                fixtures[kind].append(f.read())
+    return fixtures
+
+def save_fixtures(fixtures, fixture_dir):
+    os.makedirs(fixture_dir, exist_ok=True)
+    for kind, bodies in fixtures.items():
+        for i, body in enumerate(bodies, 1):
+            with open(os.path.join(fixture_dir, f"{kind}_{i:04d}.json"), "wb") as f:
+                f.write(body)
+
+def time_rounds(func, bodies, rounds):
+    """每轮处理全部响应体，返回每轮耗时（秒）列表"""
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        for body in bodies:
+            func(body)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+def summarize(label, timings, count, size):
+    best = min(timings)
+    print(f"{label:<28} 中位数={statistics.median(timings) * 1000:8.2f}ms 最快={best * 1000:8.2f}ms "
+          f"{count / best:10.0f} 个/秒 {size / best / 2**20:8.1f} MB/s")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比各 JSON 解码后端处理 API 响应体的耗时")
+    parser.add_argument("--fixtures", type=str, default=None, help="录制好的响应体目录（newlist_*.json、relation_*.json）；默认从本地模拟服务器录制")
+    parser.add_argument("--save_fixtures", type=str, default=None, help="将从模拟服务器录制的响应体保存到该目录")
+    parser.add_argument("--pages", type=int, default=50, help="录制的 newlist 页数（每页 50 个视频），默认为50")
+    parser.add_argument("--uploaders", type=int, default=500, help="录制的 relation/stat 响应数，默认为500")
+    parser.add_argument("--rounds", type=int, default=20, help="每种后端重复的轮数，默认为20")
+    args = parser.parse_args()
+
+    if args.fixtures:
+        fixtures = load_fixtures(args.fixtures)
+    else:
+        fixtures = record_fixtures(args.pages, args.uploaders)
+        if args.save_fixtures:
+            save_fixtures(fixtures, args.save_fixtures)
+    newlist, relation = fixtures["newlist"], fixtures["relation"]
+    if not newlist:
+        sys.exit("❌ 没有 newlist 响应体")
+    newlist_size = sum(len(body) for body in newlist)
+    relation_size = sum(len(body) for body in relation)
+    print(f"📦 newlist 响应 {len(newlist)} 个（{newlist_size / 2**20:.1f} MB），relation/stat 响应 {len(relation)} 个；"
+          f"已安装后端：{', '.join(installed_backends())}")
+
+    # 各后端解析出的记录必须一致（获取时间戳固定，排除时间差异）
+    expected = None
+    cases = [(backend, decode_newlist) for backend in installed_backends()]
+    if "msgspec" in installed_backends():
+        cases.insert(1, ("msgspec(dict)", decode))
+    print("\n========== newlist：解码 + 解析为 VideoRecord ==========")
+    for label, decoder in cases:
+        configure_decoder(label.split("(")[0])
+        records = [parse_archives(decoder(body), 17, fetch_timestamp=0)[0] for body in newlist]
+        if expected is None:
+            expected = records
+        elif records != expected:
+            sys.exit(f"❌ {label} 解析结果与 {cases[0][0]} 不一致")
+        summarize(f"{label} 仅解码", time_rounds(decoder, newlist, args.rounds), len(newlist), newlist_size)
+        summarize(f"{label} 解码+解析",
+                  time_rounds(lambda body: parse_archives(decoder(body), 17, fetch_timestamp=0), newlist, args.rounds),
+                  len(newlist), newlist_size)
+
+    if relation:
+        print("\n========== relation/stat：解码 ==========")
+        for backend in installed_backends():
+            configure_decoder(backend)
+            summarize(backend, time_rounds(decode, relation, args.rounds), len(relation), relation_size)
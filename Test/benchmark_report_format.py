@@ -0,0 +1,96 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-19 21:14:08
+LastEditors  : luyz
+LastEditTime : 2025-08-19 21:58:36
+Description  : 对比榜单格式化的旧写法（逐行 apply + 按位置重命名）与向量化写法（report_format）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+from report_format import OUTPUT_COLUMNS, format_duration, format_durations, format_frame
+
+# 旧 format_output 中按位置赋值的列名（Code/2 的 videos 表）
+LEGACY_COLUMNS = ["视频ID", "标题", "频道名称", "频道ID", "发布时间", "播放数", "点赞数", "评论数", "弹幕数",
+                  "收藏数", "投币数", "分享数", "简介", "封面", "时长", "标签", "视频链接", "采集时间", "分区ID"]
+
+def make_frame(rows, seed=0):
+    """生成与 videos 表结构相同的模拟数据（约 1% 的时长为空）"""
+    rng = np.random.default_rng(seed)
+    now = 1_750_000_000
+    duration = rng.integers(5, 20000, rows).astype(float)
+    duration[rng.random(rows) < 0.01] = np.nan
+    return pd.DataFrame({
+        "bvid": [f"BV{i:010d}" for i in range(rows)],
+        "title": "模拟标题",
+        "up_name": "模拟UP主",
+        "up_id": rng.integers(1, 10**9, rows),
+        "pub_timestamp": now - rng.integers(0, 365 * 86400, rows),
+        "view": rng.integers(0, 10**7, rows),
+        "like": rng.integers(0, 10**6, rows),
+        "reply": rng.integers(0, 10**5, rows),
+        "danmaku": rng.integers(0, 10**5, rows),
+        "favorite": rng.integers(0, 10**5, rows),
+        "coin": rng.integers(0, 10**5, rows),
+        "share": rng.integers(0, 10**5, rows),
+        "description": "模拟简介",
+        "cover": "http://i0.hdslb.com/bfs/archive/cover.jpg",
+        "duration": duration,
+        "tag": "模拟",
+        "video_url": "https://www.bilibili.com/video/BV",
+        "fetch_timestamp": now,
+        "region_id": 17
+    })
+
+def legacy_format(df):
+    """旧写法：按位置重命名列，时长逐行调用 format_duration"""
+    df.columns = LEGACY_COLUMNS
+    df["发布时间"] = pd.to_datetime(df["发布时间"], unit="s", errors="coerce")
+    df["采集时间"] = pd.to_datetime(df["采集时间"], unit="s", errors="coerce")
+    df["时长"] = df["时长"].apply(format_duration)
+    return df[OUTPUT_COLUMNS["videos"]]
+
+def best_of(func, make_input, repeat):
+    """重复 repeat 次，返回最短耗时（秒）和最后一次的结果"""
+    best = float("inf")
+    result = None
+    for _ in range(repeat):
+        data = make_input()
+        start = time.perf_counter()
+        result = func(data)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="榜单格式化基准测试（旧写法 vs 向量化写法）")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10_000, 100_000, 1_000_000],
+                        help="测试的行数，默认为 10000 100000 1000000")
+    parser.add_argument("--repeat", type=int, default=3, help="每项重复次数（取最短耗时），默认为 3")
+    args = parser.parse_args()
+
+    print(f"{'行数':>9} | {'时长 apply':>11} {'时长 向量化':>11} {'加速':>6} | "
+          f"{'整表 旧写法':>11} {'整表 向量化':>11} {'加速':>6}")
+    for rows in args.sizes:
+        base = make_frame(rows)
+
+        t_apply, d_apply = best_of(lambda s: s.apply(format_duration), lambda: base["duration"].copy(), args.repeat)
+        t_vec, d_vec = best_of(format_durations, lambda: base["duration"].copy(), args.repeat)
+        assert (np.asarray(d_apply, dtype=object) == d_vec).all(), "时长格式化结果不一致"
+
+        t_legacy, f_legacy = best_of(legacy_format, base.copy, args.repeat)
+        t_frame, f_frame = best_of(lambda df: format_frame(df, "videos"), base.copy, args.repeat)
+        assert f_legacy.reset_index(drop=True).equals(f_frame.reset_index(drop=True)), "整表格式化结果不一致"
+
+        print(f"{rows:>9} | {t_apply * 1000:9.1f}ms {t_vec * 1000:9.1f}ms {t_apply / t_vec:5.1f}x | "
+              f"{t_legacy * 1000:9.1f}ms {t_frame * 1000:9.1f}ms {t_legacy / t_frame:5.1f}x")
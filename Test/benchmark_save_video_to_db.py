@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-08 21:10:32
+LastEditors  : luyz
+LastEditTime : 2025-08-31 21:50:26
+Description  : 对比逐行写入与批量 executemany 写入时，每页数据占用数据库文件锁的时间
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import importlib.util
+import os
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from filelock import FileLock
+
+# 加载爬虫脚本（文件名以数字开头，无法直接 import）
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+SPIDER_SCRIPT = os.path.join(CODE_DIR, "6.spider_video_details_to_sqlite_with_lock.py")
+sys.path.insert(0, CODE_DIR)
+spec = importlib.util.spec_from_file_location("spider_with_lock", SPIDER_SCRIPT)
+spider = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(spider)
+from video_record import VideoRecord
+
+def make_page(page, page_size=50):
+    """生成一页与 get_bilibili_newlist 输出结构一致的模拟视频记录"""
+    now = int(time.time())
+    videos = []
+    for i in range(page_size):
+        bvid = f"BV{page:05d}{i:05d}"
+        videos.append(VideoRecord(
+            bvid=bvid, title=f"测试视频 {bvid}", up_name=f"UP{i}", up_id=10000 + i,
+            pub_timestamp=now - page * 3600 - i, view=random.randint(0, 10**6),
+            like=random.randint(0, 10**5), reply=random.randint(0, 10**4),
+            danmaku=random.randint(0, 10**4), favorite=random.randint(0, 10**4),
+            coin=random.randint(0, 10**4), share=random.randint(0, 10**4),
+            description="简介" * 50, cover=f"http://i0.hdslb.com/bfs/archive/{bvid}.jpg",
+            duration=random.randint(10, 7200), tag="测试",
+            video_url=f"https://www.bilibili.com/video/{bvid}", fetch_timestamp=now, region_id=95
+        ))
+    return videos
+
+def legacy_save_video_to_db(video_data, db_path):
+    """旧版写入逻辑：锁内逐行 execute，每行单独 try/except"""
+    with FileLock(db_path + ".lock"):
+        conn = sqlite3.connect(db_path)
+        cursor = conn.cursor()
+        for video in video_data:
+            try:
+                cursor.execute('''
+                    INSERT OR REPLACE INTO videos (
+                        bvid, title, up_name, up_id, pub_timestamp, view, like, reply, danmaku,
+                        favorite, coin, share, description, cover, duration, tag, video_url, fetch_timestamp, region_id
+                    ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    video.bvid, video.title, video.up_name, video.up_id, video.pub_timestamp,
+                    video.view, video.like, video.reply, video.danmaku,
+                    video.favorite, video.coin, video.share, video.description,
+                    video.cover, video.duration, video.tag, video.video_url,
+                    video.fetch_timestamp, video.region_id
+                ))
+            except Exception as e:
+                print(f"❌ 插入数据时出错: {e}")
+        conn.commit()
+        conn.close()
+
+def summarize(label, hold_ms):
+    """打印每页锁占用时间（毫秒）的统计信息"""
+    hold_ms = sorted(hold_ms)
+    p95 = hold_ms[max(int(len(hold_ms) * 0.95) - 1, 0)]
+    print(f"{label:<12} 页数={len(hold_ms):<5} 平均={statistics.mean(hold_ms):8.3f}ms "
+          f"中位数={statistics.median(hold_ms):8.3f}ms p95={p95:8.3f}ms 最大={hold_ms[-1]:8.3f}ms")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="对比每页数据写入时的数据库锁占用时间（逐行 vs 批量）")
+    parser.add_argument("--pages", type=int, default=200, help="模拟写入的页数，默认为200")
+    parser.add_argument("--page_size", type=int, default=50, help="每页视频数，默认为50")
+    args = parser.parse_args()
+
+    pages = [make_page(p, args.page_size) for p in range(1, args.pages + 1)]
+    legacy_ms, batch_ms = [], []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        legacy_db = os.path.join(tmp_dir, "legacy.db")
+        batch_db = os.path.join(tmp_dir, "batch.db")
+        spider.init_video_db(legacy_db)
+        spider.init_video_db(batch_db)
+
+        # 两种写法交替写入同一页，避免磁盘缓存等因素造成的先后顺序偏差
+        for page in pages:
+            start = time.perf_counter()
+            legacy_save_video_to_db(page, legacy_db)
+            legacy_ms.append((time.perf_counter() - start) * 1000)
+
+            start = time.perf_counter()
+            spider.write_video_batch(page, batch_db)
+            batch_ms.append((time.perf_counter() - start) * 1000)
+
+    summarize("逐行写入", legacy_ms)
+    summarize("批量写入", batch_ms)
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-10 18:20:55
+LastEditors  : luyz
+LastEditTime : 2025-08-10 19:37:12
+Description  : 本地模拟 Bilibili API 服务器（newlist / relation/stat），用于离线测试和基准测试
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import json
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+# 模拟数据参数：每个分区共 total 个视频，按发布时间倒序，相邻视频间隔 spacing 秒
+class MockConfig:
+    def __init__(self, total=10000, spacing=60, latency=0.05, error_rate=0.0):
+        self.total = total
+        self.spacing = spacing
+        self.latency = latency
+        self.error_rate = error_rate
+        self.newest_timestamp = int(time.time())
+        self.request_count = 0
+        self.lock = threading.Lock()
+
+def make_archive(config, rid, index):
+    """生成第 index 个视频（0 为最新）的 archive 数据，结构与 newlist 接口一致"""
+    bvid = f"BV{rid}x{index:08d}"
+    mid = index % 500 + 1
+    rng = random.Random(index)
+    return {
+        "bvid": bvid,
+        "title": f"模拟视频 {bvid}",
+        "pubdate": config.newest_timestamp - index * config.spacing,
+        "desc": "模拟简介" * 20,
+        "pic": f"http://i0.hdslb.com/bfs/archive/{bvid}.jpg",
+        "duration": rng.randint(10, 7200),
+        "tag": "模拟",
+        "owner": {"mid": mid, "name": f"模拟UP主{mid}"},
+        "stat": {
+            "view": rng.randint(0, 10**6), "like": rng.randint(0, 10**5), "reply": rng.randint(0, 10**4),
+            "danmaku": rng.randint(0, 10**4), "favorite": rng.randint(0, 10**4),
+            "coin": rng.randint(0, 10**4), "share": rng.randint(0, 10**4)
+        }
+    }
+
+def make_handler(config):
+    class MockBilibiliHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持 keep-alive 长连接
+        disable_nagle_algorithm = True  # 避免响应头和响应体分两次发送时的 Nagle 延迟
+
+        def log_message(self, format, *args):
+            pass  # 关闭默认的访问日志
+
+        def send_json(self, status, payload):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 客户端取消了预取请求
+
+        def do_GET(self):
+            with config.lock:
+                config.request_count += 1
+            if config.latency:
+                time.sleep(config.latency)
+            if config.error_rate and random.random() < config.error_rate:
+                self.send_json(500, {"code": -500, "message": "模拟服务器错误"})
+                return
+
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/x/web-interface/newlist":
+                rid = int(query.get("rid", 0))
+                pn = int(query.get("pn", 1))
+                ps = min(int(query.get("ps", 20)), 50)
+                start = (pn - 1) * ps
+                archives = [make_archive(config, rid, i) for i in range(start, min(start + ps, config.total))]
+                self.send_json(200, {"code": 0, "message": "0", "data": {
+                    "archives": archives, "page": {"count": config.total, "num": pn, "size": ps}}})
+            elif url.path == "/x/relation/stat":
+                mid = int(query.get("vmid", 0))
+                self.send_json(200, {"code": 0, "message": "0", "data": {
+                    "mid": mid, "following": 10, "follower": mid * 100}})
+            else:
+                self.send_json(404, {"code": -404, "message": "啥都木有"})
+
+    return MockBilibiliHandler
+
+def start_mock_server(host="127.0.0.1", port=0, **kwargs):
+    """
+    在后台线程中启动模拟服务器
+
+    返回：
+        (server, config, api_base)
+    """
+    config = MockConfig(**kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动本地模拟 Bilibili API 服务器")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址，默认为 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000, help="监听端口，默认为 8000")
+    parser.add_argument("--total", type=int, default=10000, help="每个分区的模拟视频总数，默认为 10000")
+    parser.add_argument("--spacing", type=int, default=60, help="相邻视频的发布时间间隔（秒），默认为 60")
+    parser.add_argument("--latency", type=float, default=0.05, help="每个请求的模拟延迟（秒），默认为 0.05")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="返回 500 错误的概率，默认为 0")
+    args = parser.parse_args()
+
+    server, config, api_base = start_mock_server(
+        args.host, args.port, total=args.total, spacing=args.spacing,
+        latency=args.latency, error_rate=args.error_rate
+    )
+    print(f"🚀 模拟服务器已启动: {api_base}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
@@ -0,0 +1,174 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-08-21 19:52:30
+LastEditors  : luyz
+LastEditTime : 2025-08-21 21:27:14
+Description  : 本地模拟飞书开放平台（tenant_access_token / values_batch_update），用于离线测试和基准测试
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from openpyxl.utils import column_index_from_string
+
+# 模拟参数：单次请求单元格上限、延迟（固定部分 + 每千个单元格的处理时间）、频率限制和 5xx 概率
+class MockFeishuConfig:
+    def __init__(self, max_cells=50000, latency=0.02, latency_per_kcell=0.01, rate_limit_rate=0.0,
+                 error_rate=0.0, token_expire=7200):
+        self.max_cells = max_cells
+        self.latency = latency
+        self.latency_per_kcell = latency_per_kcell
+        self.rate_limit_rate = rate_limit_rate
+        self.error_rate = error_rate
+        self.token_expire = token_expire
+        self.sheets = {}  # (spreadsheet_token, sheet_id) -> {(行号, 列序号): 值}
+        self.token_requests = 0
+        self.write_requests = 0
+        self.rejected_requests = 0
+        self.cells_written = 0
+        self.lock = threading.Lock()
+
+    def grid(self, spreadsheet_token, sheet_id):
+        """将已写入的单元格还原为二维列表（从 A1 开始，末尾的空行不包含在内）"""
+        cells = self.sheets.get((spreadsheet_token, sheet_id), {})
+        filled = [(r, c) for (r, c), v in cells.items() if v != ""]
+        if not filled:
+            return []
+        rows = max(r for r, _ in filled)
+        cols = max(c for _, c in filled)
+        return [[cells.get((r, c), "") for c in range(1, cols + 1)] for r in range(1, rows + 1)]
+
+def parse_range(range_str):
+    """解析 sheet_id!A1:S100，返回 (sheet_id, 起始行, 起始列)"""
+    sheet_id, cells = range_str.split("!", 1)
+    match = re.fullmatch(r"([A-Z]+)(\d+)", cells.split(":", 1)[0])
+    return sheet_id, int(match.group(2)), column_index_from_string(match.group(1))
+
+def make_handler(config):
+    class MockFeishuHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass
+
+        def send_json(self, status, payload, headers=None):
+            body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            try:
+                body = json.loads(self.rfile.read(length) or b"{}")
+            except ValueError:
+                self.send_json(400, {"code": 9499, "msg": "invalid json"})
+                return
+            if config.latency:
+                time.sleep(config.latency)
+
+            if self.path.endswith("/auth/v3/tenant_access_token/internal/"):
+                with config.lock:
+                    config.token_requests += 1
+                self.send_json(200, {"code": 0, "msg": "ok", "tenant_access_token": f"t-mock-{time.time_ns()}",
+                                     "expire": config.token_expire})
+                return
+
+            match = re.fullmatch(r"/open-apis/sheets/v2/spreadsheets/([^/]+)/values_batch_update", self.path)
+            if not match:
+                self.send_json(404, {"code": 404, "msg": "not found"})
+                return
+            if not self.headers.get("Authorization", "").startswith("Bearer t-mock-"):
+                self.send_json(200, {"code": 99991663, "msg": "invalid access token"})
+                return
+
+            # 模拟频率限制（两种形式：HTTP 429 和 HTTP 200 + 错误码）以及服务器错误
+            roll = random.random()
+            if roll < config.rate_limit_rate:
+                with config.lock:
+                    config.rejected_requests += 1
+                if roll < config.rate_limit_rate / 2:
+                    self.send_json(429, {"code": 99991400, "msg": "request trigger frequency limit"},
+                                   {"Retry-After": "0.05"})
+                else:
+                    self.send_json(200, {"code": 99991400, "msg": "request trigger frequency limit"})
+                return
+            if random.random() < config.error_rate:
+                with config.lock:
+                    config.rejected_requests += 1
+                self.send_json(500, {"code": 500, "msg": "internal error"})
+                return
+
+            value_ranges = body.get("valueRanges", [])
+            cells = sum(len(row) for r in value_ranges for row in r.get("values", []))
+            if config.latency_per_kcell:
+                time.sleep(config.latency_per_kcell * cells / 1000)
+            if cells > config.max_cells:
+                with config.lock:
+                    config.rejected_requests += 1
+                self.send_json(200, {"code": 90221, "msg": f"too many cells: {cells} > {config.max_cells}"})
+                return
+
+            with config.lock:
+                for value_range in value_ranges:
+                    sheet_id, row_start, col_start = parse_range(value_range["range"])
+                    sheet_cells = config.sheets.setdefault((match.group(1), sheet_id), {})
+                    for i, row in enumerate(value_range["values"]):
+                        for j, value in enumerate(row):
+                            sheet_cells[(row_start + i, col_start + j)] = value
+                config.write_requests += 1
+                config.cells_written += cells
+            self.send_json(200, {"code": 0, "msg": "success", "data": {"totalUpdatedCells": cells}})
+
+    return MockFeishuHandler
+
+def start_mock_server(host="127.0.0.1", port=0, **kwargs):
+    """
+    在后台线程中启动模拟飞书服务器
+
+    返回：
+        (server, config, api_base)
+    """
+    config = MockFeishuConfig(**kwargs)
+    server = ThreadingHTTPServer((host, port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config, f"http://{host}:{server.server_address[1]}/open-apis"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="启动本地模拟飞书开放平台服务器")
+    parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址，默认为 127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001, help="监听端口，默认为 8001")
+    parser.add_argument("--max_cells", type=int, default=50000, help="单次请求的单元格上限，默认为 50000")
+    parser.add_argument("--latency", type=float, default=0.02, help="每个请求的模拟延迟（秒），默认为 0.02")
+    parser.add_argument("--latency_per_kcell", type=float, default=0.01, help="每千个单元格的模拟处理时间（秒），默认为 0.01")
+    parser.add_argument("--rate_limit_rate", type=float, default=0.0, help="返回频率限制的概率，默认为 0")
+    parser.add_argument("--error_rate", type=float, default=0.0, help="返回 500 错误的概率，默认为 0")
+    args = parser.parse_args()
+
+    server, config, api_base = start_mock_server(
+        args.host, args.port, max_cells=args.max_cells, latency=args.latency, latency_per_kcell=args.latency_per_kcell,
+        rate_limit_rate=args.rate_limit_rate, error_rate=args.error_rate
+    )
+    print(f"🚀 模拟飞书服务器已启动: {api_base}（Ctrl+C 退出）")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        server.shutdown()
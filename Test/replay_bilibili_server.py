@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# coding=utf-8
+'''
+Author       : luyz
+Date         : 2025-09-02 20:03:48
+LastEditors  : luyz
+LastEditTime : 2025-09-02 22:41:15
+Description  : 录制 / 回放 Bilibili API 响应：录制一次真实的 newlist、relation/stat 响应保存为 fixture，再由本地服务器回放（可注入延迟、500 错误和 412 风控）
+Copyright (c) 2025 by LuYanzhuan lyanzhuan@gmail.com, All Rights Reserved.
+'''
+
+import argparse
+import glob
+import json
+import os
+import random
+import re
+import sys
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import requests
+
+CODE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Code")
+sys.path.insert(0, CODE_DIR)
+from bili_http import DEFAULT_API_BASE, build_headers
+
+# fixture 文件名：每个响应体一个文件（与 benchmark_json_decode.py 的 --fixtures 目录格式一致）
+NEWLIST_FILE = "newlist_rid{rid}_pn{pn:04d}.json"
+RELATION_FILE = "relation_mid{mid}.json"
+MANIFEST_FILE = "manifest.json"
+
+def record_fixtures(fixture_dir, region_ids, pages, api_base=DEFAULT_API_BASE, uploaders=100, interval=1.0, page_size=50):
+    """
+    请求 API 并将原始响应体保存到 fixture_dir：每个分区前 pages 页 newlist，以及其中前 uploaders 个 UP 主的 relation/stat
+    只保存 HTTP 200 且 code 为 0 的响应；请求之间间隔 interval 秒（录制真实 API 时避免触发风控）
+
+    返回：
+        dict - 写入 manifest.json 的录制信息
+    """
+    os.makedirs(fixture_dir, exist_ok=True)
+    session = requests.Session()
+    saved_pages, mids = {}, []
+
+    def fetch(path, params):
+        response = session.get(f"{api_base}{path}", params=params, headers=build_headers(), timeout=10)
+        time.sleep(interval)
+        if response.status_code != 200:
+            print(f"⚠️ {path} {params} 返回 HTTP {response.status_code}，跳过")
+            return None
+        data = response.json()
+        if data.get("code") != 0:
+            print(f"⚠️ {path} {params} 返回 code={data.get('code')} message={data.get('message')}，跳过")
+            return None
+        return response.content, data
+
+    for rid in region_ids:
+        saved_pages[rid] = 0
+        for pn in range(1, pages + 1):
+            result = fetch("/x/web-interface/newlist", {"rid": rid, "pn": pn, "ps": page_size, "type": 0})
+            if result is None:
+                continue
+            content, data = result
+            archives = (data.get("data") or {}).get("archives") or []
+            if not archives:
+                print(f"📭 分区 {rid} 第 {pn} 页无数据，停止录制该分区")
+                break
+            with open(os.path.join(fixture_dir, NEWLIST_FILE.format(rid=rid, pn=pn)), "wb") as f:
+                f.write(content)
+            saved_pages[rid] += 1
+            mids += [(a.get("owner") or {}).get("mid") for a in archives]
+        print(f"📥 分区 {rid} 录制了 {saved_pages[rid]} 页")
+
+    unique_mids = [mid for mid in dict.fromkeys(mids) if mid][:uploaders]
+    saved_uploaders = 0
+    for mid in unique_mids:
+        result = fetch("/x/relation/stat", {"vmid": mid})
+        if result is None:
+            continue
+        with open(os.path.join(fixture_dir, RELATION_FILE.format(mid=mid)), "wb") as f:
+            f.write(result[0])
+        saved_uploaders += 1
+    print(f"📥 录制了 {saved_uploaders} 个 UP 主的粉丝数")
+
+    manifest = {"recorded_at": int(time.time()), "api_base": api_base, "page_size": page_size,
+                "pages": {str(rid): count for rid, count in saved_pages.items()}, "uploaders": saved_uploaders}
+    with open(os.path.join(fixture_dir, MANIFEST_FILE), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+    return manifest
+
+def load_fixtures(fixture_dir, shift_time=True):
+    """
+    读取 fixture 目录
+
+    参数：
+        shift_time: bool - 将所有视频的发布时间整体平移，使最新的视频在此刻发布
+                    （抓取的停止条件依赖当前时间，否则 fixture 放置一段时间后会被当作过期数据）
+
+    返回：
+        (newlist, relation) - {(rid, pn): 响应体}、{mid: 响应体}
+    """
+    newlist, relation = {}, {}
+    for path in glob.glob(os.path.join(fixture_dir, "newlist_rid*_pn*.json")):
+        rid, pn = map(int, re.findall(r"\d+", os.path.basename(path))[:2])
+        with open(path, "rb") as f:
+            newlist[(rid, pn)] = f.read()
+    for path in glob.glob(os.path.join(fixture_dir, "relation_mid*.json")):
+        mid = int(re.findall(r"\d+", os.path.basename(path))[0])
+        with open(path, "rb") as f:
+            relation[mid] = f.read()
+    if not newlist:
+        raise FileNotFoundError(f"{fixture_dir} 中没有 newlist fixture")
+
+    if shift_time:
+        pages = {key: json.loads(body) for key, body in newlist.items()}
+        newest = max(a.get("pubdate") or 0 for data in pages.values() for a in data["data"]["archives"])
+        shift = int(time.time()) - newest
+        for key, data in pages.items():
+            for archive in data["data"]["archives"]:
+                if archive.get("pubdate"):
+                    archive["pubdate"] += shift
+            newlist[key] = json.dumps(data, ensure_ascii=False).encode("utf-8")
+    return newlist, relation
+
+# 回放参数：每个请求的延迟（latency ± jitter 秒），以及返回 500、HTTP 412、HTTP 200 + code=-412 的概率
+class ReplayConfig:
+    def __init__(self, latency=0.05, jitter=0.0, error_rate=0.0, risk_rate=0.0, risk_code_rate=0.0,
+                 retry_after=1, seed=None):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.risk_rate = risk_rate
+        self.risk_code_rate = risk_code_rate
+        self.retry_after = retry_after
+        self.random = random.Random(seed)
+        self.pages = {}  # 分区 ID -> 录制的页数
+        self.request_count = 0
+        self.injected = {"error": 0, "risk": 0, "risk_code": 0}
+        self.lock = threading.Lock()
+
+    def draw(self):
+        """决定本次请求的延迟和注入的故障（None 表示正常回放）"""
+        with self.lock:
+            self.request_count += 1
+            delay = max(0.0, self.latency + self.random.uniform(-self.jitter, self.jitter))
+            roll = self.random.random()
+            fault = None
+            for name, rate in (("error", self.error_rate), ("risk", self.risk_rate), ("risk_code", self.risk_code_rate)):
+                if roll < rate:
+                    fault = name
+                    self.injected[name] += 1
+                    break
+                roll -= rate
+        return delay, fault
+
+def make_handler(config, newlist, relation):
+    class ReplayHandler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"  # 支持 keep-alive 长连接
+        disable_nagle_algorithm = True
+
+        def log_message(self, format, *args):
+            pass  # 关闭默认的访问日志
+
+        def send_body(self, status, body, headers=None):
+            try:
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json; charset=utf-8")
+                self.send_header("Content-Length", str(len(body)))
+                for name, value in (headers or {}).items():
+                    self.send_header(name, value)
+                self.end_headers()
+                self.wfile.write(body)
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # 客户端取消了预取请求
+
+        def send_json(self, status, payload, headers=None):
+            self.send_body(status, json.dumps(payload, ensure_ascii=False).encode("utf-8"), headers)
+
+        def do_GET(self):
+            delay, fault = config.draw()
+            if delay:
+                time.sleep(delay)
+            retry_after = {"Retry-After": str(config.retry_after)} if config.retry_after is not None else None
+            if fault == "error":
+                self.send_json(500, {"code": -500, "message": "回放服务器注入的错误"})
+                return
+            if fault == "risk":
+                self.send_json(412, {"code": -412, "message": "请求被拦截"}, retry_after)
+                return
+            if fault == "risk_code":
+                self.send_json(200, {"code": -412, "message": "请求被拦截"}, retry_after)
+                return
+
+            url = urlparse(self.path)
+            query = {k: v[0] for k, v in parse_qs(url.query).items()}
+            if url.path == "/x/web-interface/newlist":
+                key = (int(query.get("rid", 0)), int(query.get("pn", 1)))
+                if key in newlist:
+                    self.send_body(200, newlist[key])
+                else:
+                    # 超出录制范围的页与真实接口翻到末尾时一致：code 为 0，archives 为空
+                    self.send_json(200, {"code": 0, "message": "0", "data": {"archives": [], "page": {"num": key[1]}}})
+            elif url.path == "/x/relation/stat":
+                mid = int(query.get("vmid", 0))
+                if mid in relation:
+                    self.send_body(200, relation[mid])
+                else:
+                    self.send_json(200, {"code": -404, "message": "啥都木有"})
+            else:
+                self.send_json(404, {"code": -404, "message": "啥都木有"})
+
+    return ReplayHandler
+
+def start_replay_server(fixture_dir, host="127.0.0.1", port=0, shift_time=True, **kwargs):
+    """
+    在后台线程中启动回放服务器（接口与 mock_bilibili_server.start_mock_server 一致）
+
+    返回：
+        (server, config, api_base)
+    """
+    newlist, relation = load_fixtures(fixture_dir, shift_time=shift_time)
+    config = ReplayConfig(**kwargs)
+    for rid, pn in newlist:
+        config.pages[rid] = max(config.pages.get(rid, 0), pn)
+    server = ThreadingHTTPServer((host, port), make_handler(config, newlist, relation))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config, f"http://{host}:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="录制 Bilibili API 响应为 fixture，或在本地回放")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    record_parser = subparsers.add_parser("record", help="请求 API 并保存响应体")
+    record_parser.add_argument("fixture_dir", type=str, help="fixture 保存目录")
+    record_parser.add_argument("region_id", type=int, nargs="+", help="要录制的分区 ID")
+    record_parser.add_argument("--pages", type=int, default=20, help="每个分区录制的页数，默认为20")
+    record_parser.add_argument("--uploaders", type=int, default=100, help="录制粉丝数的 UP 主个数，默认为100")
+    record_parser.add_argument("--interval", type=float, default=1.0, help="请求间隔（秒），默认为1")
+    record_parser.add_argument("--api_base", type=str, default=DEFAULT_API_BASE, help="API 地址（可指向本地模拟服务器）")
+
+    serve_parser = subparsers.add_parser("serve", help="回放 fixture")
+    serve_parser.add_argument("fixture_dir", type=str, help="fixture 目录")
+    serve_parser.add_argument("--host", type=str, default="127.0.0.1", help="监听地址，默认为 127.0.0.1")
+    serve_parser.add_argument("--port", type=int, default=8000, help="监听端口，默认为 8000")
+    serve_parser.add_argument("--latency", type=float, default=0.05, help="每个请求的延迟（秒），默认为 0.05")
+    serve_parser.add_argument("--jitter", type=float, default=0.0, help="延迟的随机波动（秒），默认为 0")
+    serve_parser.add_argument("--error_rate", type=float, default=0.0, help="返回 500 错误的概率，默认为 0")
+    serve_parser.add_argument("--risk_rate", type=float, default=0.0, help="返回 HTTP 412 风控的概率，默认为 0")
+    serve_parser.add_argument("--risk_code_rate", type=float, default=0.0, help="返回 HTTP 200 + code=-412 风控的概率，默认为 0")
+    serve_parser.add_argument("--retry_after", type=int, default=1, help="风控响应的 Retry-After（秒），默认为 1")
+    serve_parser.add_argument("--no_shift_time", action="store_true", help="不平移发布时间，按录制时的原始时间回放")
+    serve_parser.add_argument("--seed", type=int, default=None, help="故障注入的随机种子（固定后每次回放的故障序列相同）")
+    args = parser.parse_args()
+
+    if args.command == "record":
+        manifest = record_fixtures(args.fixture_dir, args.region_id, args.pages, api_base=args.api_base,
+                                   uploaders=args.uploaders, interval=args.interval)
+        print(f"✅ 录制完成: {args.fixture_dir} {manifest['pages']}")
+    else:
+        server, config, api_base = start_replay_server(
+            args.fixture_dir, args.host, args.port, shift_time=not args.no_shift_time,
+            latency=args.latency, jitter=args.jitter, error_rate=args.error_rate, risk_rate=args.risk_rate,
+            risk_code_rate=args.risk_code_rate, retry_after=args.retry_after, seed=args.seed
+        )
+        print(f"🚀 回放服务器已启动: {api_base}，分区页数 {config.pages}（Ctrl+C 退出）")
+        try:
+            while True:
+                time.sleep(3600)
+        except KeyboardInterrupt:
+            print(f"🛑 [{datetime.now():%F %T}] 共 {config.request_count} 个请求，注入故障 {config.injected}")
+            server.shutdown()
@@ -1,29 +1,47 @@
 #!/bin/bash
 
-# 🚀 并发运行你的 Python 爬虫脚本，传入不同的 region_id 标识来源
-# 你可以固定 region_id，例如：21 表示 “生活 - 日常”
-REGION_ID=21
+# 🚀 并发运行爬虫脚本测试数据库锁：所有进程写入同一个 SQLite 数据库，请求发往本地回放服务器（不访问线上 API）
+# 用法：bash test_db_lock.sh [fixture 目录]
+#   指定 fixture 目录（replay_bilibili_server.py record 录制）时回放录制的响应，否则使用本地模拟服务器
+REGION_ID=${REGION_ID:-21}
 
-# 脚本路径（根据你保存的实际路径填写）
-SCRIPT="/data2/luyz/project/CustomizedAnalysis/CustomizedAnalysis.12.20250726_YASbilibili/Code/1.spider_video_details_to_sqlite_with_lock.py"
+# 路径均相对于本脚本所在目录
+TEST_DIR="$(cd "$(dirname "${BASH_SOURCE[0]}")" && pwd)"
+SCRIPT="$TEST_DIR/../Code/6.spider_video_details_to_sqlite_with_lock.py"
+LOG_DIR=${LOG_DIR:-"$TEST_DIR/log/test_db_lock"}
+FIXTURE_DIR=$1
+PORT=${PORT:-18000}
 
 # 并发数（你可以调整为 3~5 观察锁排队效果）
-NUM_PROCESSES=3
+NUM_PROCESSES=${NUM_PROCESSES:-3}
 
-echo "🧪 启动 $NUM_PROCESSES 个并发爬虫测试锁机制..."
+mkdir -p "$LOG_DIR"
+rm -f "$LOG_DIR"/test_video_details*.db*
+
+if [ -n "$FIXTURE_DIR" ]; then
+    python3 "$TEST_DIR/replay_bilibili_server.py" serve "$FIXTURE_DIR" --port "$PORT" --latency 0.05 > "$LOG_DIR/server.txt" 2>&1 &
+else
+    python3 "$TEST_DIR/mock_bilibili_server.py" --port "$PORT" --total 5000 --latency 0.05 > "$LOG_DIR/server.txt" 2>&1 &
+fi
+SERVER_PID=$!
+trap 'kill $SERVER_PID 2>/dev/null' EXIT
+sleep 1
+
+echo "🧪 启动 $NUM_PROCESSES 个并发爬虫测试锁机制（API: http://127.0.0.1:$PORT）..."
 echo "⏱️ 每个进程都会尝试访问同一个 SQLite 数据库..."
 
 for i in $(seq 1 $NUM_PROCESSES)
 do
     echo "🚀 启动进程 $i"
     python3 "$SCRIPT" "$REGION_ID" \
-        --video_details_db /data2/luyz/project/CustomizedAnalysis/Log/test_video_details.db \
-        --video_details_with_type_db /data2/luyz/project/CustomizedAnalysis/Log/test_video_details_with_type.db \
+        --video_details_db "$LOG_DIR/test_video_details.db" \
+        --video_details_with_type_db "$LOG_DIR/test_video_details_with_type.db" \
+        --api_base "http://127.0.0.1:$PORT" \
         --max_pages 100 \
         --interval 0.1 \
-        --end_date "2025-08-01" \
-        > /data2/luyz/project/CustomizedAnalysis/Log/log_$i.txt 2>&1 &   # 每个进程的输出写入不同 log 文件
+        --end_date "$(date -d '30 days ago' +%F)" \
+        > "$LOG_DIR/log_$i.txt" 2>&1 &   # 每个进程的输出写入不同 log 文件
 done
 
-wait
-echo "✅ 所有进程已完成，可以检查 log_*.txt 日志文件查看锁竞争过程"
+wait $(jobs -p | grep -v "^$SERVER_PID$")
+echo "✅ 所有进程已完成，可以检查 $LOG_DIR/log_*.txt 日志文件查看锁竞争过程"